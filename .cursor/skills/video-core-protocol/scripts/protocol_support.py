@@ -41,9 +41,21 @@ SOURCE_PATHS_BY_SKILL = {
         Path("src/animate/__init__.py"),
         Path("src/animate/lesson_vertical.py"),
         Path("src/utils/anim_helper.py"),
+        Path("src/utils/audio_duration.py"),
+        Path("src/utils/audio_mixer.py"),
+        Path("src/utils/audio_manifest.py"),
         Path("src/utils/voice_edgetts.py"),
         Path("src/utils/cover_generator.py"),
+        Path("src/utils/cover_renderer.py"),
         Path("src/utils/icon_helper.py"),
+        Path("src/utils/icon_index.py"),
+        Path("src/utils/image_cache.py"),
+        Path("src/utils/scene_segments.py"),
+        Path("src/utils/storyboard.py"),
+        Path("src/utils/text_cache.py"),
+        Path("src/utils/render_profiler.py"),
+        Path("src/utils/cache_dir.py"),
+        Path("src/utils/pronunciation.py"),
     ),
 }
 
@@ -6,15 +6,21 @@ Usage:
     python workflow.py status --series zsxq 002
     python workflow.py render --series sunzi 06 --quality ql
     python workflow.py publish --series moneywise 001 --media-publisher-dir /path/to/media-publisher
-    python workflow.py render-all --series zsxq 002 005
+    python workflow.py render-all --series zsxq 002 005 --workers 4
+    python workflow.py storyboard --series zsxq 002 005
 """
 
 import argparse
+import json
 import os
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 if str(SCRIPT_DIR) not in sys.path:
@@ -23,6 +29,19 @@ if str(SCRIPT_DIR) not in sys.path:
 from lesson_num import normalize_lesson_num
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent.parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.storyboard import CONTACT_SHEET_NAME, STORYBOARD_DIR
+
+# render-all：准备阶段（语音/封面/混音，主要等网络和 ffmpeg）的并发数
+DEFAULT_PREP_WORKERS = 4
+# render-all 日志目录（相对 lesson 目录），并行时各课输出互不交错
+RENDER_LOG_DIR = Path("media") / "logs"
+# render-all：准备阶段写出的封面参数（相对 lesson 目录），全部课准备完后一次性批量生成封面
+COVER_SPEC_FILE = Path("media") / "cover_spec.json"
+# 故事板渲染分辨率（版式审核用，半分辨率足够）；缩略图目录见 src/utils/storyboard.py
+STORYBOARD_RESOLUTION = "540,960"
 
 SERIES_CONFIG = {
     "zsxq": {
@@ -112,28 +131,104 @@ def check_lesson_status(series: str, lesson_num: str) -> dict:
     return status
 
 
+def manim_render_args(quality: str) -> List[str]:
+    """决定画面内容的 manim 参数（也参与场景片段指纹）"""
+    return [
+        f"-{quality}",
+        "-r", "1080,1920",
+        "--fps", "60",
+        "--disable_caching",
+    ]
+
+
+def build_manim_command(class_name: str, quality: str, prepare_only: bool = False) -> List[str]:
+    """
+    组装 manim 命令
+
+    prepare_only 时加 --dry_run：配合 PREPARE_ONLY 环境变量只跑 prepare_resources（语音、封面、混音），
+    不写任何视频文件。
+    """
+    cmd = ["uv", "run", "manim", *manim_render_args(quality), "--media_dir", "media"]
+    if prepare_only:
+        cmd.append("--dry_run")
+    cmd.extend(["animate.py", class_name])
+    return cmd
+
+
+def build_storyboard_command(class_name: str) -> List[str]:
+    """
+    故事板模式的 manim 命令
+
+    -s（save_last_frame）让 manim 跳过所有动画、不编码视频；配合 STORYBOARD 环境变量，
+    LessonVertical 为每个场景保存一张定格缩略图并生成联系表。
+    """
+    return [
+        "uv", "run", "manim", "-s",
+        "-r", STORYBOARD_RESOLUTION,
+        "--disable_caching",
+        "--media_dir", "media",
+        "animate.py", class_name,
+    ]
+
+
+def validate_lesson(series: str, lesson_num: str, quality: str) -> Optional[str]:
+    """检查 lesson 是否可渲染，返回错误信息；可渲染时返回 None"""
+    lesson_dir = get_lesson_dir(series, lesson_num)
+    if not (lesson_dir / "animate.py").exists():
+        return f"{lesson_dir}/animate.py 不存在"
+    if not (lesson_dir / "script.json").exists():
+        return f"{lesson_dir}/script.json 不存在"
+    if quality not in {"ql", "qh"}:
+        return f"无效 quality={quality}，可选: ql / qh"
+    return None
+
+
+def get_video_output_path(series: str, lesson_num: str) -> Path:
+    """整课视频的输出位置（与 check_lesson_status 的查找位置一致）"""
+    return get_lesson_dir(series, lesson_num) / "media" / "videos" / "animate" / "1920p60" / f"{get_class_name(series, lesson_num)}.mp4"
+
+
+def render_lesson_incremental(series: str, lesson_num: str, quality: str, log=None, scene_workers: int = 1) -> dict:
+    """
+    按场景片段增量渲染（需先完成准备阶段）：只重渲指纹变化的 build_scene_N，其余复用
+
+    scene_workers > 1 时待渲染的场景分给多个 manim 进程并行渲染。
+
+    Returns:
+        dict: {"rendered": [...], "reused": [...], "output": 视频路径, "timeline": {...}}
+    """
+    from src.utils.scene_segments import render_incremental
+
+    return render_incremental(
+        str(get_lesson_dir(series, lesson_num)),
+        get_class_name(series, lesson_num),
+        manim_render_args(quality),
+        str(get_video_output_path(series, lesson_num)),
+        log=log,
+        workers=scene_workers,
+    )
+
+
 def render_lesson(
     series: str,
     lesson_num: str,
     force_cover: bool = False,
     force_voice: bool = False,
     quality: str = "qh",
+    incremental: bool = False,
+    scene_workers: int = 1,
+    profile: bool = False,
 ):
     config = get_series_config(series)
+    # 场景并行依赖片段渲染
+    incremental = incremental or scene_workers > 1
     lesson_num = normalize_lesson_num(lesson_num, config["num_digits"])
     lesson_dir = get_lesson_dir(series, lesson_num)
     class_name = get_class_name(series, lesson_num)
 
-    if not (lesson_dir / "animate.py").exists():
-        print(f"❌ 错误: {lesson_dir}/animate.py 不存在")
-        return False
-
-    if not (lesson_dir / "script.json").exists():
-        print(f"❌ 错误: {lesson_dir}/script.json 不存在")
-        return False
-
-    if quality not in {"ql", "qh"}:
-        print(f"❌ 错误: 无效 quality={quality}，可选: ql / qh")
+    error = validate_lesson(series, lesson_num, quality)
+    if error:
+        print(f"❌ 错误: {error}")
         return False
 
     print(f"🎬 开始渲染 [{config['name']}] 第{lesson_num}课...")
@@ -144,15 +239,13 @@ def render_lesson(
     if force_voice:
         env["FORCE_VOICE"] = "true"
 
-    cmd = [
-        "uv", "run", "manim",
-        f"-{quality}",
-        "-r", "1080,1920",
-        "--fps", "60",
-        "--disable_caching",
-        "animate.py",
-        class_name,
-    ]
+    cmd = build_manim_command(class_name, quality, prepare_only=incremental)
+    if incremental:
+        env["PREPARE_ONLY"] = "true"
+        if profile:
+            print("⚠️ --profile 只对整课渲染生效，片段模式下忽略")
+    elif profile:
+        env["RENDER_PROFILE"] = "true"
 
     print(f"工作目录: {lesson_dir}")
     print(f"执行命令: {' '.join(cmd)}")
@@ -164,13 +257,263 @@ def render_lesson(
             env={**os.environ, **env},
             check=True,
         )
+        if incremental:
+            summary = render_lesson_incremental(series, lesson_num, quality, scene_workers=scene_workers)
+            print(f"🎞️ 片段：重新渲染 {summary['rendered'] or '无'}，复用 {summary['reused'] or '无'}")
+            for idx, (start, length) in summary["timeline"].items():
+                print(f"   片段 {idx:>2}: {start:7.2f}s 起，{length:6.2f}s")
         print(f"✅ [{config['name']}] 第{lesson_num}课渲染完成!")
         return True
-    except subprocess.CalledProcessError as exc:
+    except (subprocess.CalledProcessError, RuntimeError) as exc:
         print(f"❌ 渲染失败: {exc}")
         return False
 
 
+def default_render_workers() -> int:
+    """默认渲染并发：每个 manim 进程连同 ffmpeg 编码大约吃满 4 个核"""
+    return max(1, (os.cpu_count() or 1) // 4)
+
+
+def run_lesson_stage(cmd: List[str], lesson_dir: Path, env: dict, log_path: Path) -> Optional[str]:
+    """在 lesson 目录下执行一个阶段，输出追加到 log_path；成功返回 None，失败返回错误信息"""
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as log:
+        log.write(f"$ {' '.join(cmd)}\n")
+        log.flush()
+        try:
+            proc = subprocess.run(
+                cmd,
+                cwd=lesson_dir,
+                env={**os.environ, **env},
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        except FileNotFoundError as exc:
+            return f"命令不可用: {exc}"
+    if proc.returncode != 0:
+        return f"退出码 {proc.returncode}，详见 {log_path}"
+    return None
+
+
+def run_incremental_stage(series: str, lesson_num: str, quality: str, log_path: Path) -> Optional[str]:
+    """增量渲染一课，输出追加到 log_path；成功返回 None，失败返回错误信息"""
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as log:
+        try:
+            summary = render_lesson_incremental(series, lesson_num, quality, log=log)
+        except (subprocess.CalledProcessError, RuntimeError, OSError) as exc:
+            return f"{exc}，详见 {log_path}"
+        log.write(f"segments rendered={summary['rendered']} reused={summary['reused']}\n")
+    return None
+
+
+def generate_covers_batch(spec_paths: dict) -> dict:
+    """
+    用一次 generate_covers（一个 Chromium、多个标签页并行）生成多课封面
+
+    Args:
+        spec_paths: {课号: 准备阶段写出的封面参数文件}
+    Returns:
+        dict: {课号: 错误信息，成功为 None}；参数文件用完即删除
+    """
+    lessons = list(spec_paths)
+    with tempfile.TemporaryDirectory() as tmp:
+        specs_file = Path(tmp) / "specs.json"
+        results_file = Path(tmp) / "results.json"
+        specs = [json.loads(Path(spec_paths[num]).read_text(encoding="utf-8")) for num in lessons]
+        specs_file.write_text(json.dumps(specs, ensure_ascii=False), encoding="utf-8")
+        cmd = ["uv", "run", "python", str(PROJECT_ROOT / "src" / "utils" / "cover_generator.py"),
+               str(specs_file), str(results_file)]
+        try:
+            subprocess.run(cmd, cwd=PROJECT_ROOT)
+        except FileNotFoundError as exc:
+            return {num: f"命令不可用: {exc}" for num in lessons}
+        if not results_file.exists():
+            return {num: "封面批量生成进程异常退出" for num in lessons}
+        results = json.loads(results_file.read_text(encoding="utf-8"))
+    for num in lessons:
+        Path(spec_paths[num]).unlink(missing_ok=True)
+    return {num: result["error"] for num, result in zip(lessons, results)}
+
+
+def render_lessons_parallel(
+    series: str,
+    lesson_nums: List[str],
+    force_cover: bool = False,
+    force_voice: bool = False,
+    quality: str = "qh",
+    workers: Optional[int] = None,
+    prep_workers: int = DEFAULT_PREP_WORKERS,
+    incremental: bool = False,
+    profile: bool = False,
+) -> List[dict]:
+    """
+    并行批量渲染
+
+    每课分两个阶段：准备（PREPARE_ONLY + --dry_run，生成语音/封面/混音）和渲染（manim）。
+    准备阶段用 prep_workers 个并发先行，某课准备完成后立即进入 workers 个并发的渲染池。
+    需要新封面的课在准备阶段只写出封面参数，等全部课准备完后用一次 generate_covers（一个浏览器）
+    批量生成，再进入渲染池。
+    每课输出写在自己的 media/ 下，日志写到 media/logs/render-all.log；
+    单课失败只记录在结果中，不影响其他课。incremental 时渲染阶段改为按场景片段增量渲染；
+    profile 时渲染阶段开启 RENDER_PROFILE，每课视频旁边写一份 trace。
+
+    Returns:
+        list: 每课一个 dict，{"lesson", "status", "prep_seconds", "render_seconds", "error", "log"}
+    """
+    config = get_series_config(series)
+    workers = workers or default_render_workers()
+    lessons = [normalize_lesson_num(num, config["num_digits"]) for num in lesson_nums]
+    results = {
+        num: {"lesson": num, "status": "pending", "prep_seconds": 0.0, "render_seconds": 0.0,
+              "error": None, "log": get_lesson_dir(series, num) / RENDER_LOG_DIR / "render-all.log"}
+        for num in lessons
+    }
+    total = len(lessons)
+    finished = 0
+    lock = threading.Lock()
+
+    def report(num: str, message: str, done: bool = False):
+        nonlocal finished
+        with lock:
+            if done:
+                finished += 1
+            print(f"📈 [{finished}/{total}] 第{num}课 {message}", flush=True)
+
+    def finish(num: str, status: str, error: Optional[str] = None):
+        results[num]["status"] = status
+        results[num]["error"] = error
+        if status == "ok":
+            seconds = results[num]["prep_seconds"] + results[num]["render_seconds"]
+            report(num, f"✅ 完成 ({seconds:.1f}s)", done=True)
+        else:
+            report(num, f"❌ {error}", done=True)
+
+    def run_stage(num: str, prepare_only: bool) -> Optional[str]:
+        lesson_dir = get_lesson_dir(series, num)
+        env = {}
+        if prepare_only:
+            env["PREPARE_ONLY"] = "true"
+            env["COVER_SPEC_PATH"] = str(lesson_dir / COVER_SPEC_FILE)
+            if force_cover:
+                env["FORCE_COVER"] = "true"
+            if force_voice:
+                env["FORCE_VOICE"] = "true"
+        elif profile:
+            env["RENDER_PROFILE"] = "true"
+        cmd = build_manim_command(get_class_name(series, num), quality, prepare_only=prepare_only)
+        key = "prep_seconds" if prepare_only else "render_seconds"
+        start = time.perf_counter()
+        try:
+            if incremental and not prepare_only:
+                return run_incremental_stage(series, num, quality, results[num]["log"])
+            return run_lesson_stage(cmd, lesson_dir, env, results[num]["log"])
+        finally:
+            results[num][key] = time.perf_counter() - start
+
+    print(f"🚀 [{config['name']}] 批量渲染 {total} 课：准备并发 {prep_workers}，渲染并发 {workers}")
+
+    with ThreadPoolExecutor(max_workers=prep_workers) as prep_pool, \
+            ThreadPoolExecutor(max_workers=workers) as render_pool:
+        prep_futures = {}
+        for num in lessons:
+            error = validate_lesson(series, num, quality)
+            if error:
+                finish(num, "failed", error)
+                continue
+            results[num]["log"].unlink(missing_ok=True)
+            (get_lesson_dir(series, num) / COVER_SPEC_FILE).unlink(missing_ok=True)
+            prep_futures[prep_pool.submit(run_stage, num, True)] = num
+
+        # 准备与渲染交错进行：哪课准备好就立刻排进渲染池，渲染完成也立即汇报；
+        # 等封面的课在最后一课准备完成时一起生成封面
+        pending = {future: (num, "prep") for future, num in prep_futures.items()}
+        preparing = len(pending)
+        awaiting_cover = {}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                num, stage = pending.pop(future)
+                error = future.exception() or future.result()
+                if stage == "prep":
+                    preparing -= 1
+                    spec_path = get_lesson_dir(series, num) / COVER_SPEC_FILE
+                    if error:
+                        spec_path.unlink(missing_ok=True)
+                        finish(num, "failed", f"准备阶段失败: {error}")
+                    elif spec_path.exists():
+                        report(num, f"🎤 准备完成 ({results[num]['prep_seconds']:.1f}s)，等待批量生成封面")
+                        awaiting_cover[num] = spec_path
+                    else:
+                        report(num, f"🎤 准备完成 ({results[num]['prep_seconds']:.1f}s)，进入渲染队列")
+                        pending[render_pool.submit(run_stage, num, False)] = (num, "render")
+                elif error:
+                    finish(num, "failed", f"渲染失败: {error}")
+                else:
+                    finish(num, "ok")
+            if not preparing and awaiting_cover:
+                print(f"🎨 批量生成 {len(awaiting_cover)} 课封面（共用一个浏览器）", flush=True)
+                for num, error in generate_covers_batch(awaiting_cover).items():
+                    if error:
+                        finish(num, "failed", f"封面生成失败: {error}")
+                    else:
+                        pending[render_pool.submit(run_stage, num, False)] = (num, "render")
+                awaiting_cover = {}
+
+    return [results[num] for num in lessons]
+
+
+def storyboard_lessons(series: str, lesson_nums: List[str], workers: int = DEFAULT_PREP_WORKERS) -> List[dict]:
+    """
+    批量生成故事板（每课一个 manim -s 进程，workers 个并发）
+
+    Returns:
+        list: 每课一个 dict，{"lesson", "status", "seconds", "error", "contact_sheet"}
+    """
+    config = get_series_config(series)
+    lessons = [normalize_lesson_num(num, config["num_digits"]) for num in lesson_nums]
+
+    def run_one(num: str) -> dict:
+        lesson_dir = get_lesson_dir(series, num)
+        result = {"lesson": num, "status": "failed", "seconds": 0.0, "error": None,
+                  "contact_sheet": lesson_dir / STORYBOARD_DIR / CONTACT_SHEET_NAME}
+        error = validate_lesson(series, num, "ql")
+        if not error:
+            start = time.perf_counter()
+            log_path = lesson_dir / RENDER_LOG_DIR / "storyboard.log"
+            log_path.unlink(missing_ok=True)
+            error = run_lesson_stage(
+                build_storyboard_command(get_class_name(series, num)), lesson_dir, {"STORYBOARD": "true"}, log_path
+            )
+            result["seconds"] = time.perf_counter() - start
+        if error:
+            result["error"] = error
+            print(f"❌ 第{num}课故事板失败: {error}", flush=True)
+        else:
+            result["status"] = "ok"
+            print(f"🗂️ 第{num}课故事板 ({result['seconds']:.1f}s): {result['contact_sheet']}", flush=True)
+        return result
+
+    print(f"🗂️ [{config['name']}] 生成故事板 {len(lessons)} 课，并发 {workers}")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(run_one, lessons))
+
+
+def print_render_summary(results: List[dict]):
+    """打印 render-all 的每课耗时汇总表"""
+    print("\n📋 批量渲染汇总")
+    print("-" * 64)
+    print(f"{'课程':<8}{'状态':<6}{'准备(s)':>10}{'渲染(s)':>10}{'合计(s)':>10}  备注")
+    for item in results:
+        status = "✅" if item["status"] == "ok" else "❌"
+        total = item["prep_seconds"] + item["render_seconds"]
+        note = item["error"] or ""
+        print(f"{item['lesson']:<8}{status:<6}{item['prep_seconds']:>10.1f}{item['render_seconds']:>10.1f}{total:>10.1f}  {note}")
+    ok = sum(1 for item in results if item["status"] == "ok")
+    print("-" * 64)
+    print(f"成功 {ok} / {len(results)}")
+
+
 def publish_lesson(
     series: str,
     lesson_num: str,
@@ -275,6 +618,11 @@ def main():
   %(prog)s status --series moneywise 001
   %(prog)s render --series sunzi 06 --quality ql
   %(prog)s render --series zsxq 002 --force-voice
+  %(prog)s render --series sunzi 06 --incremental
+  %(prog)s render --series sunzi 06 --scene-workers 4
+  %(prog)s render --series zsxq 002 --profile
+  %(prog)s render-all --series zsxq 002 010 --workers 4
+  %(prog)s storyboard --series zsxq 002 010
   %(prog)s publish --series sunzi 06
   %(prog)s publish --series zsxq 002 --platform both --privacy public
         """,
@@ -302,6 +650,11 @@ def main():
     render_parser.add_argument("--force-cover", action="store_true", help="强制重新生成封面")
     render_parser.add_argument("--force-voice", action="store_true", help="强制重新生成语音")
     render_parser.add_argument("--quality", choices=["ql", "qh"], default="qh", help="渲染质量")
+    render_parser.add_argument("--incremental", action="store_true", help="按场景片段增量渲染，只重渲改动过的场景")
+    render_parser.add_argument("--profile", action="store_true", help="记录每个场景 / play() 的耗时，视频旁边输出 .trace.json（内存峰值需 RENDER_PROFILE=mem）")
+    render_parser.add_argument(
+        "--scene-workers", type=int, default=1, help="并行渲染场景片段的 manim 进程数（大于 1 时自动启用 --incremental）"
+    )
 
     render_all_parser = subparsers.add_parser("render-all", help="批量渲染")
     render_all_parser.add_argument("start", help="起始课程编号")
@@ -309,6 +662,15 @@ def main():
     render_all_parser.add_argument("--force-cover", action="store_true", help="强制重新生成封面")
     render_all_parser.add_argument("--force-voice", action="store_true", help="强制重新生成语音")
     render_all_parser.add_argument("--quality", choices=["ql", "qh"], default="qh", help="渲染质量")
+    render_all_parser.add_argument("--workers", "-j", type=int, default=None, help="并行渲染的 manim 进程数（默认 CPU 核数 / 4）")
+    render_all_parser.add_argument("--prep-workers", type=int, default=DEFAULT_PREP_WORKERS, help="并行准备（语音/封面/混音）的进程数")
+    render_all_parser.add_argument("--incremental", action="store_true", help="按场景片段增量渲染，只重渲改动过的场景")
+    render_all_parser.add_argument("--profile", action="store_true", help="记录每个场景 / play() 的耗时，视频旁边输出 .trace.json（内存峰值需 RENDER_PROFILE=mem）")
+
+    storyboard_parser = subparsers.add_parser("storyboard", help="只生成每个场景的缩略图和联系表（不编码视频）")
+    storyboard_parser.add_argument("start", help="起始课程编号")
+    storyboard_parser.add_argument("end", nargs="?", help="结束课程编号（默认与起始相同）")
+    storyboard_parser.add_argument("--workers", "-j", type=int, default=DEFAULT_PREP_WORKERS, help="并行的 manim 进程数")
 
     publish_parser = subparsers.add_parser("publish", help="发布视频")
     publish_parser.add_argument("lesson", help="课程编号 (如 002 / 06 / 001)")
@@ -328,6 +690,9 @@ def main():
                 args.force_cover,
                 args.force_voice,
                 args.quality,
+                args.incremental,
+                args.scene_workers,
+                args.profile,
             )
         elif args.command == "render-all":
             cfg = get_series_config(args.series)
@@ -336,16 +701,27 @@ def main():
             if start > end:
                 raise ValueError(f"起始课程编号不能大于结束课程编号: {args.start} > {args.end}")
 
-            success = True
-            for i in range(start, end + 1):
-                item_success = render_lesson(
-                    args.series,
-                    str(i),
-                    args.force_cover,
-                    args.force_voice,
-                    args.quality,
-                )
-                success = success and item_success
+            results = render_lessons_parallel(
+                args.series,
+                [str(i) for i in range(start, end + 1)],
+                args.force_cover,
+                args.force_voice,
+                args.quality,
+                workers=args.workers,
+                prep_workers=args.prep_workers,
+                incremental=args.incremental,
+                profile=args.profile,
+            )
+            print_render_summary(results)
+            success = all(item["status"] == "ok" for item in results)
+        elif args.command == "storyboard":
+            cfg = get_series_config(args.series)
+            start = int(normalize_lesson_num(args.start, cfg["num_digits"]))
+            end = int(normalize_lesson_num(args.end or args.start, cfg["num_digits"]))
+            if start > end:
+                raise ValueError(f"起始课程编号不能大于结束课程编号: {args.start} > {args.end}")
+            results = storyboard_lessons(args.series, [str(i) for i in range(start, end + 1)], workers=args.workers)
+            success = all(item["status"] == "ok" for item in results)
         elif args.command == "publish":
             success = publish_lesson(
                 args.series,
@@ -1,9 +1,12 @@
 import importlib.util
+import io
 import os
 import subprocess
 import sys
 import tempfile
+import threading
 import unittest
+from contextlib import redirect_stdout
 from pathlib import Path
 from unittest.mock import patch
 
@@ -125,5 +128,113 @@ class TestWorkflowScript(unittest.TestCase):
         self.assertIn("找不到 media-publisher 目录", proc.stdout + proc.stderr)
 
 
+class TestRenderAllScheduler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.workflow = load_workflow_module()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        series_dir = Path(self.tmp.name)
+        for num in ("01", "02", "03"):
+            lesson_dir = series_dir / f"lesson{num}"
+            lesson_dir.mkdir()
+            (lesson_dir / "animate.py").write_text("", encoding="utf-8")
+            (lesson_dir / "script.json").write_text("{}", encoding="utf-8")
+        (series_dir / "lesson04").mkdir()
+        config = dict(self.workflow.SERIES_CONFIG["sunzi"], dir=series_dir)
+        self.config_patch = patch.dict(self.workflow.SERIES_CONFIG, {"sunzi": config})
+        self.config_patch.start()
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.config_patch.stop()
+        self.tmp.cleanup()
+
+    def fake_stage(self, failing=(), covers=()):
+        def run(cmd, lesson_dir, env, log_path):
+            stage = "prep" if "--dry_run" in cmd else "render"
+            env = dict(env)
+            spec_path = env.pop("COVER_SPEC_PATH", None)
+            if stage == "prep":
+                self.assertEqual(Path(spec_path), lesson_dir / self.workflow.COVER_SPEC_FILE)
+                if lesson_dir.name in covers:
+                    Path(spec_path).parent.mkdir(parents=True, exist_ok=True)
+                    Path(spec_path).write_text(f'{{"output_path": "{lesson_dir.name}.png"}}', encoding="utf-8")
+            with self.lock:
+                self.calls.append((lesson_dir.name, stage, env))
+            if (lesson_dir.name, stage) in failing:
+                return "boom"
+            return None
+        return run
+
+    def run_all(self, lessons, failing=(), covers=(), **kwargs):
+        with patch.object(self.workflow, "run_lesson_stage", self.fake_stage(failing, covers)), redirect_stdout(io.StringIO()) as out:
+            results = self.workflow.render_lessons_parallel("sunzi", lessons, workers=2, prep_workers=2, **kwargs)
+            self.workflow.print_render_summary(results)
+        return results, out.getvalue()
+
+    def test_failure_in_one_lesson_does_not_stop_batch(self):
+        results, output = self.run_all(["1", "2", "3", "4"], failing={("lesson02", "render")}, force_voice=True)
+        self.assertEqual([item["status"] for item in results], ["ok", "failed", "ok", "failed"])
+        self.assertIn("animate.py 不存在", results[3]["error"])
+        self.assertIn("成功 2 / 4", output)
+
+        for lesson in ("lesson01", "lesson02", "lesson03"):
+            stages = [(stage, env) for name, stage, env in self.calls if name == lesson]
+            self.assertEqual([stage for stage, _ in stages], ["prep", "render"])
+            self.assertEqual(stages[0][1], {"PREPARE_ONLY": "true", "FORCE_VOICE": "true"})
+            self.assertEqual(stages[1][1], {})
+        self.assertNotIn("lesson04", [name for name, _, _ in self.calls])
+
+    def test_failed_prep_skips_render(self):
+        results, _ = self.run_all(["1", "2"], failing={("lesson01", "prep")})
+        self.assertEqual(results[0]["status"], "failed")
+        self.assertIn("准备阶段失败", results[0]["error"])
+        self.assertNotIn(("lesson01", "render"), [(name, stage) for name, stage, _ in self.calls])
+        self.assertEqual(results[1]["status"], "ok")
+
+    def test_profile_only_applies_to_render_stage(self):
+        self.run_all(["1"], profile=True)
+        self.assertEqual([(stage, env) for _, stage, env in self.calls],
+                         [("prep", {"PREPARE_ONLY": "true"}), ("render", {"RENDER_PROFILE": "true"})])
+
+    def test_covers_generated_in_one_batch_before_render(self):
+        batches = []
+
+        def fake_batch(spec_paths):
+            with self.lock:
+                batches.append(sorted(spec_paths))
+                self.calls.append(("covers", "batch", {}))
+            return {num: ("no chromium" if num == "03" else None) for num in spec_paths}
+
+        with patch.object(self.workflow, "generate_covers_batch", fake_batch):
+            results, _ = self.run_all(["1", "2", "3"], covers={"lesson01", "lesson03"}, force_cover=True)
+
+        self.assertEqual(batches, [["01", "03"]])
+        self.assertEqual([item["status"] for item in results], ["ok", "ok", "failed"])
+        self.assertIn("封面生成失败: no chromium", results[2]["error"])
+        order = [(name, stage) for name, stage, _ in self.calls]
+        self.assertLess(order.index(("covers", "batch")), order.index(("lesson01", "render")))
+        self.assertNotIn(("lesson03", "render"), order)
+        # 全部课准备完才开浏览器
+        self.assertLess(max(order.index((f"lesson0{i}", "prep")) for i in (1, 2, 3)), order.index(("covers", "batch")))
+
+    def test_storyboard_skips_animations_and_encoding(self):
+        with patch.object(self.workflow, "run_lesson_stage", self.fake_stage({("lesson02", "render")})), \
+                redirect_stdout(io.StringIO()):
+            results = self.workflow.storyboard_lessons("sunzi", ["1", "2", "4"], workers=2)
+        self.assertEqual([item["status"] for item in results], ["ok", "failed", "failed"])
+        self.assertTrue(str(results[0]["contact_sheet"]).endswith("lesson01/media/storyboard/contact_sheet.png"))
+        self.assertEqual(sorted(name for name, _, _ in self.calls), ["lesson01", "lesson02"])
+        self.assertTrue(all(env == {"STORYBOARD": "true"} for _, _, env in self.calls))
+
+        cmd = self.workflow.build_storyboard_command("Lesson01VerticalScenes")
+        self.assertIn("-s", cmd)
+        self.assertNotIn("--fps", cmd)
+        self.assertEqual(cmd[-2:], ["animate.py", "Lesson01VerticalScenes"])
+
+
 if __name__ == "__main__":
     unittest.main()
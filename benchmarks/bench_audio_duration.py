@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+音频时长读取微基准：纯 Python 帧头解析 vs ffprobe vs mutagen
+
+默认扫描 series/*/*/voice/ 下的 MP3/WAV（Edge TTS 与 CosyVoice 的产物），
+每种方式各跑 --repeat 轮，输出单个文件的平均耗时以及与 ffprobe 的最大误差。
+
+Usage:
+    python benchmarks/bench_audio_duration.py
+    python benchmarks/bench_audio_duration.py --glob "series/book_zsxq_100ke/lesson02*/voice/*.mp3" --repeat 5
+"""
+import argparse
+import glob
+import shutil
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.audio_duration import probe_audio_duration_ffprobe, read_native_duration
+
+DEFAULT_GLOBS = ("series/*/*/voice/*.mp3", "series/*/*/voice/*.wav")
+
+
+def _mutagen_duration(path):
+    import mutagen
+    return mutagen.File(path).info.length
+
+
+def available_readers():
+    """返回当前环境可用的 {名称: 读取函数}"""
+    readers = {"native": read_native_duration}
+    if shutil.which("ffprobe"):
+        readers["ffprobe"] = probe_audio_duration_ffprobe
+    try:
+        import mutagen  # noqa: F401
+        readers["mutagen"] = _mutagen_duration
+    except ImportError:
+        pass
+    return readers
+
+
+def run(paths, repeat=3):
+    """
+    对每种可用的读取方式计时
+
+    Returns:
+        dict: {名称: {"per_file_ms", "max_abs_err_vs_ffprobe"}}
+    """
+    readers = available_readers()
+    values = {}
+    results = {}
+    for name, reader in readers.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            values[name] = [reader(str(p)) for p in paths]
+        elapsed = time.perf_counter() - start
+        results[name] = {"per_file_ms": elapsed / (repeat * len(paths)) * 1000}
+
+    reference = values.get("ffprobe")
+    for name, durations in values.items():
+        if reference is None or name == "ffprobe":
+            continue
+        errors = [abs((d or 0.0) - r) for d, r in zip(durations, reference)]
+        results[name]["max_abs_err_vs_ffprobe"] = max(errors)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="音频时长读取微基准")
+    parser.add_argument("--glob", action="append", dest="globs", help="相对项目根目录的 glob，可重复")
+    parser.add_argument("--repeat", type=int, default=3, help="每种方式重复轮数")
+    args = parser.parse_args()
+
+    paths = []
+    for pattern in args.globs or DEFAULT_GLOBS:
+        paths.extend(sorted(glob.glob(str(PROJECT_ROOT / pattern))))
+    if not paths:
+        print("⚠️ 未找到音频文件，请先生成语音或通过 --glob 指定")
+        sys.exit(1)
+
+    print(f"📂 {len(paths)} 个音频文件，重复 {args.repeat} 轮")
+    for name, result in run(paths, args.repeat).items():
+        line = f"  {name:8s} {result['per_file_ms']:8.3f} ms/file"
+        if "max_abs_err_vs_ffprobe" in result:
+            line += f"   max |Δ| vs ffprobe = {result['max_abs_err_vs_ffprobe'] * 1000:.1f} ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
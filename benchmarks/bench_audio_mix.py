@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+整课混音基准：ffmpeg filter_complex vs 进程内 NumPy/soxr 流式混音
+
+生成一组合成的人声片段（24 kHz 单声道，与 Edge TTS 一致）和一首 44.1 kHz 立体声 BGM，
+两个后端各混音 --repeat 轮，输出平均耗时、NumPy 后端的 Python 堆峰值（tracemalloc），
+以及两者输出的最大样本差与信噪比。
+
+Usage:
+    python benchmarks/bench_audio_mix.py
+    python benchmarks/bench_audio_mix.py --clips 40 --clip-seconds 30 --repeat 3
+"""
+import argparse
+import math
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.anim_helper import combine_audio_clips
+
+VOICE_RATE = 24000
+BGM_RATE = 44100
+
+
+def write_wav(path, samples, rate):
+    """samples: float 数组，形状 (帧数,) 或 (帧数, 声道数)"""
+    import numpy as np
+
+    frames = samples if samples.ndim == 2 else samples[:, None]
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(frames.shape[1])
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(np.clip(np.rint(frames * 32767), -32768, 32767).astype("<i2").tobytes())
+
+
+def read_wav(path):
+    import numpy as np
+
+    with wave.open(str(path), "rb") as f:
+        data = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2")
+        return data.reshape(-1, f.getnchannels()).astype(np.float64)
+
+
+def make_fixtures(root, clips, clip_seconds, bgm_seconds):
+    """合成人声片段（不同频率的调幅正弦）和 BGM，返回 (片段路径列表, BGM 路径)"""
+    import numpy as np
+
+    paths = []
+    for i in range(clips):
+        t = np.arange(int(clip_seconds * VOICE_RATE)) / VOICE_RATE
+        tone = 0.4 * np.sin(2 * math.pi * (180 + 20 * i) * t) * (0.6 + 0.4 * np.sin(2 * math.pi * 3 * t))
+        path = Path(root) / f"{i + 1}.wav"
+        write_wav(path, tone, VOICE_RATE)
+        paths.append(str(path))
+    t = np.arange(int(bgm_seconds * BGM_RATE)) / BGM_RATE
+    bgm = np.stack([0.3 * np.sin(2 * math.pi * 220 * t), 0.3 * np.sin(2 * math.pi * 330 * t)], axis=1)
+    bgm_path = Path(root) / "bgm.wav"
+    write_wav(bgm_path, bgm, BGM_RATE)
+    return paths, str(bgm_path)
+
+
+def run(clips=20, clip_seconds=20.0, bgm_seconds=45.0, repeat=3):
+    """
+    Returns:
+        dict: {后端: {"seconds", ...}}；两个后端都可用时 "numpy" 里附带与 ffmpeg 的差异
+    """
+    backends = ["numpy"] + (["ffmpeg"] if shutil.which("ffmpeg") else [])
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths, bgm = make_fixtures(tmp, clips, clip_seconds, bgm_seconds)
+        outputs = {}
+        for backend in backends:
+            out = Path(tmp) / f"full_{backend}.wav"
+            elapsed = 0.0
+            peak = 0
+            for _ in range(repeat):
+                out.unlink(missing_ok=True)
+                if backend == "numpy":
+                    tracemalloc.start()
+                start = time.perf_counter()
+                combine_audio_clips(paths, out, silence_duration=0.3, bgm_file=bgm, bgm_volume=-15, backend=backend)
+                elapsed += time.perf_counter() - start
+                if backend == "numpy":
+                    peak = max(peak, tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+            results[backend] = {"seconds": elapsed / repeat}
+            if backend == "numpy":
+                results[backend]["peak_mb"] = peak / 1024 / 1024
+            outputs[backend] = read_wav(out)
+
+        if "ffmpeg" in outputs:
+            import numpy as np
+
+            ref, ours = outputs["ffmpeg"], outputs["numpy"]
+            n = min(len(ref), len(ours))
+            diff = ours[:n] - ref[:n]
+            noise = np.sqrt(np.mean(diff ** 2)) or 1e-9
+            results["numpy"]["frames_delta"] = len(ours) - len(ref)
+            results["numpy"]["max_abs_diff"] = float(np.max(np.abs(diff)))
+            results["numpy"]["snr_db"] = float(20 * np.log10(np.sqrt(np.mean(ref[:n] ** 2)) / noise))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="整课混音基准")
+    parser.add_argument("--clips", type=int, default=20, help="人声片段数")
+    parser.add_argument("--clip-seconds", type=float, default=20.0, help="每个片段时长（秒）")
+    parser.add_argument("--bgm-seconds", type=float, default=45.0, help="BGM 时长（秒，循环平铺）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个后端重复轮数")
+    args = parser.parse_args()
+
+    total = args.clips * args.clip_seconds
+    print(f"🎧 {args.clips} 个片段 × {args.clip_seconds:.0f}s（共 {total / 60:.1f} 分钟），重复 {args.repeat} 轮")
+    results = run(args.clips, args.clip_seconds, args.bgm_seconds, args.repeat)
+    for backend, result in results.items():
+        line = f"  {backend:7s} {result['seconds']:7.3f} s/lesson"
+        if "peak_mb" in result:
+            line += f"   Python 堆峰值 {result['peak_mb']:.1f} MB"
+        print(line)
+    if "snr_db" in results["numpy"]:
+        r = results["numpy"]
+        print(f"  numpy vs ffmpeg: SNR {r['snr_db']:.1f} dB，最大样本差 {r['max_abs_diff']:.0f}（int16），"
+              f"帧数差 {r['frames_delta']}")
+    else:
+        print("  ⚠️ 未找到 ffmpeg，只测了 NumPy 后端")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+封面基准：base64 内联图片 vs 本地路由提供图片
+
+对 series/cover/*/ 下的每张图各生成一张封面（主图与背景同一文件，附带 --icons
+指定的装饰图标），比较两种方式的 HTML 体积、HTML 构建耗时，以及在同一个常驻浏览器里
+截图的耗时（需要 playwright；没有时只报告 HTML 部分）。
+
+Usage:
+    python benchmarks/bench_cover.py
+    python benchmarks/bench_cover.py --glob "series/cover/sunzibingfa/*.jpg" --icons a.png b.png
+"""
+import argparse
+import glob
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.cover_generator import build_cover_html
+from src.utils.cover_renderer import CoverRenderer
+
+DEFAULT_GLOBS = ("series/cover/*/*.jpg", "series/cover/*/*.jpeg", "series/cover/*/*.png")
+DEFAULT_TEMPLATE_DIR = PROJECT_ROOT / ".cursor" / "skills" / "series-sunzi-adapter" / "templates"
+
+
+def build_specs(images, icons):
+    return [
+        dict(
+            template_dir=str(DEFAULT_TEMPLATE_DIR),
+            title_main="是不打架？",
+            title_sub="最好的胜利",
+            main_image_path=str(image),
+            bg_image_path=str(image),
+            header_text="孙子兵法 · 谋攻篇",
+            decoration_icons=list(icons) or None,
+        )
+        for image in images
+    ]
+
+
+def run(specs, render=True):
+    """
+    Returns:
+        dict: {"inline" | "route": {"html_bytes", "build_ms", "render_ms"(可选)}}
+    """
+    try:
+        import playwright  # noqa: F401
+    except ImportError:
+        render = False
+
+    results = {}
+    for mode, inline in (("inline", True), ("route", False)):
+        start = time.perf_counter()
+        pages = [build_cover_html(inline_images=inline, **spec) for spec in specs]
+        build_ms = (time.perf_counter() - start) * 1000
+        results[mode] = {
+            "html_bytes": sum(len(html.encode("utf-8")) for html in pages) / len(pages),
+            "build_ms": build_ms / len(pages),
+        }
+        if render:
+            with tempfile.TemporaryDirectory() as tmp, CoverRenderer(pages=1) as renderer:
+                renderer.render(pages[0], str(Path(tmp) / "warmup.png"))  # 不计浏览器启动
+                start = time.perf_counter()
+                for i, html in enumerate(pages):
+                    renderer.render(html, str(Path(tmp) / f"{i}.png"))
+                results[mode]["render_ms"] = (time.perf_counter() - start) * 1000 / len(pages)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="封面图片内联 vs 路由基准")
+    parser.add_argument("--glob", action="append", dest="globs", help="相对项目根目录的 glob，可重复")
+    parser.add_argument("--icons", nargs="*", default=[], help="装饰图标文件路径")
+    parser.add_argument("--no-render", action="store_true", help="只比较 HTML，不启动浏览器")
+    args = parser.parse_args()
+
+    images = []
+    for pattern in args.globs or DEFAULT_GLOBS:
+        images.extend(sorted(glob.glob(str(PROJECT_ROOT / pattern))))
+    if not images:
+        print("⚠️ 未找到封面素材图，请通过 --glob 指定")
+        sys.exit(1)
+
+    print(f"🖼️ {len(images)} 张素材图")
+    for mode, result in run(build_specs(images, args.icons), render=not args.no_render).items():
+        line = f"  {mode:6s} html {result['html_bytes'] / 1024:10.1f} KiB   build {result['build_ms']:7.2f} ms"
+        if "render_ms" in result:
+            line += f"   render {result['render_ms']:8.1f} ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+发音修正基准：逐词条 str.replace 循环 vs Aho–Corasick 单遍改写
+
+语料为 series/*/*/script.json 中全部 voiceover_script。--extra-entries 会往表里
+追加若干不会命中的合成词条，模拟表增长到数百条时的开销。
+
+Usage:
+    python benchmarks/bench_pronunciation.py
+    python benchmarks/bench_pronunciation.py --extra-entries 500 --repeat 20
+"""
+import argparse
+import glob
+import json
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.pronunciation import PronunciationRewriter
+
+# 与 voice_edgetts.PRONUNCIATION_FIXES 保持一致；这里单独列出，避免基准依赖 edge_tts
+DEFAULT_TABLE = {
+    "降息": "酱息",
+    "降准": "酱准",
+    "降息降准": "酱息酱准",
+    "四大行": "四大航",
+    "农商行": "农商航",
+    "城商行": "城商航",
+    "大钱放大行": "大钱放大航",
+    "一行两会": "一航两会",
+    "一行三会": "一航三会",
+}
+
+
+def legacy_fix(table, text):
+    """改造前的实现：每次调用都排序，再逐词条 replace"""
+    for word, replacement in sorted(table.items(), key=lambda x: len(x[0]), reverse=True):
+        text = text.replace(word, replacement)
+    return text
+
+
+def load_corpus():
+    texts = []
+    for path in sorted(glob.glob(str(PROJECT_ROOT / "series" / "*" / "*" / "script.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        texts.extend(s["voiceover_script"] for s in data.get("scenes", []) if s.get("voiceover_script"))
+    return texts
+
+
+def build_table(extra_entries):
+    table = dict(DEFAULT_TABLE)
+    for i in range(extra_entries):
+        table[f"词条{i:04d}号"] = f"替换{i:04d}号"
+    return table
+
+
+def run(texts, table, repeat=10):
+    """
+    Returns:
+        dict: {"legacy_ms", "automaton_ms", "compile_ms", "mismatches"}
+    """
+    start = time.perf_counter()
+    rewriter = PronunciationRewriter(table)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        legacy = [legacy_fix(table, t) for t in texts]
+    legacy_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fast = [rewriter.rewrite(t) for t in texts]
+    automaton_ms = (time.perf_counter() - start) * 1000 / repeat
+
+    return {
+        "legacy_ms": legacy_ms,
+        "automaton_ms": automaton_ms,
+        "compile_ms": compile_ms,
+        "mismatches": sum(1 for a, b in zip(legacy, fast) if a != b),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="发音修正基准")
+    parser.add_argument("--extra-entries", type=int, default=0, help="追加的合成词条数")
+    parser.add_argument("--repeat", type=int, default=10, help="重复轮数")
+    args = parser.parse_args()
+
+    texts = load_corpus()
+    if not texts:
+        print("⚠️ 未找到任何 voiceover_script")
+        sys.exit(1)
+    table = build_table(args.extra_entries)
+    result = run(texts, table, args.repeat)
+
+    print(f"📄 {len(texts)} 段口播稿，{sum(map(len, texts))} 字，词条 {len(table)} 个")
+    print(f"  legacy replace loop : {result['legacy_ms']:8.2f} ms / 全量")
+    print(f"  aho-corasick        : {result['automaton_ms']:8.2f} ms / 全量（编译 {result['compile_ms']:.2f} ms）")
+    print(f"  结果不一致的段落    : {result['mismatches']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+说话头像基准：SadTalker torch 后端 vs ONNX Runtime 后端（CPU）
+
+两个后端各启动一个常驻推理进程（device=cpu，不做面部增强），对同一张图片 + 同一段音频各跑 --repeat 次，
+输出模型加载（onnx 含首次导出）、音频到系数、face render 的平均耗时，以及 face render 的帧/秒。
+需要本机已安装 SadTalker 和模型（external/SadTalker）。
+
+Usage:
+    python benchmarks/bench_talking_head.py --image assets/avatars/frank.png --audio series/.../voice/1.mp3
+    python benchmarks/bench_talking_head.py --image face.png --audio 1.wav --size 256 --threads 8 --repeat 3
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+TOOLS_DIR = PROJECT_ROOT / "tools" / "optional_video"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.insert(0, str(TOOLS_DIR))
+
+from sadtalker_worker import SadTalkerWorker, TalkingHeadJob
+
+
+def run(image, audio, backends=("torch", "onnx"), size=256, preprocess="crop", threads=None, repeat=2, out_dir=None):
+    """
+    Returns:
+        dict: {后端: {"load_seconds", "audio_to_coeff", "face_render", "frames", "fps"}}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(out_dir or tmp)
+        for backend in backends:
+            worker = SadTalkerWorker(size=size, preprocess=preprocess, device="cpu", backend=backend, threads=threads,
+                                     on_log=lambda line: None)
+            timings = []
+            with worker:
+                for idx in range(repeat):
+                    output = out_dir / f"{backend}_{idx + 1}.mp4"
+                    result = worker.submit(TalkingHeadJob(str(image), str(audio), str(output)))
+                    if not result.get("ok"):
+                        raise RuntimeError(f"{backend} 后端生成失败: {result.get('error')}")
+                    timings.append(result)
+            frames = timings[0].get("frames") or 0
+            render = sum(r["timings"]["face_render"] for r in timings) / repeat
+            results[backend] = {
+                "load_seconds": worker.load_seconds,
+                "audio_to_coeff": sum(r["timings"]["audio_to_coeff"] for r in timings) / repeat,
+                "face_render": render,
+                "frames": frames,
+                "fps": frames / render if render else 0.0,
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="说话头像 torch / ONNX Runtime 后端基准（CPU）")
+    parser.add_argument("--image", required=True, help="人物头像图片")
+    parser.add_argument("--audio", required=True, help="驱动音频")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx"], choices=["torch", "onnx"])
+    parser.add_argument("--size", type=int, default=256, help="模型尺寸（256 / 512）")
+    parser.add_argument("--preprocess", default="crop", help="预处理模式")
+    parser.add_argument("--threads", type=int, help="onnx 后端 intra-op 线程数（默认 CPU 核数）")
+    parser.add_argument("--repeat", type=int, default=2, help="每个后端重复次数")
+    parser.add_argument("--out-dir", help="保留生成的视频，便于逐帧对比两个后端")
+    args = parser.parse_args()
+
+    print(f"🎭 {args.image} + {args.audio}（size={args.size}, preprocess={args.preprocess}），重复 {args.repeat} 次")
+    results = run(args.image, args.audio, args.backends, args.size, args.preprocess, args.threads, args.repeat,
+                  args.out_dir)
+    for backend, r in results.items():
+        print(f"  {backend:5s} 加载 {r['load_seconds']:6.1f}s   系数 {r['audio_to_coeff']:6.2f}s   "
+              f"渲染 {r['face_render']:7.2f}s（{r['frames']} 帧，{r['fps']:.2f} 帧/秒）")
+    if {"torch", "onnx"} <= results.keys() and results["torch"]["fps"]:
+        print(f"  onnx / torch 渲染速度: {results['onnx']['fps'] / results['torch']['fps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
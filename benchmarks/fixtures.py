@@ -0,0 +1,195 @@
+"""
+基准用的合成 lesson：N 个场景、M 个图标、共 K 秒音频，全部本地生成（不走 TTS、不联网）
+
+生成的目录结构与真实项目一致，LessonVertical 可以直接渲染：
+
+    root/
+      src -> 项目的 src/（符号链接）
+      assets/icons8/{doodle,color}/<subcategory>/<name>.png + *_png_metadata.json
+      series/bench_series/lesson001/
+        script.json / animate.py
+        voice/{1..N}.mp3   正弦音（WAV 内容，沿用 {idx}.mp3 文件名；时长解析器、ffmpeg、PyAV 都按内容识别）
+        images/cover_design.png
+      bgm.wav              立体声 44.1 kHz 正弦音
+      probe_mp3/{1..N}.mp3 与各片段等长的静音 MP3（Edge TTS 的 24 kHz / 48 kbps 单声道帧格式），测帧头解析
+"""
+import json
+import math
+import struct
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+VOICE_RATE = 24000
+# MPEG-2 Layer III、48 kbps、24 kHz、单声道：与 Edge TTS 输出相同的帧头，每帧 144 字节、576 个采样
+EDGE_TTS_FRAME_HEADER = b"\xff\xf3\x64\xc0"
+EDGE_TTS_FRAME_BYTES = 144
+EDGE_TTS_FRAME_SAMPLES = 576
+BGM_RATE = 44100
+LESSON_CLASS = "Lesson001VerticalScenes"
+ICON_SOURCES = ("doodle", "color")
+SUBCATEGORIES = ("business/charts", "finance/money", "people/team", "education/school")
+
+# 每个场景的标题与口播，循环使用
+TITLES = ("钱不够还想炒股", "复利的力量", "分散投资", "风险与收益", "长期主义", "现金流")
+SCRIPT = "这是一个用于性能基准的合成场景，内容不重要，长度接近真实口播稿。" * 3
+
+
+@dataclass
+class SyntheticLesson:
+    root: Path
+    lesson_dir: Path
+    icons8_dir: Path
+    clips: list
+    mp3_clips: list
+    bgm: Path
+    icon_names: list
+    params: dict = field(default_factory=dict)
+
+
+def tone_pcm(seconds, rate, freq, channels=1, amplitude=0.3):
+    """整数周期的正弦波，先生成一个周期再平铺，长音频也很快"""
+    period = max(1, round(rate / freq))
+    one = b"".join(
+        struct.pack("<h", int(amplitude * 32767 * math.sin(2 * math.pi * i / period))) * channels
+        for i in range(period)
+    )
+    frames = int(seconds * rate)
+    repeats, rest = divmod(frames, period)
+    return one * repeats + one[:rest * 2 * channels]
+
+
+def write_wav(path, pcm, rate, channels=1):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + len(pcm), b"WAVE", b"fmt ", 16, 1, channels, rate,
+        rate * channels * 2, channels * 2, 16, b"data", len(pcm),
+    )
+    path.write_bytes(header + pcm)
+    return path
+
+
+def write_silent_mp3(path, seconds):
+    """全零数据的 CBR 帧（解码为静音），帧头与 Edge TTS 一致"""
+    frames = math.ceil(seconds * VOICE_RATE / EDGE_TTS_FRAME_SAMPLES)
+    frame = EDGE_TTS_FRAME_HEADER + bytes(EDGE_TTS_FRAME_BYTES - len(EDGE_TTS_FRAME_HEADER))
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(frame * frames)
+    return path
+
+
+def png_bytes(size=64, rgba=(200, 80, 40, 255)):
+    """纯色 RGBA PNG"""
+    row = b"\x00" + bytes(rgba) * size
+    raw = zlib.compress(row * size)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    ihdr = struct.pack(">IIBBBBB", size, size, 8, 6, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", raw) + chunk(b"IEND", b"")
+
+
+def make_icons8(icons8_dir, count):
+    """在两个来源里平均生成 count 个图标，每个带一个别名；返回图标名列表"""
+    data = png_bytes()
+    names = []
+    metadata = {source: {"file_map": {}} for source in ICON_SOURCES}
+    for i in range(count):
+        source = ICON_SOURCES[i % len(ICON_SOURCES)]
+        subcategory = SUBCATEGORIES[i % len(SUBCATEGORIES)]
+        name = f"bench_icon_{i:05d}"
+        path = Path(icons8_dir) / source / subcategory / f"{name}.png"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        metadata[source]["file_map"][name] = {"subcategory": subcategory, "aliases": [f"alias_{i:05d}"]}
+        names.append(name)
+    for source, content in metadata.items():
+        (Path(icons8_dir) / f"{source}_png_metadata.json").write_text(json.dumps(content), encoding="utf-8")
+    return names
+
+
+ANIMATE_HEADER = '''import os
+import sys
+
+from manim import *
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+
+from src.animate import Zsxq100keLessonVertical
+from src.animate import CachedText as Text
+from src.utils.anim_helper import get_audio_duration
+
+
+class {class_name}(Zsxq100keLessonVertical):
+'''
+
+SCENE_TEMPLATE = '''
+    def build_scene_{idx}(self, scene):
+        duration = get_audio_duration(self.audio_clips[{pos}])
+        step = max(0.2, (duration - self.transition_time) / 4)
+        title = Text("{title}", font=self.title_font, font_size=self.font_title_size).to_edge(UP, buff=2)
+        icons = Group(*[self.load_png_icon(name, height=1.5) for name in {icons!r}]).arrange(RIGHT, buff=0.4)
+        body = Text(scene["voiceover_script"][:24], font=self.body_font, font_size=self.font_small_size).next_to(icons, DOWN, buff=0.6)
+        self.play(Write(title), run_time=step)
+        self.play(FadeIn(icons, shift=UP), run_time=step)
+        self.play(Write(body), run_time=step)
+        self.play(Circumscribe(icons), run_time=step)
+        self.play(*[FadeOut(mob) for mob in self.mobjects], run_time=self.transition_time)
+'''
+
+
+def make_lesson(root, scenes=6, icons=50, audio_seconds=60.0, icons_per_scene=3):
+    """
+    生成合成 lesson（见模块说明）
+
+    Returns:
+        SyntheticLesson
+    """
+    root = Path(root)
+    link = root / "src"
+    if not link.exists():
+        link.symlink_to(PROJECT_ROOT / "src", target_is_directory=True)
+
+    icons8_dir = root / "assets" / "icons8"
+    icon_names = make_icons8(icons8_dir, icons)
+
+    lesson_dir = root / "series" / "bench_series" / "lesson001"
+    (lesson_dir / "images").mkdir(parents=True, exist_ok=True)
+    (lesson_dir / "images" / "cover_design.png").write_bytes(png_bytes(size=96, rgba=(30, 30, 60, 255)))
+
+    clip_seconds = audio_seconds / scenes
+    clips = []
+    mp3_clips = []
+    script_scenes = []
+    methods = []
+    for pos in range(scenes):
+        idx = pos + 1
+        clips.append(write_wav(lesson_dir / "voice" / f"{idx}.mp3",
+                               tone_pcm(clip_seconds, VOICE_RATE, 200 + 20 * (pos % 10)), VOICE_RATE))
+        mp3_clips.append(str(write_silent_mp3(root / "probe_mp3" / f"{idx}.mp3", clip_seconds)))
+        script_scenes.append({"scene_index": idx, "voiceover_script": f"第{idx}段。{SCRIPT}"})
+        scene_icons = [icon_names[(pos * icons_per_scene + k) % len(icon_names)] for k in range(icons_per_scene)]
+        methods.append(SCENE_TEMPLATE.format(idx=idx, pos=pos, title=TITLES[pos % len(TITLES)], icons=scene_icons))
+
+    script = {
+        "meta": {"project_name": "基准", "lesson_number": "第001课", "title": "合成课程"},
+        "icons": [],
+        "scenes": script_scenes,
+    }
+    (lesson_dir / "script.json").write_text(json.dumps(script, ensure_ascii=False, indent=2), encoding="utf-8")
+    (lesson_dir / "animate.py").write_text(
+        ANIMATE_HEADER.format(class_name=LESSON_CLASS) + "".join(methods), encoding="utf-8"
+    )
+
+    bgm = write_wav(root / "bgm.wav", tone_pcm(30, BGM_RATE, 110, channels=2, amplitude=0.2), BGM_RATE, channels=2)
+    return SyntheticLesson(
+        root=root, lesson_dir=lesson_dir, icons8_dir=icons8_dir, clips=[str(c) for c in clips],
+        mp3_clips=mp3_clips, bgm=bgm, icon_names=icon_names,
+        params={"scenes": scenes, "icons": icons, "audio_seconds": audio_seconds},
+    )
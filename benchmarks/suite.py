@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+流水线基准套件：在合成 lesson 上分别计时各阶段，输出 JSON，并与基线比较
+
+规模（--scale）：
+    small  6 个场景、50 个图标、60 秒音频
+    large  40 个场景、2000 个图标、20 分钟音频
+也可以用 --scenes / --icons / --audio-seconds 自定义（规模名为 custom）。
+
+阶段（缺少依赖的阶段记为 skipped，不影响其他阶段）：
+    duration_probe      DurationIndex 批量探测全部片段（Edge TTS 格式 MP3 的纯 Python 帧头解析）
+    icon_index_build    从 metadata 与目录构建 IconIndex（不读编译缓存）
+    icon_lookup         精确 / 别名 / 拼错名字的模糊查找
+    pronunciation       全部口播稿过一遍发音改写
+    scene_fingerprints  场景片段指纹（增量渲染的规划开销）
+    audio_manifest      整课音频的内容哈希缓存检查（未变化时的开销）
+    audio_mix_numpy     NumPy/soxr 混音                    需要 numpy / soxr / av
+    audio_mix_ffmpeg    ffmpeg filter_complex 混音        需要 ffmpeg
+    cover_render        常驻浏览器渲染一张封面              需要 jinja2 / playwright
+    text_construct      构造每个场景的中文 Text            需要 manim
+    text_construct_cached  同上，走 text_cache 的磁盘轮廓缓存（模拟新进程命中）  需要 manim
+    lesson_prepare      manim --dry_run + PREPARE_ONLY     需要 manim
+    lesson_render       -ql 整课渲染（附 RENDER_PROFILE 的分阶段耗时）  需要 manim
+
+基线只对录制它的机器有意义（CPU 核数、已安装的依赖决定了哪些阶段会跑），因此不入库：
+先在目标机器（渲染机）上用 --save-baseline 录一份 benchmarks/baseline.json，之后用 --baseline 比较。
+--baseline 指向的文件不存在时，本次结果直接存为基线（首次运行）。
+
+Usage:
+    python benchmarks/suite.py
+    python benchmarks/suite.py --scale small large --output benchmarks/results/latest.json
+    python benchmarks/suite.py --scale small large --save-baseline          # 在渲染机上录基线
+    python benchmarks/suite.py --scale small large --baseline benchmarks/baseline.json --tolerance 0.25
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = Path(__file__).resolve().parent
+for path in (PROJECT_ROOT, BENCH_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from fixtures import LESSON_CLASS, make_lesson
+
+RESULTS_VERSION = 1
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "latest.json"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+SCALES = {
+    "small": {"scenes": 6, "icons": 50, "audio_seconds": 60.0},
+    "large": {"scenes": 40, "icons": 2000, "audio_seconds": 1200.0},
+}
+# 差值小于该值（毫秒）时不算回归，避免极快的阶段被噪声误报
+NOISE_FLOOR_MS = 2.0
+
+
+@dataclass
+class Stage:
+    name: str
+    make: object            # make(lesson) -> run()，run() 可返回附加指标 dict
+    modules: tuple = ()     # 需要可导入的模块
+    commands: tuple = ()    # 需要在 PATH 上的命令
+    repeat: int = None      # 覆盖全局 --repeat（整课渲染这类很慢的阶段）
+
+    def missing(self):
+        missing = [m for m in self.modules if importlib.util.find_spec(m) is None]
+        missing += [c for c in self.commands if shutil.which(c) is None]
+        return missing
+
+
+# ---------- 各阶段 ----------
+
+def make_duration_probe(lesson):
+    from src.utils.audio_duration import DurationIndex
+
+    def run():
+        durations = DurationIndex(probe=lambda path: 0.0).prime(lesson.mp3_clips)
+        return {"clips": len(durations), "seconds": round(sum(durations.values()), 1)}
+    return run
+
+
+def make_icon_index_build(lesson):
+    from src.utils.icon_index import IconIndex
+
+    def run():
+        index = IconIndex(lesson.icons8_dir)
+        return {"icons": len(index.files)}
+    return run
+
+
+def make_icon_lookup(lesson):
+    from src.utils.icon_index import IconIndex
+
+    index = IconIndex(lesson.icons8_dir)
+    names = lesson.icon_names[:200]
+    # 三分之一精确、三分之一别名、三分之一拼错（走三元组模糊匹配）
+    queries = [n for n in names[0::3]]
+    queries += [n.replace("bench_icon", "alias") for n in names[1::3]]
+    queries += [n.replace("icon", "icn") for n in names[2::3]]
+
+    def run():
+        index._resolved.clear()
+        found = sum(1 for q in queries if index.resolve(q))
+        return {"queries": len(queries), "found": found}
+    return run
+
+
+def make_pronunciation(lesson):
+    from src.utils.pronunciation import PronunciationRewriter
+
+    with open(lesson.lesson_dir / "script.json", encoding="utf-8") as f:
+        texts = [s["voiceover_script"] for s in json.load(f)["scenes"]]
+    table = {f"词条{i:04d}号": f"替换{i:04d}号" for i in range(500)}
+    table.update({"基准": "鸡准", "场景": "厂景"})
+    rewriter = PronunciationRewriter(table)
+
+    def run():
+        for text in texts:
+            rewriter.rewrite(text)
+        return {"texts": len(texts), "entries": len(table)}
+    return run
+
+
+def make_scene_fingerprints(lesson):
+    from src.utils.scene_segments import scene_fingerprints
+
+    def run():
+        return {"segments": len(scene_fingerprints(str(lesson.lesson_dir), ["-ql"], str(lesson.root)))}
+    return run
+
+
+def make_audio_manifest(lesson):
+    from src.utils import audio_manifest
+
+    params = {"silence_duration": 0, "bgm_volume": -15, "bgm_loop": True}
+    previous = audio_manifest.build_manifest(lesson.clips, str(lesson.bgm), params)
+
+    def run():
+        audio_manifest.build_manifest(lesson.clips, str(lesson.bgm), params, previous)
+    return run
+
+
+def _make_mix(backend):
+    def make(lesson):
+        from src.utils.anim_helper import combine_audio_clips
+
+        out = lesson.root / f"full_{backend}.wav"
+
+        def run():
+            out.unlink(missing_ok=True)
+            Path(f"{out.parent}/.{out.name}.json").unlink(missing_ok=True)
+            combine_audio_clips(lesson.clips, out, bgm_file=str(lesson.bgm), bgm_volume=-15, backend=backend)
+        return run
+    return make
+
+
+def make_cover_render(lesson):
+    from src.utils.cover_generator import generate_cover
+
+    cover = str(lesson.lesson_dir / "images" / "cover_design.png")
+    out = lesson.root / "bench_cover.png"
+    template_dir = PROJECT_ROOT / ".cursor" / "skills" / "series-sunzi-adapter" / "templates"
+
+    def run():
+        generate_cover(
+            template_dir=str(template_dir), title_main="基准封面", title_sub="合成课程",
+            main_image_path=cover, bg_image_path=cover, header_text="基准 · 第001课",
+            output_path=str(out),
+        )
+    return run
+
+
+def make_text_construct(lesson):
+    from manim import Text
+
+    with open(lesson.lesson_dir / "script.json", encoding="utf-8") as f:
+        texts = [s["voiceover_script"][:24] for s in json.load(f)["scenes"]]
+
+    def run():
+        for text in texts:
+            Text(text, font_size=36)
+        return {"texts": len(texts)}
+    return run
+
+
+def make_text_construct_cached(lesson):
+    from src.utils import text_cache
+
+    text_cache._shared_cache = cache = text_cache.TextOutlineCache(cache_dir=str(lesson.root / "text_outlines"))
+    cached_text = text_cache.get_cached_text_class()
+    with open(lesson.lesson_dir / "script.json", encoding="utf-8") as f:
+        texts = [s["voiceover_script"][:24] for s in json.load(f)["scenes"]]
+    for text in texts:
+        cached_text(text, font_size=36)
+
+    def run():
+        cache.forget()
+        cache.saved_ms = 0.0
+        for text in texts:
+            cached_text(text, font_size=36)
+        return {"texts": len(texts), "saved_ms": round(cache.saved_ms, 1)}
+    return run
+
+
+def _manim_cmd(*extra):
+    return [sys.executable, "-m", "manim", "-ql", "--disable_caching", "--media_dir", "media", *extra,
+            "animate.py", LESSON_CLASS]
+
+
+def _run_lesson(lesson, cmd, env):
+    subprocess.run(cmd, cwd=lesson.lesson_dir, env={**os.environ, **env}, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def make_lesson_prepare(lesson):
+    def run():
+        _run_lesson(lesson, _manim_cmd("--dry_run"), {"PREPARE_ONLY": "true"})
+    return run
+
+
+def make_lesson_render(lesson):
+    def run():
+        _run_lesson(lesson, _manim_cmd(), {"RENDER_PROFILE": "true"})
+        traces = list((lesson.lesson_dir / "media").rglob(f"{LESSON_CLASS}.trace.json"))
+        if not traces:
+            return None
+        with open(traces[0], encoding="utf-8") as f:
+            events = json.load(f)["traceEvents"]
+        # 分阶段耗时（来自 render_profiler 的 span）
+        return {
+            f"{e['name']}_ms": round(e["dur"] / 1000, 1)
+            for e in events if e.get("ph") == "X" and e.get("cat") == "stage"
+        }
+    return run
+
+
+STAGES = [
+    Stage("duration_probe", make_duration_probe),
+    Stage("icon_index_build", make_icon_index_build),
+    Stage("icon_lookup", make_icon_lookup),
+    Stage("pronunciation", make_pronunciation),
+    Stage("scene_fingerprints", make_scene_fingerprints),
+    Stage("audio_manifest", make_audio_manifest),
+    Stage("audio_mix_numpy", _make_mix("numpy"), modules=("numpy", "soxr", "av")),
+    Stage("audio_mix_ffmpeg", _make_mix("ffmpeg"), commands=("ffmpeg",)),
+    Stage("cover_render", make_cover_render, modules=("jinja2", "playwright")),
+    Stage("text_construct", make_text_construct, modules=("manim",)),
+    Stage("text_construct_cached", make_text_construct_cached, modules=("manim",)),
+    Stage("lesson_prepare", make_lesson_prepare, modules=("manim", "edge_tts"), repeat=1),
+    Stage("lesson_render", make_lesson_render, modules=("manim", "edge_tts"), repeat=1),
+]
+
+
+# ---------- 运行与比较 ----------
+
+def time_stage(stage, lesson, repeat):
+    """计时一个阶段：setup（make）不计入；返回 {"median_ms", "min_ms", "runs", ...附加指标}"""
+    missing = stage.missing()
+    if missing:
+        return {"skipped": f"缺少 {', '.join(missing)}"}
+    try:
+        run = stage.make(lesson)
+        samples = []
+        extra = None
+        for _ in range(stage.repeat or repeat):
+            start = time.perf_counter()
+            extra = run()
+            samples.append((time.perf_counter() - start) * 1000)
+    except Exception as exc:  # 单个阶段失败不影响其余阶段
+        return {"error": f"{type(exc).__name__}: {exc}"}
+    result = {"median_ms": round(statistics.median(samples), 3), "min_ms": round(min(samples), 3), "runs": len(samples)}
+    result.update(extra or {})
+    return result
+
+
+def environment():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                             capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "git_rev": rev,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run_suite(scales, repeat=3, only=None, log=print):
+    """
+    Args:
+        scales: {规模名: {"scenes", "icons", "audio_seconds"}}
+        only: 只跑这些阶段（None 为全部）
+
+    Returns:
+        dict: {"version", "env", "scales": {规模名: {"params", "stages": {阶段: 结果}}}}
+    """
+    results = {"version": RESULTS_VERSION, "env": environment(), "scales": {}}
+    stages = [s for s in STAGES if not only or s.name in only]
+    for scale_name, params in scales.items():
+        with tempfile.TemporaryDirectory(prefix="yyy-bench-") as tmp:
+            start = time.perf_counter()
+            lesson = make_lesson(tmp, **params)
+            log(f"🧪 [{scale_name}] {params}（生成夹具 {time.perf_counter() - start:.1f}s）")
+            stage_results = {}
+            for stage in stages:
+                stage_results[stage.name] = result = time_stage(stage, lesson, repeat)
+                log(f"   {format_result(stage.name, result)}")
+        results["scales"][scale_name] = {"params": params, "stages": stage_results}
+    return results
+
+
+def format_result(name, result):
+    if "skipped" in result:
+        return f"{name:20s} ⏭️  {result['skipped']}"
+    if "error" in result:
+        return f"{name:20s} ❌ {result['error']}"
+    return f"{name:20s} {result['median_ms']:10.2f} ms (min {result['min_ms']:.2f}, n={result['runs']})"
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    与基线比较：同一规模（参数一致）同一阶段，中位数超过基线 (1 + tolerance) 倍且差值超过噪声下限即为回归
+
+    Returns:
+        list: [{"scale", "stage", "baseline_ms", "current_ms", "ratio", "regression"}, ...]
+    """
+    rows = []
+    for scale_name, scale in results["scales"].items():
+        base_scale = baseline.get("scales", {}).get(scale_name)
+        if not base_scale or base_scale.get("params") != scale["params"]:
+            continue
+        for stage, result in scale["stages"].items():
+            base = base_scale["stages"].get(stage, {})
+            if "median_ms" not in result or "median_ms" not in base:
+                continue
+            ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+            regression = ratio > 1 + tolerance and result["median_ms"] - base["median_ms"] > NOISE_FLOOR_MS
+            rows.append({
+                "scale": scale_name, "stage": stage, "baseline_ms": base["median_ms"],
+                "current_ms": result["median_ms"], "ratio": round(ratio, 3), "regression": regression,
+            })
+    return rows
+
+
+def write_json(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流水线基准套件")
+    parser.add_argument("--scale", nargs="+", choices=sorted(SCALES), default=["small"], help="预设规模，可多选")
+    parser.add_argument("--scenes", type=int, help="自定义场景数（与 --icons / --audio-seconds 一起组成 custom 规模）")
+    parser.add_argument("--icons", type=int, help="自定义图标数")
+    parser.add_argument("--audio-seconds", type=float, help="自定义音频总时长（秒）")
+    parser.add_argument("--only", nargs="+", choices=[s.name for s in STAGES], help="只跑指定阶段")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段重复次数（取中位数）")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="结果 JSON 路径")
+    parser.add_argument("--baseline", help=f"与基线比较（如 {DEFAULT_BASELINE.relative_to(PROJECT_ROOT)}），有回归时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的变慢比例")
+    parser.add_argument("--save-baseline", action="store_true", help=f"把本次结果写成基线 {DEFAULT_BASELINE.relative_to(PROJECT_ROOT)}")
+    args = parser.parse_args()
+
+    scales = {name: SCALES[name] for name in args.scale}
+    if args.scenes or args.icons or args.audio_seconds:
+        scales = {"custom": {
+            "scenes": args.scenes or SCALES["small"]["scenes"],
+            "icons": args.icons or SCALES["small"]["icons"],
+            "audio_seconds": args.audio_seconds or SCALES["small"]["audio_seconds"],
+        }}
+
+    results = run_suite(scales, repeat=args.repeat, only=args.only)
+    write_json(args.output, results)
+    print(f"📄 结果: {args.output}")
+    if args.save_baseline:
+        write_json(DEFAULT_BASELINE, results)
+        print(f"📌 基线已更新: {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            write_json(args.baseline, results)
+            print(f"📌 基线不存在，已把本次结果存为本机基线: {args.baseline}")
+            return
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        base_env = baseline.get("env", {})
+        if (base_env.get("machine"), base_env.get("cpu_count")) != (results["env"]["machine"], results["env"]["cpu_count"]):
+            print("⚠️ 基线来自不同的机器（架构或 CPU 核数不同），比较结果仅供参考；请在本机用 --save-baseline 重新录制")
+        rows = compare(results, baseline, args.tolerance)
+        print(f"\n📊 与基线比较（容差 {args.tolerance:.0%}）")
+        for row in rows:
+            mark = "🔺" if row["regression"] else "  "
+            print(f" {mark} {row['scale']:6s} {row['stage']:20s} {row['baseline_ms']:10.2f} → {row['current_ms']:10.2f} ms  ×{row['ratio']:.2f}")
+        regressions = [row for row in rows if row["regression"]]
+        if regressions:
+            print(f"❌ {len(regressions)} 个阶段变慢超过容差")
+            sys.exit(1)
+        print("✅ 没有超过容差的回归")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.
 # 导入工具
 from src.utils.anim_helper import get_audio_duration
 from src.animate import Zsxq100keLessonVertical
+from src.animate import CachedText as Text
 
 
 class Lesson023VerticalScenes(Zsxq100keLessonVertical):
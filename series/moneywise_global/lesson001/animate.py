@@ -10,6 +10,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.
 # Import tools
 from src.utils.anim_helper import get_audio_duration
 from src.animate.lesson_vertical import MoneyWiseLessonVertical
+from src.animate import CachedText as Text
 
 class Lesson001VerticalScenes(MoneyWiseLessonVertical):
     """
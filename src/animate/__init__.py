@@ -1,4 +1,4 @@
 """动画基类模块"""
-from .lesson_vertical import LessonVertical, MoneyWiseLessonVertical, SunziLessonVertical, Zsxq100keLessonVertical
+from .lesson_vertical import CachedText, LessonVertical, MoneyWiseLessonVertical, SunziLessonVertical, Zsxq100keLessonVertical
 
-__all__ = ['LessonVertical', 'SunziLessonVertical', 'Zsxq100keLessonVertical', 'MoneyWiseLessonVertical']
+__all__ = ['CachedText', 'LessonVertical', 'SunziLessonVertical', 'Zsxq100keLessonVertical', 'MoneyWiseLessonVertical']
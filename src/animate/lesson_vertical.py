@@ -10,8 +10,17 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")
 
 # 导入工具
 from src.utils.anim_helper import get_audio_duration, combine_audio_clips, load_png_icon
+from src.utils.audio_duration import prime_audio_durations
+from src.utils.icon_index import get_icon_index
+from src.utils.image_cache import get_image_cache
 from src.utils.voice_edgetts import gen_voice_clips_from_json
-from src.utils.cover_generator import generate_cover
+from src.utils.cover_generator import generate_cover, save_cover_spec
+from src.utils.render_profiler import TRACE_SUFFIX, describe_animations, profiler_from_env
+from src.utils.storyboard import CONTACT_SHEET_NAME, STORYBOARD_DIR, build_contact_sheet, storyboard_tiles
+from src.utils.text_cache import get_cached_text_class, get_text_outline_cache
+
+# 纯文本字形走跨 lesson 的磁盘轮廓缓存；lesson 用 `from src.animate import CachedText as Text` 显式启用
+CachedText = get_cached_text_class()
 
 # 默认配置（可以在 construct 中被 JSON 覆盖）
 config.pixel_height = 1920
@@ -41,9 +50,13 @@ class LessonVertical(Scene, ABC):
     font_style = "modern"    # "classical" 或 "modern"
     default_decoration_icons = ["🔍", "💡", "📚"]  # 默认装饰图标
     voice_name = "zh-CN-YunxiNeural"  # Edge TTS 语音，子类可覆盖
+    voice_concurrency = 4  # Edge TTS 并发合成数
+    pronunciation_table_file = None  # 系列发音修正表（每行 `词<TAB>替换词`），子类可覆盖
     icon_list_file = "icons_finance.txt"  # 图标列表文件，子类可覆盖
     icon_list_dir = None  # 图标列表目录，子类可覆盖（None 则回退到 assets/icons8/）
     cover_template_dir = None  # 封面 HTML 模板目录，子类可覆盖（None 则用 source_images_dir）
+    storyboard_dir = None  # 故事板模式下缩略图目录（见 is_storyboard），否则为 None
+    profiler = None  # RENDER_PROFILE=true/mem 时为 RenderProfiler，记录每个场景 / play() 的开销
     
     def construct(self):
         # 获取子类的文件路径（通过模块获取）
@@ -68,9 +81,61 @@ class LessonVertical(Scene, ABC):
         if 'icons' in self.script_data:
             self.default_decoration_icons = self.script_data["icons"]
 
+        self.profiler = profiler_from_env()
+
         self.setup_paths(self.script_json_path)
-        self.prepare_resources()
-        self.build_scenes()
+        self.profiled("prepare_resources", "stage", self.prepare_resources)
+        # PREPARE_ONLY=true（workflow render-all 的准备阶段）：只生成语音/封面/混音，不构建场景
+        if os.getenv("PREPARE_ONLY", "False").lower() == "true":
+            print("✅ Resources prepared (PREPARE_ONLY), skipping scenes")
+            return
+        self.profiled("build_scenes", "stage", self.build_scenes)
+        if self.storyboard_dir:
+            self.write_contact_sheet()
+        self.report_render_stats()
+        if self.profiler:
+            self.write_profile()
+
+    def report_render_stats(self):
+        """渲染结束时打印资源查找/缓存统计"""
+        for report in (
+            get_icon_index(self.project_root).lookup_report(),
+            get_image_cache().report(),
+            get_text_outline_cache().report(),
+        ):
+            if report:
+                print(report)
+
+    def profiled(self, name, cat, func, *args, **kwargs):
+        """开启剖析时把 func 包在一个 span 里，记录产出的帧数和结束时的 mobject 数"""
+        if self.profiler is None:
+            return func(*args, **kwargs)
+        start_time = self.renderer.time
+        with self.profiler.span(name, cat) as info:
+            result = func(*args, **kwargs)
+            if not self.renderer.skip_animations:
+                info["frames"] = round((self.renderer.time - start_time) * config.frame_rate)
+            info["mobjects"] = len(self.mobjects)
+            info["family"] = len(self.get_mobject_family_members())
+        return result
+
+    def write_profile(self):
+        """把 trace 写到视频旁边（{视频名}.trace.json），并打印最慢的场景和动画"""
+        movie_path = getattr(self.renderer.file_writer, "movie_file_path", None)
+        if movie_path:
+            trace_path = os.path.splitext(str(movie_path))[0] + TRACE_SUFFIX
+        else:
+            trace_path = os.path.join(self.media_dir, "profiles", f"{type(self).__name__}{TRACE_SUFFIX}")
+        self.profiler.write(trace_path, metadata={
+            "lesson": os.path.basename(self.lesson_dir),
+            "scene_class": type(self).__name__,
+            "resolution": f"{config.pixel_width}x{config.pixel_height}",
+            "frame_rate": config.frame_rate,
+        })
+        report = self.profiler.report()
+        if report:
+            print(report)
+        print(f"⏱️ Render profile: {trace_path}")
 
     def setup_paths(self, script_path):
         """设置相关目录路径"""        
@@ -83,6 +148,10 @@ class LessonVertical(Scene, ABC):
         
         self.combined_wav_path = os.path.join(self.voice_dir, "full_audio.wav")
         self.cover_path = os.path.join(self.images_dir, "cover_design.png")
+        if self.is_storyboard():
+            self.storyboard_dir = os.path.join(self.lesson_dir, STORYBOARD_DIR)
+            self._storyboard_frame = None
+            self._storyboard_saved = set()
         
         # 源图片目录 (用于封面随机图等) - 使用 series_name 配置
         project_root = os.path.abspath(os.path.join(self.lesson_dir, "../../.."))
@@ -171,85 +240,100 @@ class LessonVertical(Scene, ABC):
             if Path(path).exists():
                 return path
         
-        # 方法2: 递归搜索所有子目录（兜底）
-        icons8_dir = Path(self.project_root) / "assets" / "icons8"
-        for subdir in ["color", "stickers", "plasticine", "doodle"]:
-            icon_dir = icons8_dir / subdir
-            if icon_dir.exists():
-                for png_file in icon_dir.rglob(f"{icon_name}.png"):
-                    return str(png_file.resolve())
+        # 方法2: 按文件名在图标索引中查找（兜底）
+        return get_icon_index(self.project_root).find_file(icon_name)
+
+    def build_cover_spec(self):
+        """
+        组装封面参数（随机选主图、解析装饰图标）
+
+        Returns:
+            dict: generate_cover / generate_covers 的关键字参数；没有可用主图时返回 None
+        """
+        main_image = None
+        if os.path.exists(self.source_images_dir):
+            valid_images = [
+                os.path.join(self.source_images_dir, f) 
+                for f in os.listdir(self.source_images_dir) 
+                if f.lower().endswith(('.jpg', '.jpeg', '.png'))
+            ]
+            if valid_images:
+                main_image = random.choice(valid_images)
         
-        return None
+        if not main_image:
+            print("⚠️ No source image found for cover!")
+            return None
+
+        meta = self.script_data.get("meta", {})
+
+        # 获取装饰图标（子类可以覆盖 get_cover_decoration_icons 方法）
+        decoration_icons = self.get_cover_decoration_icons()
+        # 将图标名称转换为文件路径（如果是图标名称）
+        decoration_icons_processed = []
+        for icon in decoration_icons:
+            if isinstance(icon, str):
+                # 检查是否是文件路径
+                if os.path.exists(icon):
+                    decoration_icons_processed.append(icon)
+                else:
+                    # 尝试查找图标文件
+                    icon_path = self.find_icon_file_path(icon)
+                    if icon_path:
+                        decoration_icons_processed.append(icon_path)
+                    elif len(icon) <= 4:
+                        # 短字符串（如 emoji）可以直接使用
+                        decoration_icons_processed.append(icon)
+                    else:
+                        # 找不到图标文件，打印警告并跳过
+                        print(f"⚠️ 图标未找到，已跳过: {icon}")
+            else:
+                decoration_icons_processed.append(icon)
+
+        resolved_template_dir = self.cover_template_dir or self.source_images_dir
+        return dict(
+            output_path=self.cover_path,
+            template_dir=resolved_template_dir,
+            title_main=meta.get("lesson_title", "未命名课程"),
+            title_sub=meta.get("lesson_sub_title", ""),
+            main_image_path=os.path.abspath(main_image),
+            header_text=f'{meta.get("project_name")} · {meta.get("lesson_number")}',
+            toc_items=None,  # 不再显示目录
+            decoration_icons=decoration_icons_processed
+        )
 
     def prepare_resources(self):
-        """生成语音和封面"""
+        """
+        生成语音和封面
+
+        片段模式（设置了 RENDER_SCENES，scene_segments 为每个场景各启动一个 manim 进程）下，
+        语音、封面、混音和时长 sidecar 都已由父进程的准备阶段完成；这些进程并行运行，这里只读不写。
+        """
         # 新加环境变量FORCE_COVER，如果为True，则强制生成封面；FORCE_VOICE，如果为True，则强制生成语音
         force_cover = os.getenv("FORCE_COVER", "False").lower() == "true"
         force_voice = os.getenv("FORCE_VOICE", "False").lower() == "true"
+        segment_only = self.get_scene_selection() is not None
 
-        # 1. 语音
-        if force_voice or not os.path.exists(self.voice_dir) or not os.listdir(self.voice_dir):
-            print(f"🎤 Generating voice clips (voice: {self.voice_name})...")
+        if not segment_only:
+            # 1. 语音（增量：只重新合成 voiceover_script 变化的场景，其余从共享缓存链接）
+            print(f"🎤 Syncing voice clips (voice: {self.voice_name})...")
             # 使用保存的 script_json_path 和子类指定的音色
-            gen_voice_clips_from_json(self.script_json_path, self.voice_dir, voice=self.voice_name)
+            gen_voice_clips_from_json(
+                self.script_json_path, self.voice_dir,
+                voice=self.voice_name, concurrency=self.voice_concurrency, force=force_voice,
+                pronunciation_file=self.pronunciation_table_file,
+            )
 
-        # 2. 封面
-        if force_cover or not os.path.exists(self.cover_path):
-            print("🎨 Generating cover image...")
-            os.makedirs(self.images_dir, exist_ok=True)
-            
-            main_image = None
-            if os.path.exists(self.source_images_dir):
-                valid_images = [
-                    os.path.join(self.source_images_dir, f) 
-                    for f in os.listdir(self.source_images_dir) 
-                    if f.lower().endswith(('.jpg', '.jpeg', '.png'))
-                ]
-                if valid_images:
-                    main_image = random.choice(valid_images)
-            
-            # 如果没有找到图，使用 placeholder 或报错 (这里暂且跳过报错，allow None might fail in generator)
-            if not main_image:
-                 print("⚠️ No source image found for cover!")
-                 # 可以设置一个默认图
-            
-            if main_image:
-                meta = self.script_data.get("meta", {})
-                
-                # 获取装饰图标（子类可以覆盖 get_cover_decoration_icons 方法）
-                decoration_icons = self.get_cover_decoration_icons()
-                # 将图标名称转换为文件路径（如果是图标名称）
-                decoration_icons_processed = []
-                for icon in decoration_icons:
-                    if isinstance(icon, str):
-                        # 检查是否是文件路径
-                        if os.path.exists(icon):
-                            decoration_icons_processed.append(icon)
-                        else:
-                            # 尝试查找图标文件
-                            icon_path = self.find_icon_file_path(icon)
-                            if icon_path:
-                                decoration_icons_processed.append(icon_path)
-                            elif len(icon) <= 4:
-                                # 短字符串（如 emoji）可以直接使用
-                                decoration_icons_processed.append(icon)
-                            else:
-                                # 找不到图标文件，打印警告并跳过
-                                print(f"⚠️ 图标未找到，已跳过: {icon}")
-                    else:
-                        decoration_icons_processed.append(icon)
-                
-                resolved_template_dir = self.cover_template_dir or self.source_images_dir
-                generate_cover(
-                    output_path=self.cover_path,
-                    template_dir=resolved_template_dir,
-                    title_main=meta.get("lesson_title", "未命名课程"),
-                    title_sub=meta.get("lesson_sub_title", ""),
-                    main_image_path=os.path.abspath(main_image),
-                    header_text=f'{meta.get("project_name")} · {meta.get("lesson_number")}',
-                    toc_items=None,  # 不再显示目录
-                    decoration_icons=decoration_icons_processed
-                )
+            # 2. 封面（render-all 设置 COVER_SPEC_PATH：只写出参数，所有课准备完后由 workflow 共用一个浏览器批量生成）
+            if force_cover or not os.path.exists(self.cover_path):
+                os.makedirs(self.images_dir, exist_ok=True)
+                cover_spec = self.build_cover_spec()
+                spec_path = os.getenv("COVER_SPEC_PATH")
+                if cover_spec and spec_path:
+                    print(f"🎨 Cover spec saved for batch generation: {spec_path}")
+                    save_cover_spec(spec_path, cover_spec)
+                elif cover_spec:
+                    print("🎨 Generating cover image...")
+                    generate_cover(**cover_spec)
 
         # 3. 合成 BGM
         self.audio_clips = []
@@ -259,13 +343,21 @@ class LessonVertical(Scene, ABC):
                 # 兼容 utils/voice.py 的输出逻辑：直接使用 idx 作为文件名 (e.g., "1.mp3")
                 filename = f"{idx}.mp3"
                 self.audio_clips.append(os.path.join(self.voice_dir, filename))
-            
+
+        # 一次性批量探测所有片段时长，build_scene_N 里的 get_audio_duration 只做查表
+        # （片段模式只读 sidecar，不写回）
+        prime_audio_durations(self.audio_clips, sidecar_dir=None if segment_only else self.voice_dir)
+
+        # 故事板只要画面，不混音；片段模式不挂音轨，整课音频在拼接后一次性混入
+        if self.storyboard_dir or segment_only:
+            return
+
         # BGM 文件路径：series/bgm/{series_name}/bgm.wav
         bgm_file = os.path.join(self.project_root, "series", "bgm", self.series_name, "bgm.wav")
         if not os.path.exists(bgm_file):
             print(f"⚠️ BGM not found at {bgm_file}, skipping BGM")
             bgm_file = None
-        
+
         full_audio = combine_audio_clips(
             self.audio_clips, 
             self.combined_wav_path, 
@@ -274,61 +366,121 @@ class LessonVertical(Scene, ABC):
             bgm_volume=-15,
             bgm_loop=True
         )
-        self.add_sound(full_audio)
+        if os.getenv("PREPARE_ONLY", "False").lower() != "true":
+            self.add_sound(full_audio)
+
+    def is_storyboard(self):
+        """STORYBOARD=true（workflow storyboard，配合 manim -s）：跳过动画、不编码视频，只保存每个场景的缩略图"""
+        return os.getenv("STORYBOARD", "False").lower() == "true"
+
+    def get_scene_selection(self):
+        """
+        读取 RENDER_SCENES 环境变量（如 "0" 或 "3,4"），只渲染这些场景；0 表示封面首帧
+
+        Returns:
+            set: 场景索引集合；未设置时返回 None（渲染全部）
+        """
+        value = os.getenv("RENDER_SCENES", "").strip()
+        if not value:
+            return None
+        return {int(part) for part in value.split(",") if part.strip()}
        
     def build_scenes(self):
         """构建所有场景"""
         scenes = self.script_data.get("scenes", [])
+        selection = self.get_scene_selection()
        
-       # 0. 插入封面首帧
-        if os.path.exists(self.cover_path):
-            print(f"Adding cover image to scene: {self.cover_path}")
-            cover_img = ImageMobject(self.cover_path)
-            cover_img.height = config.frame_height
-            self.add(cover_img)
-            self.wait(0.5) # 增加停留时间，确保可见
-            self.remove(cover_img)
-        else:
-            print(f"Warning: Cover image not found at {self.cover_path}")
+       # 0. 插入封面首帧（片段模式下只有选中 0 号时才插入；故事板直接把封面放进联系表）
+        if (selection is None or 0 in selection) and not self.storyboard_dir:
+            if os.path.exists(self.cover_path):
+                print(f"Adding cover image to scene: {self.cover_path}")
+                cover_img = ImageMobject(self.cover_path)
+                cover_img.height = config.frame_height
+                self.add(cover_img)
+                self.wait(0.5) # 增加停留时间，确保可见
+                self.remove(cover_img)
+            else:
+                print(f"Warning: Cover image not found at {self.cover_path}")
 
         # 主要的 manim 动画生成的代码，请放在这里。
         self.build_all_scenes(scenes)
 
     def build_all_scenes(self, scenes):
         """构建所有场景（默认实现：根据场景索引调用对应的 build_scene_{scene_index} 方法）"""
+        selection = self.get_scene_selection()
         for scene in scenes:
             scene_index = scene.get("scene_index")
             if scene_index is None:
                 continue
+            if selection is not None and scene_index not in selection:
+                continue
                 
             # 根据场景索引调用对应的构建方法
             method_name = f"build_scene_{scene_index}"
             if hasattr(self, method_name):
-                getattr(self, method_name)(scene)
+                self.profiled(method_name, "scene", getattr(self, method_name), scene)
+                if self.storyboard_dir:
+                    self.save_storyboard_thumbnail(scene_index)
             else:
                 # 如果没有对应的构建方法，抛出异常提示需要实现
                 raise NotImplementedError(f"build_scene_{scene_index} method not implemented for scene {scene_index}")
     
-    def load_png_icon(self, icon_name, height=2):
+    def load_png_icon(self, icon_name, height=2, max_scale=None):
         """
         加载 PNG 图标（便捷方法）
         
         Args:
             icon_name: 图标名称（不含扩展名）
             height: 图标高度（Manim 单位，默认 2）
+            max_scale: 场景里对图标的最大放大倍数；给定时预缩放像素以省内存（默认保留原图分辨率）
             
         Returns:
             ImageMobject 或回退的图标对象
         """
-        return load_png_icon(icon_name, project_root=self.project_root, height=height)
+        return load_png_icon(icon_name, project_root=self.project_root, height=height, max_scale=max_scale)
+
+    def current_frame(self):
+        """当前画面；跳过动画时 camera 不会逐帧更新，需要先按当前状态画一帧"""
+        if self.renderer.skip_animations:
+            self.renderer.update_frame(self)
+        return self.camera.get_image()
 
-    def save_scene_thumbnail(self, scene_index):
-        """保存当前帧为场景缩略图"""
-        os.makedirs(self.images_dir, exist_ok=True)
-        thumbnail_path = os.path.join(self.images_dir, f"{scene_index}.png")
-        self.camera.get_image().save(thumbnail_path)
+    def save_scene_thumbnail(self, scene_index, image=None):
+        """保存当前帧为场景缩略图（故事板模式下写到 media/storyboard/）"""
+        thumbnail_dir = self.storyboard_dir or self.images_dir
+        os.makedirs(thumbnail_dir, exist_ok=True)
+        thumbnail_path = os.path.join(thumbnail_dir, f"{scene_index}.png")
+        (image if image is not None else self.current_frame()).save(thumbnail_path)
+        if self.storyboard_dir:
+            self._storyboard_saved.add(scene_index)
         print(f"Saved scene {scene_index} thumbnail: {thumbnail_path}")
 
+    def play(self, *args, **kwargs):
+        # Scene.wait 内部也走 play(Wait(...))，所以等待时间在这里按 Wait 记一次，不单独包装 wait
+        # 故事板模式：场景收尾的 FadeOut（全是 remover 的 play）之前把画面定格下来
+        if self.storyboard_dir and self.mobjects and args and all(getattr(a, "remover", False) for a in args):
+            self._storyboard_frame = self.current_frame()
+        if self.profiler is None:
+            return super().play(*args, **kwargs)
+        return self.profiled(describe_animations(args), "play", super().play, *args, **kwargs)
+
+    def save_storyboard_thumbnail(self, scene_index):
+        """场景结束时保存故事板缩略图（场景里已经调用过 save_scene_thumbnail 的不再覆盖）"""
+        frame, self._storyboard_frame = self._storyboard_frame, None
+        if scene_index in self._storyboard_saved:
+            return
+        # 场景结束时画面上还有内容（没有收尾 FadeOut），以终态为准
+        if self.mobjects or frame is None:
+            frame = self.current_frame()
+        self.save_scene_thumbnail(scene_index, image=frame)
+
+    def write_contact_sheet(self):
+        """把封面和本次渲染的各场景缩略图拼成 media/storyboard/contact_sheet.png（已删除场景的旧缩略图不上表）"""
+        tiles = storyboard_tiles(self.storyboard_dir, cover_path=self.cover_path, scene_indices=self._storyboard_saved)
+        sheet_path = build_contact_sheet(tiles, os.path.join(self.storyboard_dir, CONTACT_SHEET_NAME))
+        if sheet_path:
+            print(f"🗂️ Storyboard contact sheet ({len(tiles)} tiles): {sheet_path}")
+
 
 # ========== 系列专用子类（仅配置差异） ==========
 
@@ -359,7 +511,7 @@ class SunziLessonVertical(LessonVertical):
         
         step_time = (page_duration - t_trans) / 7
 
-        q_text = Text("挑战小小谋略家", font=self.title_font, font_size=self.font_title_size, color=WHITE)
+        q_text = CachedText("挑战小小谋略家", font=self.title_font, font_size=self.font_title_size, color=WHITE)
         q_bg = RoundedRectangle(width=5, height=1.2, corner_radius=0.6, color=BLUE, fill_opacity=0.8)
         q_header = VGroup(q_bg, q_text).move_to(UP * 4.0)
         
@@ -369,7 +521,7 @@ class SunziLessonVertical(LessonVertical):
         import textwrap
         max_chars_per_line = max(10, int(config.frame_width * 1.8))  # 至少 10 个字符，避免为 0
         wrapped_lines = textwrap.wrap(question_text, width=max_chars_per_line)
-        question = Text(
+        question = CachedText(
             "\n".join(wrapped_lines),
             font=self.body_font, 
             font_size=self.font_body_size,
@@ -382,13 +534,13 @@ class SunziLessonVertical(LessonVertical):
         for i, text in enumerate(options):
             color = colors[i] if i < len(colors) else WHITE
             box = RoundedRectangle(width=8, height=1.2, color=color, fill_opacity=0.1)
-            txt = Text(text, font_size=self.font_body_size*0.8, color=WHITE).move_to(box)
+            txt = CachedText(text, font_size=self.font_body_size*0.8, color=WHITE).move_to(box)
             item = VGroup(box, txt)
             opt_group.add(item)
             
         opt_group.arrange(DOWN, buff=0.4).next_to(question, DOWN, buff=0.5)
         
-        cta_text = Text("评论区告诉懿爸，挑战小小谋略家！", font_size=self.font_body_size, color=BLUE)
+        cta_text = CachedText("评论区告诉懿爸，挑战小小谋略家！", font_size=self.font_body_size, color=BLUE)
         cta = VGroup(Triangle(color=BLUE, fill_opacity=1).scale(0.15).rotate(PI), cta_text).arrange(RIGHT).move_to(DOWN * 4.5)
         
         self.play(FadeIn(q_bg, shift=UP), Write(q_text))
@@ -0,0 +1,156 @@
+import json
+import struct
+import sys
+import tempfile
+import unittest
+import wave
+from pathlib import Path
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+from src.utils import audio_duration
+
+
+def write_bytes(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+# MPEG-2 Layer III, 48 kbps, 24 kHz, mono —— Edge TTS 默认输出格式
+EDGE_TTS_FRAME_HEADER = b"\xff\xf3\x64\xc0"
+EDGE_TTS_FRAME_SIZE = 144
+EDGE_TTS_FRAME_SECONDS = 576 / 24000
+
+
+def edge_tts_like_mp3(n_frames: int, id3: bool = True, xing_frames=None) -> bytes:
+    frame = EDGE_TTS_FRAME_HEADER + b"\x00" * (EDGE_TTS_FRAME_SIZE - 4)
+    data = b""
+    if id3:
+        data += b"ID3\x04\x00\x00" + bytes([0, 0, 0, 20]) + b"\x00" * 20
+    if xing_frames is not None:
+        # MPEG-2 mono 边信息 9 字节，Xing 头紧随其后
+        info = EDGE_TTS_FRAME_HEADER + b"\x00" * 9 + b"Xing" + struct.pack(">II", 1, xing_frames)
+        data += info + b"\x00" * (EDGE_TTS_FRAME_SIZE - len(info))
+    return data + frame * n_frames
+
+
+def write_wav(path: Path, seconds: float, sample_rate: int = 22050, channels: int = 1) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * channels * int(seconds * sample_rate))
+
+
+class TestNativeDurationReaders(unittest.TestCase):
+    def test_cbr_mp3_frame_walk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            clip = Path(tmp) / "1.mp3"
+            write_bytes(clip, edge_tts_like_mp3(250))
+            self.assertAlmostEqual(audio_duration.read_mp3_duration(clip), 250 * EDGE_TTS_FRAME_SECONDS)
+
+    def test_mp3_xing_frame_count(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            clip = Path(tmp) / "1.mp3"
+            write_bytes(clip, edge_tts_like_mp3(10, xing_frames=400))
+            self.assertAlmostEqual(audio_duration.read_mp3_duration(clip), 400 * EDGE_TTS_FRAME_SECONDS)
+
+    def test_wav_duration(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            clip = Path(tmp) / "1.wav"
+            write_wav(clip, 2.5, sample_rate=22050, channels=2)
+            self.assertAlmostEqual(audio_duration.read_wav_duration(clip), 2.5)
+
+    def test_native_reader_ignores_extension_mismatch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            clip = Path(tmp) / "1.mp3"
+            write_wav(clip, 1.0)
+            self.assertAlmostEqual(audio_duration.read_native_duration(clip), 1.0)
+
+    def test_unknown_format_returns_none(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            clip = Path(tmp) / "1.mp3"
+            write_bytes(clip, b"not audio at all")
+            self.assertIsNone(audio_duration.read_native_duration(clip))
+
+
+class CountingProbe:
+    def __init__(self, duration=3.5):
+        self.duration = duration
+        self.calls = []
+
+    def __call__(self, path):
+        self.calls.append(path)
+        return self.duration
+
+
+class TestDurationIndex(unittest.TestCase):
+    def test_get_probes_once_per_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            clip = Path(tmp) / "1.mp3"
+            write_bytes(clip, b"x" * 10)
+            probe = CountingProbe()
+            index = audio_duration.DurationIndex(probe=probe, native_reader=None)
+
+            self.assertEqual(index.get(clip), 3.5)
+            self.assertEqual(index.get(str(clip)), 3.5)
+            self.assertEqual(len(probe.calls), 1)
+            self.assertEqual(index.hits, 1)
+
+    def test_changed_file_is_reprobed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            clip = Path(tmp) / "1.mp3"
+            write_bytes(clip, b"x" * 10)
+            probe = CountingProbe()
+            index = audio_duration.DurationIndex(probe=probe)
+            index.get(clip)
+
+            write_bytes(clip, b"x" * 20)
+            index.get(clip)
+            self.assertEqual(len(probe.calls), 2)
+
+    def test_prime_writes_sidecar_reused_by_new_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            voice_dir = Path(tmp) / "voice"
+            clips = [voice_dir / f"{i}.mp3" for i in range(1, 4)]
+            for clip in clips:
+                write_bytes(clip, b"x" * 10)
+
+            first = audio_duration.DurationIndex(probe=CountingProbe(2.0), native_reader=None)
+            durations = first.prime([str(c) for c in clips] + [str(voice_dir / "missing.mp3")], sidecar_dir=voice_dir)
+            self.assertEqual(len(durations), 3)
+
+            sidecar = json.loads((voice_dir / audio_duration.DURATION_SIDECAR_NAME).read_text(encoding="utf-8"))
+            self.assertEqual(sorted(sidecar["entries"]), ["1.mp3", "2.mp3", "3.mp3"])
+
+            probe = CountingProbe(9.0)
+            second = audio_duration.DurationIndex(probe=probe)
+            self.assertEqual(second.get(clips[0]), 2.0)
+            self.assertEqual(probe.calls, [])
+
+    def test_prime_uses_native_reader_before_probe(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            clip = Path(tmp) / "1.wav"
+            write_wav(clip, 1.5)
+            probe = CountingProbe()
+            index = audio_duration.DurationIndex(probe=probe)
+            self.assertAlmostEqual(index.prime([clip])[str(clip)], 1.5)
+            self.assertEqual(probe.calls, [])
+
+    def test_prime_skips_unreadable_files(self):
+        def failing_probe(path):
+            raise RuntimeError(f"bad {path}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            clip = Path(tmp) / "1.mp3"
+            write_bytes(clip, b"x")
+            index = audio_duration.DurationIndex(probe=failing_probe, native_reader=None)
+            self.assertEqual(index.prime([clip]), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
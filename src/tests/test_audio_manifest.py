@@ -0,0 +1,107 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+from src.utils import anim_helper, audio_manifest
+
+
+class FakeFfmpeg:
+    """记录调用次数，把最后一个参数（输出路径）写成一个小文件"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, cmd, check=False):
+        self.calls += 1
+        Path(cmd[-1]).write_bytes(f"mix{self.calls}".encode("utf-8"))
+
+
+class TestCombinedAudioManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.voice = Path(self.tmp.name) / "voice"
+        self.voice.mkdir()
+        self.clips = []
+        for idx in (1, 2):
+            clip = self.voice / f"{idx}.mp3"
+            clip.write_bytes(f"clip{idx}".encode("utf-8"))
+            self.clips.append(clip)
+        self.bgm = Path(self.tmp.name) / "bgm.wav"
+        self.bgm.write_bytes(b"bgm")
+        self.out = self.voice / "full_audio.wav"
+        self.ffmpeg = FakeFfmpeg()
+        self.run_patch = patch.object(anim_helper.subprocess, "run", self.ffmpeg)
+        self.run_patch.start()
+        self.env_patch = patch.dict(os.environ, {"AUDIO_MIX_BACKEND": "ffmpeg"})
+        self.env_patch.start()
+
+    def tearDown(self):
+        self.env_patch.stop()
+        self.run_patch.stop()
+        self.tmp.cleanup()
+
+    def combine(self, clips=None, **kwargs):
+        options = {"silence_duration": 0, "bgm_file": self.bgm, "bgm_volume": -15, "bgm_loop": True}
+        options.update(kwargs)
+        anim_helper.combine_audio_clips(clips or self.clips, self.out, **options)
+        return self.ffmpeg.calls
+
+    def test_skips_when_inputs_and_params_unchanged(self):
+        self.assertEqual(self.combine(), 1)
+        self.assertTrue(Path(audio_manifest.manifest_path(self.out)).exists())
+        self.assertEqual(self.combine(), 1)
+        # 只改 mtime、内容不变，不需要重新混音
+        os.utime(self.clips[0], ns=(1, 1))
+        self.assertEqual(self.combine(), 1)
+
+    def test_param_order_and_bgm_changes_force_remix(self):
+        self.combine()
+        self.assertEqual(self.combine(bgm_volume=-20), 2)
+        self.assertEqual(self.combine(bgm_volume=-20, silence_duration=0.3), 3)
+        self.assertEqual(self.combine(bgm_volume=-20, silence_duration=0.3, bgm_loop=False), 4)
+        self.assertEqual(self.combine(list(reversed(self.clips)), bgm_volume=-20, silence_duration=0.3, bgm_loop=False), 5)
+        self.assertEqual(self.combine(list(reversed(self.clips)), bgm_file=None), 6)
+        # 没有 BGM 时 bgm_volume 不影响输出
+        self.assertEqual(self.combine(list(reversed(self.clips)), bgm_file=None, bgm_volume=-3), 6)
+
+    def test_switching_mix_backend_forces_remix(self):
+        self.combine()
+        with patch("src.utils.audio_mixer.mix_to_wav", side_effect=lambda clips, out, **_: out.write_bytes(b"numpy")) as mix:
+            self.combine(backend="numpy")
+            self.combine(backend="numpy")
+        self.assertEqual(mix.call_count, 1)
+        self.assertEqual(self.combine(backend="ffmpeg"), 2)
+
+    def test_older_replacement_clip_and_edited_output_force_remix(self):
+        self.combine()
+        # TTS 缓存里换来一个时间戳更旧的片段：mtime 比较会误判为有效
+        self.clips[1].write_bytes(b"other clip")
+        os.utime(self.clips[1], ns=(1, 1))
+        self.assertEqual(self.combine(), 2)
+
+        self.out.write_bytes(b"edited by hand")
+        self.assertEqual(self.combine(), 3)
+        self.out.unlink()
+        self.assertEqual(self.combine(), 4)
+
+    def test_digest_reused_while_size_and_mtime_unchanged(self):
+        self.combine()
+        with patch.object(audio_manifest, "sha256_file", side_effect=audio_manifest.sha256_file) as sha:
+            audio_manifest._digest_memo.clear()
+            self.combine()
+            self.assertEqual(sha.call_count, 0)
+            os.utime(self.bgm, ns=(5, 5))
+            self.combine()
+            self.assertEqual([Path(call.args[0]).name for call in sha.call_args_list], ["bgm.wav"])
+
+
+if __name__ == "__main__":
+    unittest.main()
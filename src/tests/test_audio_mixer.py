@@ -0,0 +1,135 @@
+import importlib.util
+import math
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import wave
+from pathlib import Path
+from unittest.mock import patch
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+from src.utils import anim_helper
+
+HAS_MIXER_DEPS = all(importlib.util.find_spec(name) for name in ("numpy", "soxr", "av"))
+
+
+def write_tone(path, seconds, rate, channels=1, amplitude=0.25, freq=440):
+    frames = bytearray()
+    for i in range(int(seconds * rate)):
+        value = int(amplitude * 32767 * math.sin(2 * math.pi * freq * i / rate))
+        frames += value.to_bytes(2, "little", signed=True) * channels
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(channels)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(bytes(frames))
+
+
+class TestMixBackendSelection(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.clips = [self.dir / "1.mp3", self.dir / "2.mp3"]
+        for clip in self.clips:
+            clip.write_bytes(b"mp3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_env_selects_numpy_backend(self):
+        with patch.dict(os.environ, {"AUDIO_MIX_BACKEND": "numpy"}), \
+                patch("src.utils.audio_mixer.mix_to_wav", side_effect=lambda clips, out, **_: out.write_bytes(b"wav")) as mix_to_wav, \
+                patch.object(anim_helper.subprocess, "run", side_effect=AssertionError("ffmpeg called")):
+            anim_helper.combine_audio_clips(self.clips, self.dir / "full.wav", silence_duration=0.5, bgm_volume=-15)
+        mix_to_wav.assert_called_once()
+        self.assertEqual(mix_to_wav.call_args.kwargs["silence_duration"], 0.5)
+        self.assertEqual(mix_to_wav.call_args.kwargs["bgm_volume"], -15)
+
+    def test_default_is_ffmpeg_and_unknown_backend_rejected(self):
+        with patch.dict(os.environ, {}, clear=False):
+            os.environ.pop("AUDIO_MIX_BACKEND", None)
+            self.assertEqual(anim_helper.get_mix_backend(), "ffmpeg")
+        with self.assertRaises(ValueError):
+            anim_helper.get_mix_backend("sox")
+
+
+@unittest.skipUnless(HAS_MIXER_DEPS, "需要 numpy / soxr / av")
+class TestNumpyMixer(unittest.TestCase):
+    def test_concat_silence_and_looped_bgm(self):
+        import numpy as np
+
+        from src.utils.audio_mixer import SAMPLE_RATE, UPMIX_GAIN, mix_to_wav
+
+        def read_pcm(path):
+            with wave.open(str(path), "rb") as f:
+                self.assertEqual((f.getnchannels(), f.getframerate()), (2, SAMPLE_RATE))
+                return np.frombuffer(f.readframes(f.getnframes()), dtype="<i2").reshape(-1, 2) / 32768
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            write_tone(tmp / "1.wav", 0.5, 24000)
+            write_tone(tmp / "2.wav", 0.25, 48000)
+            write_tone(tmp / "bgm.wav", 0.1, 48000, channels=2, amplitude=0.5, freq=100)
+            out = tmp / "full.wav"
+            result = mix_to_wav([tmp / "1.wav", tmp / "2.wav"], out, silence_duration=0.2,
+                                bgm_file=tmp / "bgm.wav", bgm_volume=-6)
+
+            expected_frames = int(0.5 * 24000) * 2 + int(0.2 * SAMPLE_RATE) + int(0.25 * SAMPLE_RATE)
+            self.assertEqual(result["frames"], expected_frames)
+            pcm = read_pcm(out)
+            self.assertEqual(len(pcm), expected_frames)
+
+            # 静音段里只有 BGM（-6 dB）；BGM 只有 0.1 秒，能出现在这里说明在循环平铺
+            gap = pcm[int(0.5 * SAMPLE_RATE) + 100:int(0.7 * SAMPLE_RATE) - 100]
+            self.assertAlmostEqual(np.abs(gap).max(), 0.5 * 10 ** (-6 / 20), delta=0.01)
+
+            # 不加 BGM 时人声峰值按单声道 → 立体声 -3 dB 上混
+            dry = tmp / "dry.wav"
+            mix_to_wav([tmp / "1.wav", tmp / "2.wav"], dry, silence_duration=0.2)
+            self.assertAlmostEqual(np.abs(read_pcm(dry)).max(), 0.25 * UPMIX_GAIN, delta=0.01)
+
+
+@unittest.skipUnless(HAS_MIXER_DEPS and shutil.which("ffmpeg"), "需要 numpy / soxr / av 和 ffmpeg")
+class TestMixBackendParity(unittest.TestCase):
+    def test_numpy_matches_ffmpeg(self):
+        import numpy as np
+
+        def read_pcm(path):
+            with wave.open(str(path), "rb") as f:
+                data = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2")
+                return data.reshape(-1, f.getnchannels()).astype(np.float64)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            # 与 Edge TTS 一致的 24 kHz 单声道人声 + 44.1 kHz 立体声 BGM（比人声短，需要循环）
+            clips = []
+            for i in range(3):
+                clips.append(tmp / f"{i + 1}.wav")
+                write_tone(clips[-1], 0.8, 24000, amplitude=0.4, freq=180 + 40 * i)
+            write_tone(tmp / "bgm.wav", 0.7, 44100, channels=2, amplitude=0.3, freq=220)
+
+            outputs = {}
+            for backend in ("ffmpeg", "numpy"):
+                out = tmp / f"full_{backend}.wav"
+                anim_helper.combine_audio_clips(clips, out, silence_duration=0.3, bgm_file=tmp / "bgm.wav",
+                                                bgm_volume=-15, backend=backend)
+                outputs[backend] = read_pcm(out)
+
+        ref, ours = outputs["ffmpeg"], outputs["numpy"]
+        self.assertEqual(ref.shape[1], ours.shape[1])
+        self.assertLessEqual(abs(len(ours) - len(ref)), 1)
+        n = min(len(ref), len(ours))
+        diff = ours[:n] - ref[:n]
+        snr_db = 20 * np.log10(np.sqrt(np.mean(ref[:n] ** 2)) / (np.sqrt(np.mean(diff ** 2)) or 1e-9))
+        self.assertGreater(snr_db, 45)
+        self.assertLess(np.max(np.abs(diff)), 0.02 * 32768)
+
+
+if __name__ == "__main__":
+    unittest.main()
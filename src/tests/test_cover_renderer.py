@@ -0,0 +1,199 @@
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+from src.utils.cover_renderer import CoverAssets, CoverRenderer
+
+
+class FakeLocator:
+    def __init__(self, page):
+        self.page = page
+
+    async def screenshot(self, path, type):
+        stats = self.page.browser.stats
+        stats["active"] += 1
+        stats["peak"] = max(stats["peak"], stats["active"])
+        await asyncio.sleep(0.01)
+        stats["active"] -= 1
+        if "FAIL" in self.page.html:
+            raise RuntimeError("render failed")
+        Path(path).write_text(self.page.html, encoding="utf-8")
+
+
+class FakePage:
+    def __init__(self, browser):
+        self.browser = browser
+        self.html = ""
+        self.routes = []
+
+    async def route(self, pattern, handler):
+        self.routes.append((pattern, handler))
+
+    async def set_content(self, html):
+        self.html = html
+
+    async def wait_for_function(self, js, timeout):
+        return True
+
+    def locator(self, selector):
+        return FakeLocator(self)
+
+    async def close(self):
+        self.browser.stats["closed_pages"] += 1
+
+
+class FakeBrowser:
+    def __init__(self, stats):
+        self.stats = stats
+
+    def is_connected(self):
+        return True
+
+    async def new_page(self, viewport):
+        if self.stats.get("new_page_failures"):
+            self.stats["new_page_failures"] -= 1
+            raise RuntimeError("new_page failed")
+        self.stats["pages"] += 1
+        page = FakePage(self)
+        self.stats.setdefault("page_objects", []).append(page)
+        return page
+
+    async def close(self):
+        self.stats["browser_closed"] = True
+
+
+class FakePlaywright:
+    def __init__(self, stats):
+        self.stats = stats
+        self.chromium = self
+
+    async def start(self):
+        return self
+
+    async def launch(self):
+        self.stats["launches"] += 1
+        return FakeBrowser(self.stats)
+
+    async def stop(self):
+        pass
+
+
+class FakeRoute:
+    def __init__(self, url):
+        self.request = type("Request", (), {"url": url})()
+        self.response = None
+
+    async def fulfill(self, status, body, content_type=None):
+        self.response = (status, body, content_type)
+
+
+def make_renderer(pages, assets=None):
+    stats = {"launches": 0, "pages": 0, "active": 0, "peak": 0, "closed_pages": 0, "browser_closed": False}
+    renderer = CoverRenderer(pages=pages, playwright_factory=lambda: FakePlaywright(stats), assets=assets)
+    return renderer, stats
+
+
+class TestCoverRenderer(unittest.TestCase):
+    def test_browser_launched_once_across_calls(self):
+        renderer, stats = make_renderer(pages=2)
+        with tempfile.TemporaryDirectory() as tmp, renderer:
+            for i in range(3):
+                renderer.render(f"<p>{i}</p>", str(Path(tmp) / f"{i}.png"))
+            self.assertEqual(stats["launches"], 1)
+            self.assertEqual(stats["pages"], 1)
+            self.assertEqual((Path(tmp) / "2.png").read_text(encoding="utf-8"), "<p>2</p>")
+        self.assertTrue(stats["browser_closed"])
+
+    def test_batch_uses_bounded_page_pool(self):
+        renderer, stats = make_renderer(pages=3)
+        with tempfile.TemporaryDirectory() as tmp, renderer:
+            jobs = [(f"<p>{i}</p>", str(Path(tmp) / "covers" / f"{i}.png")) for i in range(8)]
+            results = renderer.render_many(jobs)
+            self.assertEqual([path for path, _ in results], [path for _, path in jobs])
+            self.assertTrue(all(error is None for _, error in results))
+            self.assertEqual(stats["pages"], 3)
+            self.assertEqual(stats["peak"], 3)
+
+    def test_failed_cover_does_not_abort_batch(self):
+        renderer, stats = make_renderer(pages=2)
+        with tempfile.TemporaryDirectory() as tmp, renderer:
+            jobs = [("<p>ok</p>", str(Path(tmp) / "a.png")), ("FAIL", str(Path(tmp) / "b.png"))]
+            results = renderer.render_many(jobs)
+            self.assertIsNone(results[0][1])
+            self.assertIsInstance(results[1][1], RuntimeError)
+            self.assertEqual(stats["closed_pages"], 1)
+            with self.assertRaises(RuntimeError):
+                renderer.render("FAIL", str(Path(tmp) / "c.png"))
+            renderer.render("<p>again</p>", str(Path(tmp) / "d.png"))
+            self.assertEqual(stats["launches"], 1)
+
+    def test_failed_page_replaced_for_waiting_covers(self):
+        renderer, stats = make_renderer(pages=1)
+        with tempfile.TemporaryDirectory() as tmp, renderer:
+            jobs = [("FAIL", str(Path(tmp) / "a.png")), ("<p>ok</p>", str(Path(tmp) / "b.png"))]
+            future = asyncio.run_coroutine_threadsafe(renderer._render_all(jobs, ".canvas"), renderer.start()._loop)
+            results = future.result(timeout=5)
+            self.assertIsInstance(results[0][1], RuntimeError)
+            self.assertIsNone(results[1][1])
+            self.assertEqual((Path(tmp) / "b.png").read_text(encoding="utf-8"), "<p>ok</p>")
+            self.assertEqual((stats["pages"], stats["closed_pages"]), (2, 1))
+
+    def test_failed_new_page_only_fails_its_own_job(self):
+        renderer, stats = make_renderer(pages=2)
+        stats["new_page_failures"] = 1
+        with tempfile.TemporaryDirectory() as tmp, renderer:
+            jobs = [(f"<p>{i}</p>", str(Path(tmp) / f"{i}.png")) for i in range(3)]
+            results = renderer.render_many(jobs)
+            self.assertEqual([path for path, _ in results], [path for _, path in jobs])
+            self.assertEqual(sum(error is not None for _, error in results), 1)
+            self.assertEqual(str(results[0][1]), "new_page failed")
+            self.assertTrue((Path(tmp) / "2.png").exists())
+
+
+class TestCoverAssets(unittest.TestCase):
+    def test_same_path_same_url_and_bytes_cached_until_mtime_changes(self):
+        assets = CoverAssets()
+        with tempfile.TemporaryDirectory() as tmp:
+            image = Path(tmp) / "1.jpg"
+            image.write_bytes(b"jpeg-v1")
+            url = assets.url_for(str(image))
+            self.assertEqual(assets.url_for(os.path.join(tmp, ".", "1.jpg")), url)
+            key = url.rsplit("/", 1)[-1]
+
+            self.assertEqual(assets.load(key), (b"jpeg-v1", "image/jpeg"))
+            self.assertEqual(assets.load(key), (b"jpeg-v1", "image/jpeg"))
+            self.assertEqual((assets.loads, assets.hits), (1, 1))
+
+            image.write_bytes(b"jpeg-version2")
+            os.utime(image, ns=(1, 1))
+            self.assertEqual(assets.load(key)[0], b"jpeg-version2")
+            self.assertIsNone(assets.load("unknown.png"))
+
+    def test_pages_serve_assets_through_route(self):
+        assets = CoverAssets()
+        renderer, stats = make_renderer(pages=1, assets=assets)
+        with tempfile.TemporaryDirectory() as tmp, renderer:
+            icon = Path(tmp) / "icon.png"
+            icon.write_bytes(b"png-bytes")
+            url = assets.url_for(str(icon))
+            renderer.render(f'<img src="{url}">', str(Path(tmp) / "out.png"))
+
+            (pattern, handler), = stats["page_objects"][0].routes
+            route = FakeRoute(url)
+            asyncio.run(handler(route))
+            self.assertEqual(route.response, (200, b"png-bytes", "image/png"))
+            missing = FakeRoute(pattern.replace("**", "missing.png"))
+            asyncio.run(handler(missing))
+            self.assertEqual(missing.response[0], 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
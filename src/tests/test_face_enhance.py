@@ -0,0 +1,111 @@
+import importlib.util
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+TOOLS_DIR = WORKSPACE_ROOT / "tools" / "optional_video"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.insert(0, str(TOOLS_DIR))
+
+from face_enhance import SKIP_TILE, enhance_frames, plan_chunks, read_frames
+
+
+ENHANCED = []
+
+
+def make_stub_enhancer(threads=None):
+    """桩增强：字节反转并"放大"尺寸，记录实际增强过的帧"""
+    def enhance(frame, width, height):
+        ENHANCED.append(frame)
+        return frame[::-1], width * 2, height * 2
+
+    return enhance
+
+
+FRAMES = [b"aaa", b"aaa", b"abc", b"abc", b"abc", b"xyz", b"aaa"]
+
+
+class TestPlanChunks(unittest.TestCase):
+    def test_repeated_frames_marked_across_chunks(self):
+        chunks = list(plan_chunks(FRAMES, chunk_size=3))
+        self.assertEqual(chunks, [[b"aaa", None, b"abc"], [None, None, b"xyz"], [b"aaa"]])
+        self.assertEqual(list(plan_chunks([], chunk_size=3)), [])
+
+
+class TestEnhanceFrames(unittest.TestCase):
+    def run_frames(self, workers):
+        stats = {}
+        frames = list(enhance_frames(
+            iter(FRAMES), 1, 1, workers=workers, chunk_size=2,
+            enhancer="test_face_enhance:make_stub_enhancer", threads=1, stats=stats, tolerance=0,
+        ))
+        return frames, stats
+
+    def test_serial_skips_unchanged_frames(self):
+        ENHANCED.clear()
+        frames, stats = self.run_frames(workers=1)
+        self.assertEqual([frame for frame, _, _ in frames], [f[::-1] for f in FRAMES])
+        self.assertEqual(frames[0][1:], (2, 2))
+        self.assertEqual(ENHANCED, [b"aaa", b"abc", b"xyz", b"aaa"])
+        self.assertEqual(stats, {"frames": 7, "skipped": 3})
+
+    def test_parallel_keeps_order(self):
+        serial, _ = self.run_frames(workers=1)
+        parallel, stats = self.run_frames(workers=2)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(stats, {"frames": 7, "skipped": 3})
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "需要 numpy")
+class TestSkipTolerance(unittest.TestCase):
+    def test_codec_noise_skipped_but_local_motion_enhanced(self):
+        import numpy as np
+
+        size = SKIP_TILE * 4
+        rng = np.random.default_rng(0)
+        base = rng.integers(60, 200, (size, size, 3)).astype(np.int16)
+
+        def frame(image):
+            return np.clip(image, 0, 255).astype(np.uint8).tobytes()
+
+        noisy = base + rng.integers(-1, 2, base.shape)  # 有损编码的细小噪声
+        mouth = base.copy()
+        mouth[SKIP_TILE:SKIP_TILE * 2, SKIP_TILE:SKIP_TILE * 2] += 40  # 只有一个小块在动
+        drift = [base + step for step in (1, 2, 3)]  # 每帧只差 1，累积超过阈值
+
+        frames = [frame(base), frame(noisy), frame(mouth), frame(base)] + [frame(image) for image in drift]
+        chunks = list(plan_chunks(frames, chunk_size=8, width=size, height=size, tolerance=2.0))
+        marks = [entry is not None for entry in chunks[0]]
+        self.assertEqual(marks, [True, False, True, True, False, False, True])
+        # 默认 tolerance=0 时只跳过逐字节相同的帧
+        exact = list(plan_chunks(frames, chunk_size=8, width=size, height=size))
+        self.assertTrue(all(entry is not None for entry in exact[0]))
+
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "需要 ffmpeg")
+class TestReadFrames(unittest.TestCase):
+    def test_decode_errors_raise_instead_of_truncating(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            video = Path(tmp) / "clip.mp4"
+            subprocess.run([
+                "ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=size=32x32:rate=5:duration=1",
+                "-pix_fmt", "yuv420p", str(video),
+            ], check=True)
+            self.assertEqual(len(list(read_frames(video, 32, 32))), 5)
+            # 尺寸对不上：末尾剩下半帧
+            with self.assertRaises(RuntimeError):
+                list(read_frames(video, 32, 31))
+
+            broken = Path(tmp) / "broken.mp4"
+            broken.write_bytes(video.read_bytes()[: video.stat().st_size // 2])
+            with self.assertRaises(RuntimeError):
+                list(read_frames(broken, 32, 32))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+from src.utils import icon_index
+from src.utils.icon_index import IconIndex
+
+
+def make_icons8(root, sources):
+    """sources: {子目录: {文件名: (subcategory, aliases)}}，同时创建对应的空 PNG"""
+    icons8 = Path(root) / "icons8"
+    for subdir, file_map in sources.items():
+        metadata = {"file_map": {}}
+        for filename, (subcategory, aliases) in file_map.items():
+            png = icons8 / subdir / subcategory / f"{filename}.png"
+            png.parent.mkdir(parents=True, exist_ok=True)
+            png.write_bytes(b"png")
+            metadata["file_map"][filename] = {"subcategory": subcategory, "aliases": aliases}
+        (icons8 / f"{subdir}_png_metadata.json").write_text(json.dumps(metadata), encoding="utf-8")
+    return icons8
+
+
+SOURCES = {
+    "doodle": {
+        "money_bag": ("finance/money", ["cash_bag"]),
+        "group": ("people/team", []),
+    },
+    "color": {
+        "cash_bag": ("finance/money", []),
+        "line_chart": ("business/charts", ["trend"]),
+    },
+}
+
+
+class TestIconIndex(unittest.TestCase):
+    def test_exact_alias_and_source_priority(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            icons8 = make_icons8(tmp, SOURCES)
+            index = IconIndex(icons8)
+            self.assertTrue(index.resolve("group").endswith("doodle/people/team/group.png"))
+            # doodle 里的别名优先于 color 里的精确文件名
+            self.assertTrue(index.resolve("cash_bag").endswith("doodle/finance/money/money_bag.png"))
+            self.assertTrue(index.resolve("trend").endswith("color/business/charts/line_chart.png"))
+
+    def test_fuzzy_and_keyword_fallbacks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            icons8 = make_icons8(tmp, SOURCES)
+            (icons8 / "color" / "misc").mkdir()
+            (icons8 / "color" / "misc" / "rocket_launch_pad.png").write_bytes(b"png")
+            index = IconIndex(icons8)
+            self.assertTrue(index.resolve("line_charts").endswith("line_chart.png"))
+            self.assertTrue(index.resolve("rocket_launch").endswith("rocket_launch_pad.png"))
+            self.assertIsNone(index.resolve("xyz"))
+
+    def test_fuzzy_scores_only_top_overlapping_icons(self):
+        # 300 个图标共享 "item_"、"_bag" 等三元组，取并集等于全量；只应对共享最多的前 K 个打分
+        sources = {"color": {f"item_{i:04d}_bag": ("misc", []) for i in range(300)}}
+        with tempfile.TemporaryDirectory() as tmp:
+            index = IconIndex(make_icons8(tmp, sources))
+            scored = []
+            fuzzy = index._fuzzy
+
+            def recording_fuzzy(icon_name, unit_ids):
+                scored.append(list(unit_ids))
+                return fuzzy(icon_name, scored[-1])
+
+            index._fuzzy = recording_fuzzy
+            self.assertTrue(index.resolve("item_0207_bags").endswith("item_0207_bag.png"))
+            self.assertEqual(len(scored), 1)
+            self.assertLessEqual(len(scored[0]), icon_index.FUZZY_SHORTLIST)
+
+    def test_results_are_memoized_and_timed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index = IconIndex(make_icons8(tmp, SOURCES))
+            first = index.resolve("group")
+            index.direct.clear()
+            self.assertEqual(index.resolve("group"), first)
+            self.assertEqual(list(index.lookup_ms), ["group"])
+            self.assertIn("图标查找 1 个", index.lookup_report())
+
+    def test_compiled_cache_reused_until_metadata_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            icons8 = make_icons8(tmp, SOURCES)
+            cache_file = os.path.join(tmp, "cache", "index.json")
+            self.assertFalse(IconIndex(icons8, cache_file=cache_file).loaded_from_cache)
+            cached = IconIndex(icons8, cache_file=cache_file)
+            self.assertTrue(cached.loaded_from_cache)
+            self.assertTrue(cached.resolve("trend").endswith("line_chart.png"))
+
+            make_icons8(tmp, {"color": {"line_chart": ("business/charts", ["growth"])}})
+            os.utime(icons8 / "color_png_metadata.json", ns=(1, 1))
+            rebuilt = IconIndex(icons8, cache_file=cache_file)
+            self.assertFalse(rebuilt.loaded_from_cache)
+            self.assertTrue(rebuilt.resolve("growth").endswith("line_chart.png"))
+
+
+if __name__ == "__main__":
+    unittest.main()
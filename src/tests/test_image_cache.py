@@ -0,0 +1,140 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+from src.utils import image_cache
+from src.utils.image_cache import DecodedImageCache, get_shared_image_mobject_class, presize_target_px
+
+
+class FakePixels:
+    def __init__(self, path, target_px, nbytes):
+        self.path = path
+        self.target_px = target_px
+        self.nbytes = nbytes
+
+
+class CountingDecoder:
+    def __init__(self, nbytes=100):
+        self.nbytes = nbytes
+        self.calls = []
+
+    def __call__(self, path, target_px):
+        self.calls.append((os.path.basename(path), target_px))
+        return FakePixels(path, target_px, self.nbytes)
+
+
+class TestDecodedImageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        for name in ("a.png", "b.png", "c.png"):
+            (self.dir / name).write_bytes(b"png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_repeated_loads_share_one_decode(self):
+        decoder = CountingDecoder()
+        cache = DecodedImageCache(decoder=decoder)
+        first = cache.get_pixels(str(self.dir / "a.png"))
+        self.assertIs(cache.get_pixels(str(self.dir / "a.png")), first)
+        self.assertEqual(len(decoder.calls), 1)
+        self.assertEqual((cache.hits, cache.misses, cache.resident_bytes), (1, 1, 100))
+        self.assertIn("命中 1", cache.report())
+
+    def test_mtime_change_and_target_size_are_separate_entries(self):
+        decoder = CountingDecoder()
+        cache = DecodedImageCache(decoder=decoder)
+        path = self.dir / "a.png"
+        cache.get_pixels(str(path))
+        cache.get_pixels(str(path), target_px=240)
+        os.utime(path, ns=(1, 1))
+        cache.get_pixels(str(path))
+        self.assertEqual(decoder.calls, [("a.png", None), ("a.png", 240), ("a.png", None)])
+
+    def test_least_recently_used_evicted_over_byte_budget(self):
+        decoder = CountingDecoder(nbytes=100)
+        cache = DecodedImageCache(max_bytes=250, decoder=decoder)
+        cache.get_pixels(str(self.dir / "a.png"))
+        cache.get_pixels(str(self.dir / "b.png"))
+        cache.get_pixels(str(self.dir / "a.png"))
+        cache.get_pixels(str(self.dir / "c.png"))
+        self.assertEqual((cache.evictions, cache.resident_bytes, cache.peak_bytes), (1, 200, 200))
+
+        cache.get_pixels(str(self.dir / "a.png"))
+        self.assertEqual(len(decoder.calls), 3)
+        cache.get_pixels(str(self.dir / "b.png"))
+        self.assertEqual(decoder.calls[-1], ("b.png", None))
+
+
+class RecordingMobject:
+    def __init__(self, pixels, path=None):
+        self.pixels = pixels
+        self.path = path
+
+
+class TestPresize(unittest.TestCase):
+    def test_full_resolution_unless_max_scale_given(self):
+        decoder = CountingDecoder()
+        cache = DecodedImageCache(decoder=decoder)
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(image_cache, "get_shared_image_mobject_class", return_value=RecordingMobject):
+            path = Path(tmp) / "icon.png"
+            path.write_bytes(b"png")
+            mob = cache.image_mobject(str(path), height=2)
+        # 默认不预缩放：场景里再放大多少倍事先不知道，缩小后放大会发糊
+        self.assertEqual(decoder.calls, [("icon.png", None)])
+        self.assertEqual((mob.height, mob.pixels.target_px), (2, None))
+
+    def test_target_covers_max_scale(self):
+        # 1920 像素对应 16 个单位：2 个单位高、最多放大 3 倍 -> 720 像素
+        self.assertEqual(presize_target_px(2, 3, 1920, 16.0), 720)
+        self.assertEqual(presize_target_px(1.01, 1, 1920, 16.0), 122)
+        self.assertIsNone(presize_target_px(2, None, 1920, 16.0))
+        self.assertIsNone(presize_target_px(None, 3, 1920, 16.0))
+
+
+@unittest.skipUnless(importlib.util.find_spec("manim") and importlib.util.find_spec("numpy"), "需要 manim / numpy")
+class TestSharedImageMobject(unittest.TestCase):
+    def test_in_place_edits_copy_shared_pixels(self):
+        import numpy as np
+
+        shared = np.full((4, 4, 4), 255, dtype=np.uint8)
+        shared.setflags(write=False)
+        SharedImageMobject = get_shared_image_mobject_class()
+
+        tinted = SharedImageMobject(shared)
+        tinted.set_color("#FF0000")
+        self.assertTrue((tinted.pixel_array[:, :, :3] == [255, 0, 0]).all())
+
+        faded = SharedImageMobject(shared)
+        faded.set_opacity(0.5)
+        self.assertTrue((faded.pixel_array[:, :, 3] < 255).all())
+
+        # 缓存里的数组保持原样
+        self.assertTrue((shared == 255).all())
+
+    def test_dimensions_follow_shared_pixels_not_placeholder(self):
+        import numpy as np
+
+        shared = np.full((40, 20, 4), 255, dtype=np.uint8)
+        shared[:, :, 3] = 128
+        shared.setflags(write=False)
+        mob = get_shared_image_mobject_class()(shared)
+        self.assertEqual(mob.pixel_array.shape, (40, 20, 4))
+        self.assertEqual(mob.orig_alpha_pixel_array.shape, (40, 20))
+        self.assertTrue((mob.orig_alpha_pixel_array == 128).all())
+        self.assertAlmostEqual(mob.height / mob.width, 2.0, places=6)
+
+
+if __name__ == "__main__":
+    unittest.main()
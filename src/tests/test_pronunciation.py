@@ -0,0 +1,67 @@
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+from src.utils.pronunciation import PronunciationRewriter, get_pronunciation_rewriter, load_pronunciation_table
+
+
+def reference_rewrite(table, text):
+    """逐位置尝试所有词条的朴素实现：最左优先、同起点取最长"""
+    out = []
+    i = 0
+    while i < len(text):
+        matches = [w for w in table if w and text.startswith(w, i)]
+        if matches:
+            word = max(matches, key=len)
+            out.append(table[word])
+            i += len(word)
+        else:
+            out.append(text[i])
+            i += 1
+    return "".join(out)
+
+
+class TestPronunciationRewriter(unittest.TestCase):
+    def test_longest_match_wins_at_same_start(self):
+        rewriter = PronunciationRewriter({"降息": "酱息", "降准": "酱准", "降息降准": "酱息酱准"})
+        self.assertEqual(rewriter.rewrite("央行降息降准了"), "央行酱息酱准了")
+
+    def test_leftmost_match_wins_over_longer_later_match(self):
+        rewriter = PronunciationRewriter({"大行": "大航", "放大行": "放大航X", "钱放": "钱方"})
+        self.assertEqual(rewriter.rewrite("大钱放大行"), "大钱方大航")
+
+    def test_replacement_output_is_not_rewritten(self):
+        rewriter = PronunciationRewriter({"甲": "乙", "乙": "丙"})
+        self.assertEqual(rewriter.rewrite("甲乙"), "乙丙")
+
+    def test_matches_reference_on_random_text(self):
+        rng = random.Random(7)
+        alphabet = "abcd"
+        for _ in range(200):
+            table = {
+                "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))): str(rng.randint(0, 9))
+                for _ in range(rng.randint(1, 6))
+            }
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+            self.assertEqual(PronunciationRewriter(table).rewrite(text), reference_rewrite(table, text), (table, text))
+
+    def test_series_table_file_extends_base_table(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            table_file = Path(tmp) / "pronunciation_fixes.txt"
+            table_file.write_text("# 系列表\n\n行长\t航长\n降息\t将息\n", encoding="utf-8")
+            self.assertEqual(load_pronunciation_table(table_file), {"行长": "航长", "降息": "将息"})
+
+            rewriter = get_pronunciation_rewriter({"降息": "酱息", "四大行": "四大航"}, str(table_file))
+            self.assertEqual(rewriter.rewrite("四大行行长说降息"), "四大航航长说将息")
+            self.assertIs(get_pronunciation_rewriter({"降息": "酱息", "四大行": "四大航"}, str(table_file)), rewriter)
+
+
+if __name__ == "__main__":
+    unittest.main()
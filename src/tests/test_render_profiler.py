@@ -0,0 +1,108 @@
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+from src.utils.render_profiler import RenderProfiler, describe_animations, profiler_from_env
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Text:
+    def __init__(self, text):
+        self.text = text
+
+
+class Write:
+    def __init__(self, mobject):
+        self.mobject = mobject
+
+
+class FadeOut(Write):
+    pass
+
+
+class TestRenderProfiler(unittest.TestCase):
+    def tearDown(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def test_nested_spans_become_chrome_trace_events(self):
+        clock = FakeClock()
+        profiler = RenderProfiler(trace_memory=False, clock=clock)
+        with profiler.span("build_scene_1", "scene"):
+            clock.now = 0.5
+            with profiler.span("Write(Text)", "play") as info:
+                clock.now = 2.0
+                info["frames"] = 90
+            clock.now = 2.25
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = profiler.write(os.path.join(tmp, "out", "Lesson.trace.json"), metadata={"lesson": "lesson01"})
+            with open(path, encoding="utf-8") as f:
+                trace = json.load(f)
+            self.assertEqual(os.listdir(os.path.dirname(path)), ["Lesson.trace.json"])
+        spans = {e["name"]: e for e in trace["traceEvents"] if e["ph"] == "X"}
+        self.assertEqual((spans["build_scene_1"]["ts"], spans["build_scene_1"]["dur"]), (0.0, 2250000.0))
+        self.assertEqual((spans["Write(Text)"]["ts"], spans["Write(Text)"]["dur"]), (500000.0, 1500000.0))
+        self.assertEqual(spans["Write(Text)"]["args"]["frames"], 90)
+        self.assertEqual(trace["otherData"], {"lesson": "lesson01"})
+
+        report = profiler.report()
+        self.assertIn("build_scene_1", report)
+        self.assertIn("90 帧", report)
+
+    def test_memory_tracing_is_opt_in(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(profiler_from_env())
+        with mock.patch.dict(os.environ, {"RENDER_PROFILE": "true"}):
+            profiler = profiler_from_env()
+            self.assertFalse(profiler.trace_memory)
+            self.assertFalse(tracemalloc.is_tracing())
+            with profiler.span("scene", "scene") as info:
+                pass
+            self.assertNotIn("tracemalloc_peak_mb", info)
+        with mock.patch.dict(os.environ, {"RENDER_PROFILE": "mem"}):
+            self.assertTrue(profiler_from_env().trace_memory)
+            self.assertTrue(tracemalloc.is_tracing())
+
+    def test_tracemalloc_peak_is_per_span_and_includes_children(self):
+        profiler = RenderProfiler(trace_memory=True)
+        with profiler.span("scene", "scene") as outer:
+            with profiler.span("big", "play") as big:
+                blob = bytearray(8 * 1024 * 1024)
+                del blob
+            with profiler.span("small", "play") as small:
+                blob = bytearray(1024)
+                del blob
+        self.assertGreaterEqual(big["tracemalloc_peak_mb"], 8)
+        self.assertLess(small["tracemalloc_peak_mb"], 1)
+        self.assertGreaterEqual(outer["tracemalloc_peak_mb"], big["tracemalloc_peak_mb"])
+
+    def test_describe_animations(self):
+        long_text = "这是一段非常非常长的中文标题文字用于测试截断"
+        self.assertEqual(describe_animations([Write(Text("标题"))]), 'Write(Text "标题")')
+        described = describe_animations([Write(Text(long_text))])
+        self.assertTrue(described.endswith('…")'))
+        many = describe_animations([FadeOut(Text(str(i))) for i in range(5)])
+        self.assertTrue(many.endswith("+2"))
+        self.assertEqual(describe_animations([]), "play")
+
+
+if __name__ == "__main__":
+    unittest.main()
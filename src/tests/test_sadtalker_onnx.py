@@ -0,0 +1,91 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+TOOLS_DIR = WORKSPACE_ROOT / "tools" / "optional_video"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.insert(0, str(TOOLS_DIR))
+
+from sadtalker_onnx import OnnxAudioEncoder, OnnxModule, OnnxPoseCVAE, _export, export_key, onnx_threads
+from sadtalker_worker import BACKEND_MODELS, ONNX_THREADS_ENV, SadTalkerWorker
+
+
+class TestOnnxBackendConfig(unittest.TestCase):
+    def test_export_key_tracks_checkpoints(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            Path(tmp, "SadTalker_V0.0.2_256.safetensors").write_bytes(b"weights")
+            key = export_key(tmp, 256, "crop")
+            self.assertTrue(key.startswith("256_"))
+            self.assertEqual(key, export_key(tmp, 256, "crop"))
+            self.assertNotEqual(key, export_key(tmp, 512, "crop"))
+            self.assertNotEqual(key, export_key(tmp, 256, "full"))
+            Path(tmp, "SadTalker_V0.0.2_256.safetensors").write_bytes(b"new weights")
+            self.assertNotEqual(key, export_key(tmp, 256, "crop"))
+
+    def test_thread_count_precedence(self):
+        with mock.patch.dict(os.environ, {ONNX_THREADS_ENV: "6"}):
+            self.assertEqual(onnx_threads(), 6)
+            self.assertEqual(onnx_threads(2), 2)
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(onnx_threads(), os.cpu_count() or 1)
+
+    def test_worker_selects_backend_factory(self):
+        self.assertEqual(SadTalkerWorker(backend="onnx").models, BACKEND_MODELS["onnx"])
+        self.assertIn(BACKEND_MODELS["torch"], SadTalkerWorker().command())
+        self.assertEqual(SadTalkerWorker(backend="onnx", models="stub:factory").models, "stub:factory")
+        with self.assertRaises(ValueError):
+            SadTalkerWorker(backend="tensorrt")
+
+    def test_pose_cvae_adapter_runs_decoder(self):
+        calls = []
+
+        def decoder(z, class_id, ref, audio_emb):
+            calls.append((z, class_id, ref, audio_emb))
+            return "motion"
+
+        batch = OnnxPoseCVAE(decoder).test({"z": 1, "class": 2, "ref": 3, "audio_emb": 4})
+        self.assertEqual(calls, [(1, 2, 3, 4)])
+        self.assertEqual(batch["pose_motion_pred"], "motion")
+
+
+def _has(*modules):
+    return all(importlib.util.find_spec(name) is not None for name in modules)
+
+
+@unittest.skipUnless(_has("torch", "onnx", "onnxruntime"), "需要 torch、onnx 和 onnxruntime")
+class TestOnnxExportRoundTrip(unittest.TestCase):
+    def test_audio_encoder_runs_with_fewer_frames_than_exported(self):
+        import torch
+
+        torch.manual_seed(0)
+        # 与 SadTalker AudioEncoder 的卷积栈同样的输入输出形状：(N, 1, 80, 16) → (N, C, 1, 1)
+        conv = torch.nn.Sequential(
+            torch.nn.Conv2d(1, 8, 3, stride=2, padding=1), torch.nn.ReLU(),
+            torch.nn.Conv2d(8, 16, 3, stride=2, padding=1), torch.nn.AdaptiveAvgPool2d(1),
+        ).eval()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "audio2pose_encoder.onnx")
+            _export(conv, (torch.randn(32, 1, 80, 16),), path, ["mel"], ["audio_emb"],
+                    {"mel": {0: "frames"}, "audio_emb": {0: "frames"}})
+            session = OnnxModule(path, threads=1)
+
+            mels = torch.randn(7, 1, 80, 16)
+            with torch.no_grad():
+                expected = conv(mels)
+            torch.testing.assert_close(session(mels), expected, rtol=1e-4, atol=1e-5)
+
+            # Audio2Pose.test 的余数分支传入不足 seq_len 帧
+            sequences = torch.randn(1, 7, 1, 80, 16)
+            with torch.no_grad():
+                expected = conv(sequences[0]).reshape(1, 7, 16)
+            torch.testing.assert_close(OnnxAudioEncoder(session)(sequences), expected, rtol=1e-4, atol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
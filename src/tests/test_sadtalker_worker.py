@@ -0,0 +1,151 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+TOOLS_DIR = WORKSPACE_ROOT / "tools" / "optional_video"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.insert(0, str(TOOLS_DIR))
+
+from coeff_cache import CoeffCache
+from sadtalker_worker import SadTalkerModels, SadTalkerPipeline, SadTalkerWorker, TalkingHeadJob
+
+
+class StubPreprocess:
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, path, save_dir, preprocess, source_image_flag=False, pic_size=256):
+        self.calls.append(path)
+        if "unreadable" in os.path.basename(path):
+            return None, None, None
+        coeff = os.path.join(save_dir, f"{Path(path).stem}.mat")
+        Path(coeff).write_text("coeff", encoding="utf-8")
+        return coeff, path, {"crop": preprocess}
+
+
+class StubAudioToCoeff:
+    def generate(self, batch, save_dir, pose_style, ref_pose_coeff_path):
+        coeff = os.path.join(save_dir, "audio.mat")
+        Path(coeff).write_text(f"{batch['audio']}|{ref_pose_coeff_path}", encoding="utf-8")
+        return coeff
+
+
+class StubAnimate:
+    def generate(self, data, save_dir, pic_path, crop_info, enhancer=None, background_enhancer=None,
+                 preprocess="crop", img_size=256):
+        video = os.path.join(save_dir, "result.mp4")
+        Path(video).write_text(f"{data['audio']}|{enhancer}|{os.getpid()}", encoding="utf-8")
+        return video
+
+
+def make_stub_models(size=512, preprocess="full", device=None, sadtalker_path=None):
+    """SadTalkerWorker(models=...) 用的桩模型工厂"""
+    return SadTalkerModels(
+        preprocess=StubPreprocess(),
+        audio_to_coeff=StubAudioToCoeff(),
+        animate=StubAnimate(),
+        get_data=lambda coeff, audio, device, ref_eyeblink, still=False: {"audio": audio, "ref": ref_eyeblink},
+        get_facerender_data=lambda coeff, pic, first, audio, *args, **kwargs: {"audio": audio, "frame_num": 25},
+        device=device or "cpu",
+        load_seconds=0.01,
+    )
+
+
+def make_noisy_stub_models(**kwargs):
+    """加载时像 tqdm 一样写进度条（\r 开头、行尾没有换行），紧接着就是 ready 协议行"""
+    sys.stdout.write("\rLoading checkpoints: 100%|██████████|")
+    sys.stdout.flush()
+    return make_stub_models(**kwargs)
+
+
+class TestSadTalkerPipeline(unittest.TestCase):
+    def test_runs_stages_and_cleans_up(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            models = make_stub_models()
+            pipeline = SadTalkerPipeline(models, size=256, preprocess="crop", log=lambda message: None)
+            job = TalkingHeadJob(
+                image_path="face.png", audio_path="1.wav", output_path=os.path.join(tmp, "out", "1.mp4"),
+                ref_pose="ref.mp4", ref_eyeblink="ref.mp4", enhancer="gfpgan",
+            )
+            result = pipeline.run(job)
+            self.assertEqual(Path(result["output_path"]).read_text(encoding="utf-8").split("|")[:2], ["1.wav", "gfpgan"])
+            # 姿态与眨眼参考是同一个视频时只提取一次
+            self.assertEqual(models.preprocess.calls, ["face.png", "ref.mp4"])
+            self.assertEqual(list(result["timings"]), ["extract_source", "extract_ref_eyeblink", "audio_to_coeff", "face_render"])
+            self.assertEqual(os.listdir(os.path.join(tmp, "out")), ["1.mp4"])
+            self.assertEqual(result["frames"], 25)
+
+    def test_coeff_cache_reused_across_jobs_and_runs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            (tmp / "face.png").write_bytes(b"face")
+            (tmp / "ref.mp4").write_bytes(b"video")
+            models = make_stub_models()
+
+            def run(idx, preprocess="crop", cache_dir=tmp / "cache"):
+                pipeline = SadTalkerPipeline(models, size=256, preprocess=preprocess, log=lambda message: None,
+                                             coeff_cache=CoeffCache(str(cache_dir)))
+                return pipeline.run(TalkingHeadJob(
+                    str(tmp / "face.png"), f"{idx}.wav", str(tmp / "out" / f"{idx}.mp4"),
+                    ref_pose=str(tmp / "ref.mp4"), ref_eyeblink=str(tmp / "ref.mp4"),
+                ))
+
+            self.assertEqual(run(1)["cache_hits"], [])
+            # 新的流水线（相当于下一次运行）直接命中，缓存里的系数文件在任务结束后仍然可用
+            self.assertEqual(run(2)["cache_hits"], ["extract_source", "extract_ref_eyeblink"])
+            self.assertEqual(len(models.preprocess.calls), 2)
+            self.assertTrue(Path((tmp / "out" / "2.mp4")).exists())
+
+            # 预处理模式或图片内容变化都要重新提取
+            self.assertEqual(run(3, preprocess="full")["cache_hits"], [])
+            (tmp / "face.png").write_bytes(b"new face")
+            self.assertEqual(run(4)["cache_hits"], ["extract_ref_eyeblink"])
+            self.assertEqual(len(models.preprocess.calls), 5)
+
+    def test_unreadable_source_raises(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pipeline = SadTalkerPipeline(make_stub_models(), log=lambda message: None)
+            with self.assertRaises(RuntimeError):
+                pipeline.run(TalkingHeadJob("unreadable.png", "1.wav", os.path.join(tmp, "1.mp4")))
+            self.assertEqual(os.listdir(tmp), [])
+
+
+class TestSadTalkerWorker(unittest.TestCase):
+    def test_one_process_serves_many_jobs(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.dict(os.environ, {"PYTHONPATH": str(Path(__file__).resolve().parent)}):
+            logs = []
+            face = os.path.join(tmp, "face.png")
+            unreadable = os.path.join(tmp, "unreadable.png")
+            Path(face).write_bytes(b"face")
+            Path(unreadable).write_bytes(b"not a face")
+            worker = SadTalkerWorker(models="test_sadtalker_worker:make_noisy_stub_models", sadtalker_path=tmp,
+                                     coeff_cache_dir=os.path.join(tmp, "cache"), on_log=logs.append)
+            with worker:
+                results = [
+                    worker.submit(TalkingHeadJob(face, f"{idx}.wav", os.path.join(tmp, f"{idx}.mp4")))
+                    for idx in (1, 2)
+                ]
+                failed = worker.submit(TalkingHeadJob(unreadable, "3.wav", os.path.join(tmp, "3.mp4")))
+                after_failure = worker.submit(TalkingHeadJob(face, "4.wav", os.path.join(tmp, "4.mp4")))
+
+            self.assertTrue(all(r["ok"] for r in results + [after_failure]))
+            pids = {Path(tmp, f"{idx}.mp4").read_text(encoding="utf-8").split("|")[2] for idx in (1, 2, 4)}
+            self.assertEqual(pids, {str(worker.pid)})
+            self.assertFalse(failed["ok"])
+            self.assertIn("RuntimeError", failed["error"])
+            self.assertIn("face_render", results[0]["timings"])
+            self.assertEqual(results[1]["cache_hits"], ["extract_source"])
+            # 没有换行的进度条与下一条日志连成一行（同终端显示），但不影响协议
+            self.assertTrue(logs[0].startswith("Loading checkpoints: 100%|██████████|"))
+            self.assertIn("3DMM Extraction for source image", logs)
+            self.assertIsNone(worker.process)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,223 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+from src.utils import scene_segments
+
+
+ANIMATE_TEMPLATE = '''
+from src.animate import SunziLessonVertical
+
+
+def helper():
+    return {helper_value}
+
+
+class Lesson01VerticalScenes(SunziLessonVertical):
+    def build_scene_1(self, scene):
+        icon = self.load_png_icon("group", height=2)
+        self.play(Write(Text("{title_1}")))
+
+    def build_scene_2(self, scene):
+        self.play(Write(Text("{title_2}")))
+'''
+
+RENDER_ARGS = ["-qh", "-r", "1080,1920", "--fps", "60", "--disable_caching"]
+
+
+class FakeRunner:
+    """模拟 manim / ffmpeg：manim 在 --media_dir 下生成 -o 指定的文件，ffmpeg 生成最后一个参数"""
+
+    def __init__(self):
+        self.manim_scenes = []
+        self.concat_lists = []
+
+    def __call__(self, cmd, cwd=None, env=None, check=False, stdout=None, stderr=None):
+        if cmd[:3] == ["uv", "run", "manim"]:
+            media_dir = cmd[cmd.index("--media_dir") + 1]
+            name = cmd[cmd.index("-o") + 1]
+            self.manim_scenes.append(int(env["RENDER_SCENES"]))
+            out = Path(media_dir) / "videos" / "animate" / "1920p60" / f"{name}.mp4"
+            out.parent.mkdir(parents=True, exist_ok=True)
+            out.write_bytes(f"{name}:{env['RENDER_SCENES']}".encode("utf-8"))
+        elif cmd[0] == "ffmpeg":
+            if "concat" in cmd:
+                list_path = cmd[cmd.index("-i") + 1]
+                self.concat_lists.append(Path(list_path).read_text(encoding="utf-8"))
+            Path(cmd[-1]).write_bytes(b"video")
+        else:
+            raise AssertionError(cmd)
+
+
+class SlowRunner(FakeRunner):
+    """manim 调用耗时 delay 秒，记录同时运行的进程数；fail 中的场景渲染失败"""
+
+    def __init__(self, delay=0.05, fail=()):
+        super().__init__()
+        self.delay = delay
+        self.fail = set(fail)
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, cmd, **kwargs):
+        if cmd[:3] != ["uv", "run", "manim"]:
+            return super().__call__(cmd, **kwargs)
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(self.delay)
+            if int(kwargs["env"]["RENDER_SCENES"]) in self.fail:
+                raise RuntimeError("render failed")
+            return super().__call__(cmd, **kwargs)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class TestSceneSegments(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.cache_patch = patch.dict(os.environ, {"YYY_CACHE_DIR": str(root / "cache")})
+        self.cache_patch.start()
+        self.project_root = root / "project"
+        (self.project_root / "src" / "animate").mkdir(parents=True)
+        (self.project_root / "src" / "animate" / "lesson_vertical.py").write_text("# base v1\n", encoding="utf-8")
+        self.lesson_dir = root / "lesson01"
+        (self.lesson_dir / "voice").mkdir(parents=True)
+        (self.lesson_dir / "images").mkdir()
+        (self.lesson_dir / "images" / "cover_design.png").write_bytes(b"cover")
+        for idx in (1, 2):
+            (self.lesson_dir / "voice" / f"{idx}.mp3").write_bytes(f"audio{idx}".encode("utf-8"))
+        (self.lesson_dir / "voice" / "full_audio.wav").write_bytes(b"wav")
+        self.script = {"scenes": [
+            {"scene_index": 1, "voiceover_script": "第一段"},
+            {"scene_index": 2, "voiceover_script": "第二段"},
+        ]}
+        self.write_lesson()
+
+    def tearDown(self):
+        self.cache_patch.stop()
+        self.tmp.cleanup()
+
+    def write_lesson(self, title_1="标题一", title_2="标题二", helper_value=1):
+        (self.lesson_dir / "script.json").write_text(json.dumps(self.script, ensure_ascii=False), encoding="utf-8")
+        (self.lesson_dir / "animate.py").write_text(
+            ANIMATE_TEMPLATE.format(title_1=title_1, title_2=title_2, helper_value=helper_value), encoding="utf-8"
+        )
+
+    def fingerprints(self):
+        return dict(scene_segments.scene_fingerprints(str(self.lesson_dir), RENDER_ARGS, str(self.project_root)))
+
+    def test_extracts_methods_and_icons(self):
+        methods, prelude = scene_segments.extract_scene_sources(self.lesson_dir / "animate.py")
+        self.assertEqual(sorted(methods), [1, 2])
+        self.assertNotIn("build_scene_1", prelude)
+        self.assertIn("def helper", prelude)
+        self.assertEqual(scene_segments.referenced_icons(methods[1]), ["group"])
+
+    def test_only_edited_scene_changes(self):
+        before = self.fingerprints()
+        self.assertEqual(sorted(before), [0, 1, 2])
+
+        self.write_lesson(title_2="新标题二")
+        after = self.fingerprints()
+        self.assertEqual([idx for idx in before if before[idx] != after[idx]], [2])
+
+        self.script["scenes"][0]["voiceover_script"] = "第一段改"
+        self.write_lesson(title_2="新标题二")
+        self.assertEqual([idx for idx, fp in self.fingerprints().items() if fp != after[idx]], [1])
+
+    def test_shared_code_audio_and_settings_invalidate(self):
+        before = self.fingerprints()
+        (self.lesson_dir / "voice" / "1.mp3").write_bytes(b"new audio")
+        self.assertEqual([idx for idx, fp in self.fingerprints().items() if fp != before[idx]], [1])
+
+        self.write_lesson(helper_value=2)
+        changed = self.fingerprints()
+        self.assertNotEqual(changed[2], before[2])
+        self.assertEqual(changed[0], before[0])
+
+        (self.project_root / "src" / "animate" / "lesson_vertical.py").write_text("# base v2\n", encoding="utf-8")
+        rebased = self.fingerprints()
+        self.assertTrue(all(rebased[idx] != changed[idx] for idx in rebased))
+
+        # 缓存模块（文字轮廓、图标索引、图片缓存）变化同样影响所有场景的画面
+        (self.project_root / "src" / "utils").mkdir()
+        (self.project_root / "src" / "utils" / "text_cache.py").write_text("# outlines v2\n", encoding="utf-8")
+        recached = self.fingerprints()
+        self.assertTrue(all(recached[idx] != rebased[idx] for idx in recached))
+        rebased = recached
+
+        other = dict(scene_segments.scene_fingerprints(str(self.lesson_dir), ["-ql"], str(self.project_root)))
+        self.assertTrue(all(other[idx] != rebased[idx] for idx in other))
+
+    def test_incremental_render_reuses_unchanged_segments(self):
+        output = self.lesson_dir / "media" / "videos" / "animate" / "1920p60" / "Lesson01VerticalScenes.mp4"
+        render = lambda runner: scene_segments.render_incremental(
+            str(self.lesson_dir), "Lesson01VerticalScenes", RENDER_ARGS, str(output),
+            runner=runner, project_root=str(self.project_root), duration=lambda path: 1.0,
+        )
+        first = render(FakeRunner())
+        self.assertEqual(first["rendered"], [0, 1, 2])
+        self.assertTrue(output.exists())
+
+        self.write_lesson(title_2="新标题二")
+        runner = FakeRunner()
+        second = render(runner)
+        self.assertEqual((second["rendered"], second["reused"]), ([2], [0, 1]))
+        self.assertEqual(runner.manim_scenes, [2])
+        listed = [line.split("/")[-1] for line in runner.concat_lists[0].splitlines()]
+        self.assertEqual([name[:8] for name in listed], ["scene_00", "scene_01", "scene_02"])
+        segments = sorted(os.listdir(self.lesson_dir / "media" / "segments"))
+        self.assertEqual(len([name for name in segments if name.endswith(".mp4")]), 3)
+
+    def render_parallel(self, runner, workers=3):
+        output = self.lesson_dir / "media" / "out.mp4"
+        durations = {"1.mp3": 2.0, "2.mp3": 5.0}
+        return scene_segments.render_incremental(
+            str(self.lesson_dir), "Lesson01VerticalScenes", RENDER_ARGS, str(output),
+            runner=runner, project_root=str(self.project_root), workers=workers,
+            duration=lambda path: durations[os.path.basename(path)],
+        )
+
+    def test_timeline_offsets_follow_audio_durations(self):
+        summary = self.render_parallel(FakeRunner(), workers=1)
+        self.assertEqual(summary["timeline"], {0: (0.0, 0.5), 1: (0.5, 2.0), 2: (2.5, 5.0)})
+
+    def test_scenes_render_in_parallel_longest_first(self):
+        runner = SlowRunner()
+        summary = self.render_parallel(runner)
+        self.assertEqual(runner.max_running, 3)
+        self.assertEqual(summary["rendered"], [0, 1, 2])
+        # 拼接顺序始终是播放顺序，与渲染完成顺序无关
+        listed = [line.split("/")[-1][:8] for line in runner.concat_lists[0].splitlines()]
+        self.assertEqual(listed, ["scene_00", "scene_01", "scene_02"])
+
+        serial = SlowRunner(delay=0)
+        self.write_lesson(title_1="改", title_2="改")
+        self.render_parallel(serial, workers=1)
+        self.assertEqual(serial.manim_scenes, [2, 1])
+
+    def test_failed_scene_aborts_before_stitching(self):
+        runner = SlowRunner(fail={1})
+        with self.assertRaises(RuntimeError):
+            self.render_parallel(runner)
+        self.assertEqual(runner.concat_lists, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
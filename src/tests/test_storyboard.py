@@ -0,0 +1,49 @@
+import importlib.util
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+from src.utils.storyboard import build_contact_sheet, storyboard_tiles
+
+
+class TestStoryboard(unittest.TestCase):
+    def test_tiles_cover_first_then_numeric_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            for name in ("10.png", "2.png", "1.png", "contact_sheet.png", "notes.txt"):
+                (tmp / name).write_bytes(b"png")
+            cover = tmp / "cover_design.png"
+            cover.write_bytes(b"png")
+            tiles = storyboard_tiles(str(tmp), cover_path=str(cover))
+            self.assertEqual([label for label, _ in tiles], ["cover", "scene 1", "scene 2", "scene 10"])
+            self.assertEqual([label for label, _ in storyboard_tiles(str(tmp / "missing"))], [])
+            # 场景 10 已删除：旧缩略图还在目录里，但不上联系表
+            current = storyboard_tiles(str(tmp), cover_path=str(cover), scene_indices={1, 2})
+            self.assertEqual([label for label, _ in current], ["cover", "scene 1", "scene 2"])
+
+    @unittest.skipUnless(importlib.util.find_spec("PIL"), "需要 Pillow")
+    def test_contact_sheet_grid_size(self):
+        from PIL import Image
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            tiles = []
+            for idx in range(1, 6):
+                path = tmp / f"{idx}.png"
+                Image.new("RGB", (540, 960), (idx * 40, 0, 0)).save(path)
+                tiles.append((f"scene {idx}", str(path)))
+            out = build_contact_sheet(tiles, str(tmp / "sheet.png"), columns=4, tile_width=90, padding=10, label_height=20)
+            with Image.open(out) as sheet:
+                # 4 列 2 行：宽 4 * (90 + 10) + 10，高 2 * (160 + 20 + 10) + 10
+                self.assertEqual(sheet.size, (410, 390))
+            self.assertIsNone(build_contact_sheet([], str(tmp / "empty.png")))
+
+
+if __name__ == "__main__":
+    unittest.main()
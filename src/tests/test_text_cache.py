@@ -0,0 +1,144 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+from src.utils import text_cache
+from src.utils.text_cache import (
+    TextOutlineCache, is_cacheable, outline_key, outline_style, pack_outlines, text_cache_enabled, unpack_outlines,
+)
+
+
+GLYPHS = [[0.0, 0.0, 0.0, 1.5, -2.25, 0.0, 3.0, 4.0, 0.0], [], [0.5, 0.5, 0.0]]
+
+
+class TestOutlineFormat(unittest.TestCase):
+    def test_round_trip(self):
+        glyphs, build_ms = unpack_outlines(pack_outlines(GLYPHS, build_ms=12.5))
+        self.assertEqual([list(g) for g in glyphs], GLYPHS)
+        self.assertEqual(build_ms, 12.5)
+
+    def test_rejects_bad_data(self):
+        data = pack_outlines(GLYPHS)
+        self.assertIsNone(unpack_outlines(data[:-4]))
+        self.assertIsNone(unpack_outlines(b"XXXX" + data[4:]))
+        self.assertIsNone(unpack_outlines(b""))
+        with self.assertRaises(ValueError):
+            pack_outlines([[1.0, 2.0]])
+
+    def test_key_ignores_style_only(self):
+        base = {"font": "Kaiti SC", "font_size": 48}
+        key = outline_key("投资人", base, "0.18.1")
+        self.assertEqual(key, outline_key("投资人", {**base, "color": "#FF0000", "fill_opacity": 0.5}, "0.18.1"))
+        self.assertNotEqual(key, outline_key("投资人", {**base, "font_size": 36}, "0.18.1"))
+        self.assertNotEqual(key, outline_key("投资人", {**base, "weight": "BOLD"}, "0.18.1"))
+        self.assertNotEqual(key, outline_key("投资人", {**base, "line_spacing": 1.2}, "0.18.1"))
+        self.assertNotEqual(key, outline_key("投资人", base, "0.19.0"))
+        self.assertTrue(is_cacheable(base))
+        self.assertTrue(is_cacheable({**base, "t2c": {}}))
+        self.assertFalse(is_cacheable({**base, "t2c": {"投资": "#FF0000"}}))
+
+
+class TestOutlineStyle(unittest.TestCase):
+    def test_defaults_match_text(self):
+        self.assertEqual(outline_style({"font_size": 48}, "#FFFFFF"), {
+            "fill_color": "#FFFFFF", "fill_opacity": 1.0, "stroke_color": "#FFFFFF", "stroke_width": 0,
+        })
+
+    def test_caller_style_kwargs_are_applied_on_hit(self):
+        style = outline_style(
+            {"color": "#58C4DD", "stroke_color": "#000000", "stroke_width": 3, "fill_opacity": 0.4, "stroke_opacity": 0.5},
+            "#FFFFFF",
+        )
+        self.assertEqual(style, {
+            "fill_color": "#58C4DD", "fill_opacity": 0.4, "stroke_color": "#000000", "stroke_width": 3,
+            "stroke_opacity": 0.5,
+        })
+        self.assertEqual(outline_style({"fill_color": "#FF0000"}, "#FFFFFF")["stroke_color"], "#FF0000")
+
+    def test_env_switch(self):
+        with mock.patch.dict(os.environ, {"TEXT_CACHE": "false"}):
+            self.assertFalse(text_cache_enabled())
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertTrue(text_cache_enabled())
+
+
+class TestTextOutlineCache(unittest.TestCase):
+    def test_store_then_load_from_new_process(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = TextOutlineCache(cache_dir=tmp)
+            self.assertIsNone(writer.load("ab" * 32))
+            writer.store("ab" * 32, GLYPHS, build_ms=40.0)
+            self.assertEqual(writer.misses, 1)
+            # 同进程再次使用：命中内存副本，不计节省（manim 自己也有进程内缓存）
+            self.assertIsNotNone(writer.load("ab" * 32))
+            self.assertEqual(writer.saved_ms, 0.0)
+
+            reader = TextOutlineCache(cache_dir=tmp)
+            glyphs = reader.load("ab" * 32)
+            self.assertEqual([list(g) for g in glyphs], GLYPHS)
+            reader.load("ab" * 32)
+            self.assertEqual(reader.hits, 2)
+            self.assertGreater(reader.saved_ms, 30.0)
+            self.assertLessEqual(reader.saved_ms, 40.0)
+            self.assertIn("命中 2", reader.report())
+
+            reader.forget()
+            reader.load("ab" * 32)
+            self.assertGreater(reader.saved_ms, 60.0)
+
+    def test_corrupt_entry_is_a_miss(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = TextOutlineCache(cache_dir=tmp)
+            path = cache.path_for("cd" * 32)
+            os.makedirs(os.path.dirname(path))
+            Path(path).write_bytes(b"YTXO garbage")
+            self.assertIsNone(cache.load("cd" * 32))
+            self.assertEqual((cache.hits, cache.misses), (0, 0))
+            self.assertEqual(cache.report(), "")
+
+    def test_placeholder_svg(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = TextOutlineCache(cache_dir=os.path.join(tmp, "outlines")).placeholder_svg()
+            self.assertTrue(Path(path).read_text(encoding="utf-8").startswith("<svg"))
+
+
+@unittest.skipUnless(importlib.util.find_spec("manim"), "需要 manim")
+class TestCachedText(unittest.TestCase):
+    def test_hit_matches_fresh_layout(self):
+        import numpy as np
+        from manim import BLUE, Text
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = TextOutlineCache(cache_dir=tmp)
+            with mock.patch.object(text_cache, "_shared_cache", cache):
+                cached_text = text_cache.get_cached_text_class()
+                fresh = Text("复利的力量", font_size=48)
+                first = cached_text("复利的力量", font_size=48)
+                cache.forget()
+                hit = cached_text("复利的力量", font_size=48, color=BLUE)
+            self.assertEqual((cache.misses, cache.hits), (1, 1))
+            self.assertIsInstance(hit, Text)
+            self.assertEqual(len(hit.submobjects), len(fresh.submobjects))
+            np.testing.assert_allclose(hit.get_all_points(), fresh.get_all_points(), atol=1e-4)
+            np.testing.assert_allclose(first.get_all_points(), fresh.get_all_points())
+            self.assertEqual(hit.get_fill_color().to_hex().lower(), BLUE.to_hex().lower())
+            hit.copy()
+
+            outlined = cached_text("复利的力量", font_size=48, stroke_color=BLUE, stroke_width=2, fill_opacity=0.5)
+            self.assertEqual(cache.hits, 2)
+            self.assertEqual(outlined.get_stroke_width(), 2)
+            self.assertEqual(outlined.get_fill_opacity(), 0.5)
+            self.assertEqual(outlined.get_stroke_color().to_hex().lower(), BLUE.to_hex().lower())
+
+
+if __name__ == "__main__":
+    unittest.main()
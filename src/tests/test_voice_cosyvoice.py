@@ -0,0 +1,299 @@
+import os
+import pickle
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+TOOLS_DIR = WORKSPACE_ROOT / "tools" / "optional_voice"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.insert(0, str(TOOLS_DIR))
+
+import voice_cosyvoice
+from voice_cosyvoice import CosyVoiceEngine, speaker_id_for, split_sentences
+
+
+class StubFrontend:
+    def __init__(self):
+        self.spk2info = {}
+
+
+class StubCosyVoice:
+    """记录特征提取次数的 CosyVoice 替身"""
+
+    sample_rate = 22050
+
+    def __init__(self):
+        self.frontend = StubFrontend()
+        self.extracted = []
+
+    def add_zero_shot_spk(self, prompt_text, prompt_wav, zero_shot_spk_id):
+        self.extracted.append(prompt_wav)
+        self.frontend.spk2info[zero_shot_spk_id] = {"prompt_text": prompt_text, "wav": prompt_wav}
+        return True
+
+
+def pickle_save(path, features):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump(features, f)
+
+
+def pickle_load(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class TestCosyVoiceEngine(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(
+            voice_cosyvoice, save_speaker_features=pickle_save, load_speaker_features=pickle_load,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_speaker_features_extracted_once_across_engines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            wav = os.path.join(tmp, "frank.wav")
+            Path(wav).write_bytes(b"voice")
+            models = []
+
+            def factory(model_dir):
+                models.append(StubCosyVoice())
+                return models[-1]
+
+            first = CosyVoiceEngine(cache_dir=tmp, model_factory=factory)
+            spk_id = first.register_speaker(wav, "你好")
+            self.assertTrue(spk_id.startswith("frank-"))
+            self.assertEqual(first.register_speaker(wav, "你好"), spk_id)
+            self.assertEqual(len(models[0].extracted), 1)
+
+            # 新引擎（相当于下一次运行）从磁盘加载，不再提取
+            second = CosyVoiceEngine(cache_dir=tmp, model_factory=factory)
+            self.assertEqual(second.register_speaker(wav, "你好"), spk_id)
+            self.assertEqual(models[1].extracted, [])
+            self.assertEqual(models[1].frontend.spk2info[spk_id], {"prompt_text": "你好", "wav": wav})
+
+            # 提示文本或录音变化都是新的说话人
+            self.assertNotEqual(second.register_speaker(wav, "再见"), spk_id)
+            Path(wav).write_bytes(b"new voice")
+            self.assertNotEqual(speaker_id_for(wav, "你好", first.model_dir), spk_id)
+            self.assertEqual(len(models[1].extracted), 1)
+
+
+class SpeakingStub(StubCosyVoice):
+    """按全局随机数生成"音频"：种子相同则输出相同，用来检查串行 / 并行一致"""
+
+    class Speech(list):
+        def squeeze(self):
+            return self
+
+        def cpu(self):
+            return self
+
+        def numpy(self):
+            return list(self)
+
+    def inference_zero_shot(self, tts_text, prompt_text, prompt_wav, zero_shot_spk_id="", stream=False):
+        assert zero_shot_spk_id in self.frontend.spk2info
+        yield {"tts_speech": self.Speech(random.random() for _ in range(len(tts_text) * 10))}
+
+
+def make_speaking_stub(model_dir):
+    """worker 进程里的模型工厂；说话人特征用 pickle 存取（worker 进程里没有测试的 patch）"""
+    voice_cosyvoice.save_speaker_features = pickle_save
+    voice_cosyvoice.load_speaker_features = pickle_load
+    return SpeakingStub()
+
+
+class TestSentenceChunks(unittest.TestCase):
+    def test_split_at_sentence_boundaries(self):
+        text = "复利是世界第八大奇迹。“时间”是朋友！\n那么，怎么开始？先存钱；再投资"
+        self.assertEqual(split_sentences(text, max_chars=1), [
+            "复利是世界第八大奇迹。", "“时间”是朋友！", "那么，怎么开始？", "先存钱；", "再投资",
+        ])
+        self.assertEqual(split_sentences(text, max_chars=20), [
+            "复利是世界第八大奇迹。“时间”是朋友！", "那么，怎么开始？先存钱；再投资",
+        ])
+        self.assertEqual(split_sentences("他说：“好。”然后走了。", max_chars=1), ["他说：“好。”", "然后走了。"])
+        self.assertEqual(split_sentences("  \n "), [])
+
+
+class TestParallelSynthesis(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(
+            voice_cosyvoice, save_speaker_features=pickle_save, load_speaker_features=pickle_load,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_batch(self, tmp, workers):
+        written = {}
+
+        def fake_write_wav(path, chunks, sample_rate):
+            chunks = written[os.path.basename(path)] = [list(chunk) for chunk in chunks]
+            return sum(len(chunk) for chunk in chunks)
+
+        engine = CosyVoiceEngine(cache_dir=os.path.join(tmp, "speakers"), model_factory=make_speaking_stub)
+        items = [
+            ("第一句。第二句！", os.path.join(tmp, "1.wav")),
+            ("", os.path.join(tmp, "2.wav")),
+            ("只有一句", os.path.join(tmp, "3.wav")),
+        ]
+        with mock.patch.object(voice_cosyvoice, "write_wav", fake_write_wav):
+            results = engine.synthesize_many(
+                items, os.path.join(tmp, "frank.wav"), "你好", workers=workers, threads=1, max_chars=1,
+            )
+        return results, written
+
+    def test_parallel_matches_serial(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            Path(tmp, "frank.wav").write_bytes(b"voice")
+            serial, serial_audio = self.run_batch(tmp, workers=1)
+            parallel, parallel_audio = self.run_batch(tmp, workers=2)
+
+        self.assertEqual(serial_audio, parallel_audio)
+        self.assertEqual([len(chunks) for chunks in serial_audio.values()], [2, 1])
+        self.assertEqual([r.get("chunks") for r in parallel], [2, None, 1])
+        self.assertIn("error", parallel[1])
+        self.assertAlmostEqual(parallel[0]["audio_seconds"], 80 / SpeakingStub.sample_rate, places=3)
+
+    def test_serial_run_applies_thread_limit(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(voice_cosyvoice, "set_torch_threads") as set_threads:
+            Path(tmp, "frank.wav").write_bytes(b"voice")
+            self.run_batch(tmp, workers=1)
+        set_threads.assert_called_with(1)
+
+
+class LazyFuture:
+    def __init__(self, pool, func, args):
+        self.pool, self.func, self.args = pool, func, args
+
+    def result(self):
+        self.pool.in_flight -= 1
+        return self.func(*self.args)
+
+
+class InlinePool:
+    """同进程的 ProcessPoolExecutor 替身：取结果时才执行，记录同时在途的任务数"""
+
+    peak = 0
+
+    def __init__(self, max_workers, mp_context, initializer, initargs):
+        initializer(*initargs)
+        self.in_flight = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, func, *args):
+        self.in_flight += 1
+        type(self).peak = max(type(self).peak, self.in_flight)
+        return LazyFuture(self, func, args)
+
+
+class TestSubmissionWindow(unittest.TestCase):
+    def test_in_flight_sentences_bounded_by_window(self):
+        InlinePool.peak = 0
+        written = {}
+
+        def fake_write_wav(path, chunks, sample_rate):
+            written[os.path.basename(path)] = [list(chunk) for chunk in chunks]
+            return sum(len(chunk) for chunk in written[os.path.basename(path)])
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch("concurrent.futures.ProcessPoolExecutor", InlinePool), \
+                mock.patch.object(voice_cosyvoice, "write_wav", fake_write_wav), \
+                mock.patch.object(voice_cosyvoice, "_worker_engine", None):
+            Path(tmp, "frank.wav").write_bytes(b"voice")
+            engine = CosyVoiceEngine(cache_dir=os.path.join(tmp, "speakers"), model_factory=make_speaking_stub)
+            items = [("一。二。三。四。", os.path.join(tmp, "1.wav")), ("五。六。", os.path.join(tmp, "2.wav"))]
+            results = engine.synthesize_many(items, os.path.join(tmp, "frank.wav"), workers=2, threads=1, max_chars=1)
+
+        self.assertEqual(InlinePool.peak, 4)
+        self.assertEqual([r["chunks"] for r in results], [4, 2])
+        self.assertEqual(sorted(written), ["1.wav", "2.wav"])
+
+
+class SegmentingStub(StubCosyVoice):
+    """每次推理产出多段音频的生成器，记录产出与写入的先后顺序"""
+
+    def __init__(self, events):
+        super().__init__()
+        self.events = events
+        self.stream_flags = []
+
+    def inference_zero_shot(self, tts_text, prompt_text, prompt_wav, zero_shot_spk_id="", stream=False):
+        self.stream_flags.append(stream)
+        for idx in range(3):
+            if tts_text.startswith("坏"):
+                raise RuntimeError("推理失败")
+            segment = f"{tts_text}#{idx}"
+            self.events.append(("yield", segment))
+            yield {"tts_speech": SpeakingStub.Speech([segment])}
+
+
+class FakeWav:
+    def __init__(self, path, events):
+        self.events = events
+        Path(path).write_bytes(b"RIFF")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, chunk):
+        self.events.append(("write", chunk[0]))
+
+
+class TestStreamingWrite(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(
+            voice_cosyvoice, save_speaker_features=pickle_save, load_speaker_features=pickle_load,
+            open_wav=lambda path, sample_rate: FakeWav(path, self.events),
+        )
+        self.events = []
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_every_segment_written_as_it_arrives(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            Path(tmp, "frank.wav").write_bytes(b"voice")
+            model = SegmentingStub(self.events)
+            engine = CosyVoiceEngine(cache_dir=tmp, model_factory=lambda model_dir: model)
+            spk_id = engine.register_speaker(os.path.join(tmp, "frank.wav"), "你好")
+            stats = engine.synthesize("一。二。", spk_id, os.path.join(tmp, "1.wav"), max_chars=1, stream=True)
+
+        segments = [f"{sentence}#{idx}" for sentence in ("一。", "二。") for idx in range(3)]
+        # 每段一产出就写入，而不是攒齐再写；两句的各段都在，顺序不变
+        self.assertEqual(self.events, [(event, s) for s in segments for event in ("yield", "write")])
+        self.assertEqual(model.stream_flags, [True, True])
+        self.assertEqual((stats["chunks"], stats["audio_seconds"]), (2, round(6 / model.sample_rate, 3)))
+        self.assertIsNotNone(stats["first_audio"])
+
+    def test_failed_clip_leaves_no_partial_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            Path(tmp, "frank.wav").write_bytes(b"voice")
+            engine = CosyVoiceEngine(cache_dir=tmp, model_factory=lambda model_dir: SegmentingStub(self.events))
+            results = engine.synthesize_many(
+                [("好。坏。", os.path.join(tmp, "1.wav")), ("好。", os.path.join(tmp, "2.wav"))],
+                os.path.join(tmp, "frank.wav"), max_chars=1,
+            )
+            self.assertIn("推理失败", results[0]["error"])
+            self.assertFalse(os.path.exists(os.path.join(tmp, "1.wav")))
+            self.assertTrue(os.path.exists(os.path.join(tmp, "2.wav")))
+            self.assertIsNotNone(results[1]["first_audio"])
+
+
+if __name__ == "__main__":
+    unittest.main()
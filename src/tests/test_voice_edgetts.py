@@ -0,0 +1,189 @@
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import types
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+
+WORKSPACE_ROOT = Path(__file__).resolve().parents[2]
+if str(WORKSPACE_ROOT) not in sys.path:
+    sys.path.insert(0, str(WORKSPACE_ROOT))
+
+# 测试不访问网络：edge_tts 未安装时注册一个空模块，Communicate 由各用例替换
+if "edge_tts" not in sys.modules:
+    try:
+        import edge_tts  # noqa: F401
+    except ImportError:
+        sys.modules["edge_tts"] = types.ModuleType("edge_tts")
+
+from src.utils import voice_edgetts
+from src.utils.audio_duration import DurationIndex
+
+
+class FakeCommunicate:
+    """本地假 Communicate：记录并发度，可按文本注入失败次数"""
+
+    active = 0
+    peak = 0
+    calls = []
+    failures = {}
+    delay = 0.01
+
+    def __init__(self, text, voice):
+        self.text = text
+        self.voice = voice
+
+    @classmethod
+    def reset(cls, failures=None, delay=0.01):
+        cls.active = 0
+        cls.peak = 0
+        cls.calls = []
+        cls.failures = dict(failures or {})
+        cls.delay = delay
+
+    async def save(self, path):
+        cls = type(self)
+        cls.calls.append(self.text)
+        cls.active += 1
+        cls.peak = max(cls.peak, cls.active)
+        try:
+            with open(path, "wb") as f:
+                f.write(b"partial")
+                await asyncio.sleep(cls.delay)
+                if cls.failures.get(self.text, 0) > 0:
+                    cls.failures[self.text] -= 1
+                    raise ConnectionError("network down")
+                f.write(f"|{self.voice}|{self.text}".encode("utf-8"))
+        finally:
+            cls.active -= 1
+
+
+class TestGenerateVoiceForScripts(unittest.TestCase):
+    def run_generate(self, scripts, output_dir, **kwargs):
+        kwargs.setdefault("backoff", 0)
+        with patch.object(voice_edgetts.edge_tts, "Communicate", FakeCommunicate, create=True):
+            asyncio.run(voice_edgetts.generate_voice_for_scripts(scripts, output_dir, "zh-CN-YunxiNeural", **kwargs))
+
+    def test_concurrency_is_bounded(self):
+        FakeCommunicate.reset()
+        scripts = {str(i): f"第{i}段" for i in range(1, 8)}
+        with tempfile.TemporaryDirectory() as tmp:
+            self.run_generate(scripts, tmp, concurrency=3)
+            self.assertEqual(FakeCommunicate.peak, 3)
+            self.assertEqual(sorted(os.listdir(tmp)), sorted(f"{i}.mp3" for i in range(1, 8)))
+
+    def test_retry_then_success(self):
+        FakeCommunicate.reset(failures={"第1段": 2})
+        with tempfile.TemporaryDirectory() as tmp:
+            self.run_generate({"1": "第1段"}, tmp, retries=2)
+            content = (Path(tmp) / "1.mp3").read_bytes()
+            self.assertTrue(content.endswith("|第1段".encode("utf-8")))
+            self.assertEqual(FakeCommunicate.calls.count("第1段"), 3)
+
+    def test_failed_clip_leaves_no_partial_file(self):
+        FakeCommunicate.reset(failures={"第2段": 5})
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(RuntimeError):
+                self.run_generate({"1": "第1段", "2": "第2段"}, tmp, retries=1)
+            self.assertEqual(os.listdir(tmp), ["1.mp3"])
+
+    def test_pronunciation_fix_applied_before_synthesis(self):
+        FakeCommunicate.reset()
+        with tempfile.TemporaryDirectory() as tmp:
+            self.run_generate({"1": "央行降息降准"}, tmp)
+            self.assertEqual(FakeCommunicate.calls, ["央行酱息酱准"])
+
+
+class TestSyncVoiceClips(unittest.TestCase):
+    def sync(self, scripts, voice_dir, cache_dir, **kwargs):
+        with patch.object(voice_edgetts.edge_tts, "Communicate", FakeCommunicate, create=True):
+            return asyncio.run(voice_edgetts.sync_voice_clips(
+                scripts, voice_dir, "zh-CN-YunxiNeural", cache_dir=cache_dir, **kwargs
+            ))
+
+    def test_only_changed_scene_is_resynthesized(self):
+        FakeCommunicate.reset(delay=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            voice_dir, cache_dir = Path(tmp) / "voice", Path(tmp) / "cache"
+            cache_dir.mkdir()
+            scripts = {"1": "第一段", "2": "第二段", "3": "第三段"}
+            first = self.sync(scripts, voice_dir, cache_dir)
+            self.assertEqual(sorted(first["synthesized"]), ["1.mp3", "2.mp3", "3.mp3"])
+
+            FakeCommunicate.reset(delay=0)
+            second = self.sync({**scripts, "3": "第三段改"}, voice_dir, cache_dir)
+            self.assertEqual(second["synthesized"], ["3.mp3"])
+            self.assertEqual(sorted(second["reused"]), ["1.mp3", "2.mp3"])
+            self.assertEqual(FakeCommunicate.calls, ["第三段改"])
+            self.assertIn("第三段改".encode("utf-8"), (voice_dir / "3.mp3").read_bytes())
+
+    def test_unchanged_manifest_is_not_rewritten(self):
+        FakeCommunicate.reset(delay=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            voice_dir, cache_dir = Path(tmp) / "voice", Path(tmp) / "cache"
+            cache_dir.mkdir()
+            self.sync({"1": "第一段"}, voice_dir, cache_dir)
+            # 并行渲染的各 manim 进程重复同步时清单不变，不再写文件
+            with patch.object(voice_edgetts, "_save_clip_manifest") as save:
+                summary = self.sync({"1": "第一段"}, voice_dir, cache_dir)
+            self.assertEqual(summary["reused"], ["1.mp3"])
+            save.assert_not_called()
+            self.assertEqual(sorted(os.listdir(voice_dir)), [".clips.json", "1.mp3"])
+
+    def test_cache_is_shared_across_lessons(self):
+        FakeCommunicate.reset(delay=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_dir = Path(tmp) / "cache"
+            cache_dir.mkdir()
+            self.sync({"1": "同一句话"}, Path(tmp) / "lesson01" / "voice", cache_dir)
+
+            FakeCommunicate.reset(delay=0)
+            summary = self.sync({"5": "同一句话"}, Path(tmp) / "lesson02" / "voice", cache_dir)
+            self.assertEqual(summary["linked"], ["5.mp3"])
+            self.assertEqual(FakeCommunicate.calls, [])
+
+    def test_legacy_clips_kept_only_when_duration_sidecar_matches(self):
+        FakeCommunicate.reset(delay=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            voice_dir, cache_dir = Path(tmp) / "voice", Path(tmp) / "cache"
+            voice_dir.mkdir()
+            cache_dir.mkdir()
+            for name in ("1.mp3", "2.mp3", "3.mp3"):
+                (voice_dir / name).write_bytes(b"recorded earlier")
+            # 1、2 上次渲染时预热过时长（sidecar 有记录）；2 之后被改动过，3 从没有记录
+            index = DurationIndex(probe=lambda path: 1.0, native_reader=None)
+            index.prime([voice_dir / "1.mp3", voice_dir / "2.mp3"], sidecar_dir=voice_dir)
+            (voice_dir / "2.mp3").write_bytes(b"replaced by hand")
+
+            with redirect_stdout(io.StringIO()) as out:
+                summary = self.sync({"1": "第一段", "2": "第二段", "3": "第三段"}, voice_dir, cache_dir)
+            self.assertEqual(summary["reused"], ["1.mp3"])
+            self.assertEqual(sorted(summary["synthesized"]), ["2.mp3", "3.mp3"])
+            self.assertEqual((voice_dir / "1.mp3").read_bytes(), b"recorded earlier")
+            self.assertIn("第二段".encode("utf-8"), (voice_dir / "2.mp3").read_bytes())
+            self.assertIn("沿用无清单记录的旧片段: 1.mp3", out.getvalue())
+
+    def test_force_resynthesizes_everything(self):
+        FakeCommunicate.reset(delay=0)
+        with tempfile.TemporaryDirectory() as tmp:
+            voice_dir, cache_dir = Path(tmp) / "voice", Path(tmp) / "cache"
+            cache_dir.mkdir()
+            self.sync({"1": "第一段"}, voice_dir, cache_dir)
+            FakeCommunicate.reset(delay=0)
+            summary = self.sync({"1": "第一段"}, voice_dir, cache_dir, force=True)
+            self.assertEqual(summary["synthesized"], ["1.mp3"])
+
+    def test_key_tracks_pronunciation_table(self):
+        key = voice_edgetts.clip_cache_key("降息", "zh-CN-YunxiNeural")
+        with patch.dict(voice_edgetts.PRONUNCIATION_FIXES, {"测试": "侧试"}):
+            self.assertNotEqual(voice_edgetts.clip_cache_key("降息", "zh-CN-YunxiNeural"), key)
+        self.assertNotEqual(voice_edgetts.clip_cache_key("降息", "zh-CN-XiaoxiaoNeural"), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
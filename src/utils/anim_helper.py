@@ -1,36 +1,43 @@
 import os
 import subprocess
 from pathlib import Path
-from mutagen.mp3 import MP3
+
+from src.utils import audio_manifest
+from src.utils.audio_duration import get_duration_index
+from src.utils.icon_index import get_icon_index
+from src.utils.image_cache import get_image_cache
 
 def get_audio_duration(filepath):
-    """获取音频文件时长（秒）"""
+    """
+    获取音频文件时长（秒）
+
+    结果来自进程级时长索引（按路径 + 大小 + mtime 缓存），
+    `LessonVertical.prepare_resources` 会提前批量预热，这里通常只是一次字典查询。
+
+    Raises:
+        RuntimeError: 文件存在但无法解析出时长（不再返回虚构的 5 秒，避免音画错位）
+    """
     if not os.path.exists(filepath):
         print(f"Error: Audio file not found: {filepath}")
         return 5.0 # Fallback for dev, but ideally should raise
-        
-    # Prefer ffprobe for accuracy if available
-    try:
-        cmd = [
-            "ffprobe", 
-            "-v", "error", 
-            "-show_entries", "format=duration", 
-            "-of", "default=noprint_wrappers=1:nokey=1", 
-            filepath
-        ]
-        output = subprocess.check_output(cmd, text=True).strip()
-        return float(output)
-    except Exception as e:
-        print(f"Warning: ffprobe failed for {filepath}, falling back to mutagen. Error: {e}")
-        try:
-            audio = MP3(filepath)
-            return audio.info.length
-        except:
-            return 5.0
 
-def combine_audio_clips(clip_paths, output_wav_path, silence_duration=0, bgm_file=None, bgm_volume=-20, bgm_loop=True):
+    return get_duration_index().get(filepath)
+
+MIX_BACKENDS = ("ffmpeg", "numpy")
+
+
+def get_mix_backend(backend=None):
+    """混音后端：显式指定的 backend，否则取 AUDIO_MIX_BACKEND 环境变量（ffmpeg / numpy），默认 ffmpeg"""
+    backend = (backend or os.getenv("AUDIO_MIX_BACKEND", "ffmpeg")).strip().lower()
+    if backend not in MIX_BACKENDS:
+        raise ValueError(f"未知的 AUDIO_MIX_BACKEND={backend}，可选: {' / '.join(MIX_BACKENDS)}")
+    return backend
+
+
+def combine_audio_clips(clip_paths, output_wav_path, silence_duration=0, bgm_file=None, bgm_volume=-20, bgm_loop=True,
+                        backend=None):
     """
-    使用 ffmpeg 将多个音频片段拼接成一个 wav 文件
+    将多个音频片段拼接成一个 wav 文件（可叠加背景音乐）
     
     Args:
         clip_paths: 音频文件路径列表
@@ -39,6 +46,8 @@ def combine_audio_clips(clip_paths, output_wav_path, silence_duration=0, bgm_fil
         bgm_file: 背景音乐文件路径
         bgm_volume: 背景音乐音量（dB，默认 -20）
         bgm_loop: 是否循环播放背景音乐
+        backend: "ffmpeg"（filter_complex 子进程）或 "numpy"（进程内流式混音，见 audio_mixer），
+            None 时取 AUDIO_MIX_BACKEND 环境变量
     """
     clips = [Path(p).resolve() for p in clip_paths]
     out_wav = Path(output_wav_path).resolve()
@@ -51,18 +60,35 @@ def combine_audio_clips(clip_paths, output_wav_path, silence_duration=0, bgm_fil
     if bgm_path and not bgm_path.exists():
         raise FileNotFoundError(f"缺少背景音乐文件：{bgm_path}")
 
-    # 检查缓存
-    newest_mtime = max(p.stat().st_mtime for p in clips)
-    if bgm_path:
-        newest_mtime = max(newest_mtime, bgm_path.stat().st_mtime)
+    backend = get_mix_backend(backend)
 
-    if out_wav.exists() and out_wav.stat().st_mtime >= newest_mtime:
+    # 检查缓存：输入内容摘要 + 混音参数（含混音后端）与上次一致时跳过（见 audio_manifest）
+    previous = audio_manifest.load_manifest(out_wav)
+    manifest = audio_manifest.build_manifest(
+        clips, bgm_path,
+        {
+            "backend": backend,
+            "silence_duration": silence_duration,
+            "bgm_volume": bgm_volume if bgm_path else None,
+            "bgm_loop": bool(bgm_loop) if bgm_path else None,
+        },
+        previous,
+    )
+    if audio_manifest.is_current(out_wav, manifest, previous):
         print(f"Using cached combined audio: {out_wav}")
         return str(out_wav)
 
-    print(f"Generating combined audio: {out_wav}")
+    print(f"Generating combined audio ({backend}): {out_wav}")
     out_wav.parent.mkdir(parents=True, exist_ok=True)
 
+    if backend == "numpy":
+        from src.utils.audio_mixer import mix_to_wav
+
+        mix_to_wav(clips, out_wav, silence_duration=silence_duration, bgm_file=bgm_path,
+                   bgm_volume=bgm_volume, bgm_loop=bgm_loop)
+        audio_manifest.save_manifest(out_wav, manifest)
+        return str(out_wav)
+
     # 构建 ffmpeg 滤镜
     n_clips = len(clips)
     in_filters = [f"[{i}:a]aformat=sample_fmts=fltp:sample_rates=48000:channel_layouts=mono[a{i}]" 
@@ -110,139 +136,41 @@ def combine_audio_clips(clip_paths, output_wav_path, silence_duration=0, bgm_fil
     ]
     
     subprocess.run(cmd, check=True)
+    audio_manifest.save_manifest(out_wav, manifest)
     return str(out_wav)
 
-def load_png_icon(icon_name, project_root=None, height=2):
+def load_png_icon(icon_name, project_root=None, height=2, max_scale=None):
     """
     从 assets/icons8 目录加载 PNG 图标
     
     支持精确匹配、别名匹配、模糊匹配和文件搜索。
     按优先级查找：精确匹配 > 别名匹配 > 模糊匹配 > 文件搜索 > 回退
+    名字到路径的解析由进程级 IconIndex 完成并缓存（见 src/utils/icon_index.py），
+    解码后的像素由 DecodedImageCache 缓存（见 src/utils/image_cache.py）。
     
     Args:
         icon_name: 图标名称（不含扩展名）
         project_root: 项目根目录，如果为 None 则自动推断
         height: 图标高度（Manim 单位，默认 2）
+        max_scale: 场景里对图标的最大放大倍数；给定时按它预缩放缓存的像素（默认保留原图分辨率）
         
     Returns:
         ImageMobject 或回退的图标对象
     """
-    from manim import ImageMobject, Text, GRAY
-    import json
-    from difflib import SequenceMatcher
+    from manim import Text, GRAY
     
     # 自动推断项目根目录
     if project_root is None:
         current_file = Path(__file__).resolve()
         project_root = current_file.parent.parent.parent
     
-    project_root = Path(project_root)
-    icons8_dir = project_root / "assets" / "icons8"
-    
-    icon_sources = [
-        ("doodle", "doodle_png_metadata.json"),
-        ("plasticine", "plasticine_png_metadata.json"),
-        ("stickers", "stickers_png_metadata.json"),
-        ("color", "color_png_metadata.json"),
-    ]
-    
-    def similarity(a, b):
-        return SequenceMatcher(None, a.lower(), b.lower()).ratio()
-    
-    def try_load_icon(icon_path, source_name=""):
-        if icon_path.exists():
-            try:
-                icon = ImageMobject(str(icon_path.resolve()))
-                icon.height = height
-                return icon
-            except Exception as e:
-                if source_name:
-                    print(f"⚠️ 加载 PNG 图标失败 {icon_name} (来自 {source_name}): {e}")
-        return None
-    
-    def get_icon_path(icon_dir, icon_info, filename):
-        """根据 icon_info 构建图标路径"""
-        subcategory = icon_info.get("subcategory", "")
-        return icon_dir / subcategory / f"{filename}.png"
-    
-    def load_metadata(metadata_path):
-        """加载 metadata 文件"""
-        if not metadata_path.exists():
-            return None
+    icon_path = get_icon_index(project_root).resolve(icon_name)
+    if icon_path:
         try:
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            # 解码结果按路径 + mtime 缓存，重复加载同一图标只新建 Mobject
+            return get_image_cache().image_mobject(icon_path, height=height, max_scale=max_scale)
         except Exception as e:
-            print(f"⚠️ 读取 metadata 失败 ({metadata_path.name}): {e}")
-            return None
-    
-    # 方法1: 精确匹配和别名匹配
-    for subdir, metadata_file in icon_sources:
-        metadata_path = icons8_dir / metadata_file
-        icon_dir = icons8_dir / subdir
-        metadata = load_metadata(metadata_path)
-        if not metadata:
-            continue
-        
-        file_map = metadata.get("file_map", {})
-        
-        # 精确匹配
-        if icon_name in file_map:
-            icon_path = get_icon_path(icon_dir, file_map[icon_name], icon_name)
-            icon = try_load_icon(icon_path, subdir)
-            if icon:
-                return icon
-        
-        # 别名匹配
-        for filename, icon_info in file_map.items():
-            if icon_name in icon_info.get("aliases", []):
-                icon_path = get_icon_path(icon_dir, icon_info, filename)
-                icon = try_load_icon(icon_path, f"{subdir} (别名: {filename})")
-                if icon:
-                    return icon
-    
-    # 方法2: 模糊匹配
-    best_score, best_path, best_source = 0.0, None, None
-    for subdir, metadata_file in icon_sources:
-        metadata_path = icons8_dir / metadata_file
-        icon_dir = icons8_dir / subdir
-        metadata = load_metadata(metadata_path)
-        if not metadata:
-            continue
-        
-        file_map = metadata.get("file_map", {})
-        for filename, icon_info in file_map.items():
-            score = max(similarity(icon_name, filename), 
-                       max([similarity(icon_name, alias) for alias in icon_info.get("aliases", [])], default=0))
-            if score > 0.6 and score > best_score:
-                best_score, best_path, best_source = score, get_icon_path(icon_dir, icon_info, filename), subdir
-    
-    if best_path:
-        icon = try_load_icon(best_path, f"{best_source} (模糊匹配, 相似度: {best_score:.2f})")
-        if icon:
-            return icon
-    
-    # 方法3: 递归文件搜索
-    for subdir, _ in icon_sources:
-        icon_dir = icons8_dir / subdir
-        if icon_dir.exists():
-            for png_file in icon_dir.rglob(f"{icon_name}.png"):
-                icon = try_load_icon(png_file, subdir)
-                if icon:
-                    return icon
-    
-    # 方法4: 关键词匹配
-    icon_name_lower = icon_name.lower()
-    for subdir, _ in icon_sources:
-        icon_dir = icons8_dir / subdir
-        if icon_dir.exists():
-            for png_file in icon_dir.rglob("*.png"):
-                filename_lower = png_file.stem.lower()
-                if icon_name_lower in filename_lower or filename_lower in icon_name_lower:
-                    if similarity(icon_name, png_file.stem) > 0.5:
-                        icon = try_load_icon(png_file, f"{subdir} (关键词匹配)")
-                        if icon:
-                            return icon
+            print(f"⚠️ 加载 PNG 图标失败 {icon_name} ({icon_path}): {e}")
     
     # 回退：使用 icon_helper
     try:
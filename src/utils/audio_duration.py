@@ -0,0 +1,445 @@
+"""
+音频时长索引模块
+
+按 (路径, 文件大小, mtime) 缓存音频时长，内存常驻，并在 lesson 的 voice/ 目录下
+写一个小的 sidecar 文件持久化。`LessonVertical.prepare_resources` 会批量预热索引，
+之后每个 build_scene_N 调用 `get_audio_duration` 时只做字典查询。
+
+时长优先用纯 Python 解析 MP3 帧头 / WAV 块头得到（Edge TTS 的 MP3、CosyVoice 的 WAV），
+不启动任何子进程；只有解析不了的格式才回退到 ffprobe / mutagen。
+"""
+import json
+import os
+import struct
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# voice/ 目录下的时长索引文件名
+DURATION_SIDECAR_NAME = ".durations.json"
+DURATION_SIDECAR_VERSION = 1
+
+# 回退到 ffprobe 时的并发数（子进程，I/O 密集）
+PROBE_WORKERS = 8
+
+
+# ============================================================================
+# MP3 帧头解析
+# ============================================================================
+
+# 比特率表（kbps），按 (MPEG1?, layer) 索引
+_MP3_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# 采样率表，按版本位 (0=MPEG2.5, 2=MPEG2, 3=MPEG1) 索引
+_MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+
+
+def _parse_mp3_frame_header(data, pos):
+    """
+    解析 pos 处的 MP3 帧头
+
+    Returns:
+        dict 或 None: {"frame_size", "samples", "sample_rate", "mpeg1", "mono"}
+    """
+    if pos + 4 > len(data):
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (b1 >> 3) & 0x03
+    layer = 4 - ((b1 >> 1) & 0x03)
+    bitrate_idx = (b2 >> 4) & 0x0F
+    sample_rate_idx = (b2 >> 2) & 0x03
+    if version_bits == 1 or layer == 4 or bitrate_idx in (0, 15) or sample_rate_idx == 3:
+        return None
+
+    mpeg1 = version_bits == 3
+    bitrate = _MP3_BITRATES[(mpeg1, layer)][bitrate_idx] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version_bits][sample_rate_idx]
+    padding = (b2 >> 1) & 0x01
+
+    if layer == 1:
+        samples = 384
+        frame_size = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        frame_size = samples // 8 * bitrate // sample_rate + padding
+
+    return {
+        "frame_size": frame_size,
+        "samples": samples,
+        "sample_rate": sample_rate,
+        "mpeg1": mpeg1,
+        "mono": ((b3 >> 6) & 0x03) == 3,
+    }
+
+
+def _skip_id3v2(data):
+    """返回 ID3v2 标签之后的偏移量"""
+    pos = 0
+    while data[pos:pos + 3] == b"ID3" and pos + 10 <= len(data):
+        flags = data[pos + 5]
+        size = 0
+        for byte in data[pos + 6:pos + 10]:
+            size = (size << 7) | (byte & 0x7F)
+        pos += 10 + size + (10 if flags & 0x10 else 0)
+    return pos
+
+
+def _find_first_frame(data, pos):
+    """从 pos 开始找到第一个后面紧跟合法帧的同步字"""
+    end = len(data) - 4
+    while pos <= end:
+        pos = data.find(b"\xff", pos)
+        if pos < 0 or pos > end:
+            return None, None
+        header = _parse_mp3_frame_header(data, pos)
+        if header:
+            next_pos = pos + header["frame_size"]
+            if next_pos + 4 > len(data) or _parse_mp3_frame_header(data, next_pos):
+                return pos, header
+        pos += 1
+    return None, None
+
+
+def read_mp3_duration(filepath):
+    """
+    根据 MP3 帧头计算精确时长（秒）
+
+    依次尝试 Xing/Info 头、VBRI 头给出的总帧数；都没有时逐帧遍历帧头累加采样数
+    （CBR 与无头 VBR 均适用）。
+
+    Returns:
+        float 或 None: 无法识别为 MP3 时返回 None
+    """
+    with open(filepath, "rb") as f:
+        data = f.read()
+
+    pos, header = _find_first_frame(data, _skip_id3v2(data))
+    if header is None:
+        return None
+    sample_rate = header["sample_rate"]
+    samples_per_frame = header["samples"]
+
+    # Xing / Info 头位于边信息之后
+    if header["mpeg1"]:
+        side_info = 17 if header["mono"] else 32
+    else:
+        side_info = 9 if header["mono"] else 17
+    xing_pos = pos + 4 + side_info
+    if data[xing_pos:xing_pos + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing_pos + 4:xing_pos + 8])[0]
+        if flags & 0x01:
+            frames = struct.unpack(">I", data[xing_pos + 8:xing_pos + 12])[0]
+            return frames * samples_per_frame / sample_rate
+
+    # VBRI 头固定位于帧头之后 32 字节
+    vbri_pos = pos + 4 + 32
+    if data[vbri_pos:vbri_pos + 4] == b"VBRI":
+        frames = struct.unpack(">I", data[vbri_pos + 14:vbri_pos + 18])[0]
+        return frames * samples_per_frame / sample_rate
+
+    # 逐帧遍历
+    total_samples = 0
+    end = len(data)
+    if end >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    while pos + 4 <= end:
+        header = _parse_mp3_frame_header(data, pos)
+        if header is None:
+            # 帧间夹杂垃圾字节时重新同步
+            pos, header = _find_first_frame(data[:end], pos + 1)
+            if header is None:
+                break
+        total_samples += header["samples"]
+        pos += header["frame_size"]
+    return total_samples / sample_rate if total_samples else None
+
+
+# ============================================================================
+# WAV 块解析
+# ============================================================================
+
+def read_wav_duration(filepath):
+    """
+    根据 WAV 的 `fmt ` / `data` 块计算精确时长（秒）
+
+    Returns:
+        float 或 None: 不是 RIFF/WAVE 文件时返回 None
+    """
+    file_size = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            return None
+
+        block_align = None
+        sample_rate = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                _, _, sample_rate, _, block_align = struct.unpack("<HHIIH", fmt[:14])
+                f.seek(chunk_size % 2, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if not sample_rate or not block_align:
+                    return None
+                # 流式写出的 WAV 可能把 data 大小留成 0 或 0xFFFFFFFF
+                remaining = file_size - f.tell()
+                if chunk_size in (0, 0xFFFFFFFF) or chunk_size > remaining:
+                    chunk_size = remaining
+                return chunk_size // block_align / sample_rate
+            else:
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+def read_native_duration(filepath):
+    """
+    不启动子进程读取音频时长：按扩展名选择解析器，识别失败时再试另一种
+
+    Returns:
+        float 或 None: 两种格式都无法识别时返回 None
+    """
+    readers = (read_wav_duration, read_mp3_duration)
+    if str(filepath).lower().endswith(".mp3"):
+        readers = readers[::-1]
+    for reader in readers:
+        try:
+            duration = reader(filepath)
+        except (OSError, struct.error, ValueError, ZeroDivisionError):
+            duration = None
+        if duration:
+            return duration
+    return None
+
+
+def probe_audio_duration_ffprobe(filepath):
+    """通过 ffprobe 子进程读取时长（秒）"""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        str(filepath)
+    ]
+    output = subprocess.check_output(cmd, text=True).strip()
+    return float(output)
+
+
+def probe_audio_duration(filepath):
+    """
+    探测音频文件时长（秒），不经过缓存
+
+    优先使用纯 Python 帧头解析，无法识别时回退到 ffprobe，再回退到 mutagen。
+
+    Raises:
+        RuntimeError: 所有探测方式都失败
+    """
+    duration = read_native_duration(filepath)
+    if duration:
+        return duration
+    try:
+        return probe_audio_duration_ffprobe(filepath)
+    except Exception as e:
+        print(f"Warning: ffprobe failed for {filepath}, falling back to mutagen. Error: {e}")
+    try:
+        from mutagen.mp3 import MP3
+        return MP3(filepath).info.length
+    except Exception as e:
+        raise RuntimeError(f"无法读取音频时长：{filepath} ({e})") from e
+
+
+def _file_signature(filepath):
+    st = os.stat(filepath)
+    return st.st_size, st.st_mtime_ns
+
+
+def read_sidecar_entries(directory):
+    """
+    读取目录下 sidecar 的原始条目
+
+    Returns:
+        dict: {文件名: {"size", "mtime_ns", "duration"}}；没有或格式不对时为空
+    """
+    sidecar_path = os.path.join(directory, DURATION_SIDECAR_NAME)
+    if not os.path.exists(sidecar_path):
+        return {}
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 读取时长索引失败 ({sidecar_path}): {e}")
+        return {}
+    if data.get("version") != DURATION_SIDECAR_VERSION:
+        return {}
+    return data.get("entries", {})
+
+
+def matches_sidecar(filepath, entries):
+    """文件的大小 / mtime 与 sidecar 条目一致，即自上次预热（上次渲染）以来没有被改动过"""
+    entry = entries.get(os.path.basename(filepath))
+    if not entry or not os.path.exists(filepath):
+        return False
+    return (entry.get("size"), entry.get("mtime_ns")) == _file_signature(filepath)
+
+
+class DurationIndex:
+    """
+    进程内音频时长索引
+
+    条目以绝对路径为键，值为 (size, mtime_ns, duration)。文件大小或 mtime 变化时
+    条目自动失效并重新探测。
+    """
+
+    def __init__(self, probe=probe_audio_duration, native_reader=read_native_duration):
+        self._probe = probe
+        self._native_reader = native_reader
+        self._entries = {}
+        self._loaded_dirs = set()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, path, signature):
+        entry = self._entries.get(path)
+        if entry and (entry[0], entry[1]) == signature:
+            return entry[2]
+        return None
+
+    def get(self, filepath):
+        """
+        返回音频时长（秒）；未命中时探测并写入索引
+
+        Raises:
+            FileNotFoundError: 文件不存在
+        """
+        path = os.path.abspath(filepath)
+        self._ensure_sidecar_loaded(os.path.dirname(path))
+        signature = _file_signature(path)
+        duration = self._lookup(path, signature)
+        if duration is not None:
+            self.hits += 1
+            return duration
+
+        self.misses += 1
+        duration = self._probe(path)
+        self._entries[path] = (signature[0], signature[1], duration)
+        return duration
+
+    def prime(self, filepaths, sidecar_dir=None):
+        """
+        批量预热索引：一次性并发探测所有未命中的文件，并写回 sidecar
+
+        Args:
+            filepaths: 音频文件路径列表（不存在的文件会被跳过）
+            sidecar_dir: sidecar 所在目录，None 则不持久化
+
+        Returns:
+            dict: {绝对路径: 时长}
+        """
+        if sidecar_dir:
+            self._ensure_sidecar_loaded(os.path.abspath(sidecar_dir))
+
+        pending = {}
+        durations = {}
+        for filepath in filepaths:
+            path = os.path.abspath(filepath)
+            if not os.path.exists(path):
+                continue
+            self._ensure_sidecar_loaded(os.path.dirname(path))
+            signature = _file_signature(path)
+            duration = self._lookup(path, signature)
+            if duration is None:
+                pending[path] = signature
+            else:
+                durations[path] = duration
+
+        # 先用纯 Python 解析器处理，剩下的才交给子进程探测
+        for path in list(pending) if self._native_reader else ():
+            duration = self._native_reader(path)
+            if duration:
+                size, mtime_ns = pending.pop(path)
+                self._entries[path] = (size, mtime_ns, duration)
+                durations[path] = duration
+                self.misses += 1
+
+        if pending:
+            workers = min(PROBE_WORKERS, len(pending))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                probed = dict(zip(pending, executor.map(self._safe_probe, pending)))
+            for path, duration in probed.items():
+                if duration is None:
+                    continue
+                size, mtime_ns = pending[path]
+                self._entries[path] = (size, mtime_ns, duration)
+                durations[path] = duration
+            self.misses += len(pending)
+
+        if sidecar_dir:
+            self.save_sidecar(sidecar_dir)
+        return durations
+
+    def _safe_probe(self, path):
+        try:
+            return self._probe(path)
+        except RuntimeError as e:
+            print(f"⚠️ {e}")
+            return None
+
+    def _ensure_sidecar_loaded(self, directory):
+        if directory in self._loaded_dirs:
+            return
+        self._loaded_dirs.add(directory)
+        self.load_sidecar(directory)
+
+    def load_sidecar(self, directory):
+        """从目录下的 sidecar 读取条目（条目仍需通过 size/mtime 校验才会被使用）"""
+        for name, entry in read_sidecar_entries(directory).items():
+            path = os.path.join(directory, name)
+            self._entries.setdefault(path, (entry["size"], entry["mtime_ns"], entry["duration"]))
+
+    def save_sidecar(self, directory):
+        """把目录下文件的条目写回 sidecar（原子替换）"""
+        directory = os.path.abspath(directory)
+        if not os.path.isdir(directory):
+            return
+        entries = {}
+        for path, (size, mtime_ns, duration) in self._entries.items():
+            if os.path.dirname(path) == directory and os.path.exists(path):
+                entries[os.path.basename(path)] = {"size": size, "mtime_ns": mtime_ns, "duration": duration}
+
+        sidecar_path = os.path.join(directory, DURATION_SIDECAR_NAME)
+        tmp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": DURATION_SIDECAR_VERSION, "entries": entries}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, sidecar_path)
+        except OSError as e:
+            print(f"⚠️ 写入时长索引失败 ({sidecar_path}): {e}")
+
+
+# 进程级共享索引
+_duration_index = DurationIndex()
+
+
+def get_duration_index():
+    """返回进程级共享的时长索引"""
+    return _duration_index
+
+
+def prime_audio_durations(filepaths, sidecar_dir=None):
+    """批量预热进程级时长索引，见 `DurationIndex.prime`"""
+    return _duration_index.prime(filepaths, sidecar_dir=sidecar_dir)
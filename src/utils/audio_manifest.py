@@ -0,0 +1,119 @@
+"""
+整课混音（full_audio.wav）的内容哈希清单
+
+原先 combine_audio_clips 只比较 mtime：输出比所有输入新就认为有效。
+这样 silence_duration / bgm_volume / bgm_loop 改了、片段顺序变了、或者某个片段被
+TTS 缓存里一个时间戳更旧的文件替换（硬链接保留原 mtime），都不会重新混音。
+
+这里在输出旁边写一个 sidecar（voice/.full_audio.wav.json），记录：
+- 混音键：按顺序的片段 sha256、BGM sha256 以及全部混音参数（含混音后端）
+- 每个输入文件的 (size, mtime_ns, sha256)：size 和 mtime 都没变时直接沿用记录的摘要，不重新读文件
+- 输出文件的 (size, mtime_ns)：输出被外部改动或删除时也会重新混音
+
+混音键相同且输出未被改动时跳过混音；任一相关输入变化时一定重新混音。
+"""
+import hashlib
+import json
+import os
+import threading
+
+MANIFEST_VERSION = 1
+
+_digest_memo = {}   # 绝对路径 -> (size, mtime_ns, sha256)，进程内复用
+_digest_lock = threading.Lock()
+
+
+def manifest_path(output_path):
+    """voice/full_audio.wav → voice/.full_audio.wav.json"""
+    output_path = os.path.abspath(str(output_path))
+    return os.path.join(os.path.dirname(output_path), f".{os.path.basename(output_path)}.json")
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_entry(path, recorded=None):
+    """
+    返回 {"size", "mtime_ns", "sha256"}
+
+    size 与 mtime 都与 recorded（清单里的旧记录）或进程内缓存一致时沿用其摘要，否则重新计算。
+    """
+    path = os.path.abspath(str(path))
+    st = os.stat(path)
+    signature = (st.st_size, st.st_mtime_ns)
+    if recorded and (recorded.get("size"), recorded.get("mtime_ns")) == signature and recorded.get("sha256"):
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": recorded["sha256"]}
+    with _digest_lock:
+        memo = _digest_memo.get(path)
+    if memo and memo[:2] == signature:
+        digest = memo[2]
+    else:
+        digest = sha256_file(path)
+        with _digest_lock:
+            _digest_memo[path] = (st.st_size, st.st_mtime_ns, digest)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+
+
+def load_manifest(output_path):
+    path = manifest_path(output_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != MANIFEST_VERSION:
+        return None
+    return data
+
+
+def build_manifest(clip_paths, bgm_path, params, previous=None):
+    """
+    计算本次混音的清单（不含输出信息）
+
+    Args:
+        clip_paths: 按顺序的人声片段
+        bgm_path: BGM 路径，None 表示不加 BGM
+        params: 影响输出的混音参数（backend / silence_duration / bgm_volume / bgm_loop）
+        previous: 上次写入的清单，用于复用未变化文件的摘要
+    """
+    recorded = (previous or {}).get("files", {})
+    files = {}
+    for path in [*clip_paths, *([bgm_path] if bgm_path else [])]:
+        path = os.path.abspath(str(path))
+        files[path] = file_entry(path, recorded.get(path))
+    key = {
+        "clips": [files[os.path.abspath(str(p))]["sha256"] for p in clip_paths],
+        "bgm": files[os.path.abspath(str(bgm_path))]["sha256"] if bgm_path else None,
+        "params": params,
+    }
+    return {"version": MANIFEST_VERSION, "key": key, "files": files}
+
+
+def is_current(output_path, manifest, previous):
+    """输出存在、未被外部改动，且混音键与上次一致"""
+    if not previous or not os.path.exists(output_path):
+        return False
+    st = os.stat(output_path)
+    output = previous.get("output") or {}
+    if (output.get("size"), output.get("mtime_ns")) != (st.st_size, st.st_mtime_ns):
+        return False
+    # 经 JSON 往返后再比较，避免元组/浮点表示差异
+    return json.loads(json.dumps(manifest["key"])) == previous.get("key")
+
+
+def save_manifest(output_path, manifest):
+    """记录输出文件的 size/mtime 后原子写入清单"""
+    st = os.stat(output_path)
+    data = dict(manifest, output={"size": st.st_size, "mtime_ns": st.st_mtime_ns})
+    path = manifest_path(output_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,190 @@
+"""
+进程内音频混音（NumPy + soxr），combine_audio_clips 的可选后端
+
+ffmpeg 后端为每个人声片段加一个 -i，filter_complex 随场景数增长，每课都要起一个 ffmpeg 进程。
+这里在进程内完成同样的处理：
+
+- 逐个解码人声片段（PyAV），按块用 soxr 流式重采样到 48k 单声道
+- 片段之间插入静音
+- 单声道 → 立体声（与 ffmpeg aformat 的上混系数一致，-3 dB）
+- 叠加按 dB 调整音量、循环平铺的 BGM（等价于 amix normalize=0：直接相加，时长以人声为准）
+- 按块写 16-bit PCM WAV
+
+除 BGM（一首循环曲，长度与课程无关）外，内存只与块大小有关，与课程时长无关。
+通过 AUDIO_MIX_BACKEND=numpy 启用，见 anim_helper.combine_audio_clips。
+"""
+import math
+import os
+import wave
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+# 每次写盘的帧数（1 秒），解码出的块大于它时会被切开
+BLOCK_FRAMES = SAMPLE_RATE
+# ffmpeg/swresample 把单声道上混到立体声时，两个声道各乘 1/sqrt(2)
+UPMIX_GAIN = math.sqrt(0.5)
+
+
+def db_to_gain(db):
+    return 10 ** (db / 20)
+
+
+def iter_decoded(path):
+    """
+    逐帧解码音频文件
+
+    Yields:
+        tuple: (float32 数组，形状 (声道数, 帧数), 采样率)
+    """
+    import av
+
+    with av.open(str(path)) as container:
+        stream = container.streams.audio[0]
+        # 只统一成 planar float，不改声道和采样率（重采样交给 soxr）
+        resampler = av.AudioResampler(format="fltp")
+        for frame in container.decode(stream):
+            for out in resampler.resample(frame):
+                yield out.to_ndarray(), out.sample_rate
+        for out in resampler.resample(None):
+            yield out.to_ndarray(), out.sample_rate
+
+
+def to_mono(samples):
+    """多声道取平均（与 swresample 归一化后的立体声下混一致）"""
+    if samples.shape[0] == 1:
+        return samples[0]
+    return samples.mean(axis=0)
+
+
+def iter_clip_blocks(path, rate=SAMPLE_RATE):
+    """把一个片段解码、下混为单声道并流式重采样到 rate，逐块产出 float32 一维数组"""
+    import numpy as np
+    import soxr
+
+    stream = None
+    for samples, in_rate in iter_decoded(path):
+        mono = to_mono(samples).astype(np.float32, copy=False)
+        if in_rate == rate:
+            yield mono
+            continue
+        if stream is None:
+            stream = soxr.ResampleStream(in_rate, rate, 1, dtype="float32")
+        block = stream.resample_chunk(mono)
+        if len(block):
+            yield block
+    if stream is not None:
+        tail = stream.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+        if len(tail):
+            yield tail
+
+
+def iter_silence(seconds, rate=SAMPLE_RATE):
+    import numpy as np
+
+    remaining = int(round(seconds * rate))
+    while remaining > 0:
+        n = min(remaining, BLOCK_FRAMES)
+        yield np.zeros(n, dtype=np.float32)
+        remaining -= n
+
+
+def iter_voice_blocks(clip_paths, silence_duration=0, rate=SAMPLE_RATE):
+    """人声轨：各片段依次产出，片段之间插入 silence_duration 秒静音"""
+    for i, path in enumerate(clip_paths):
+        if i and silence_duration > 0:
+            yield from iter_silence(silence_duration, rate)
+        for block in iter_clip_blocks(path, rate):
+            # 过大的块切开，保证每次处理的内存上限
+            for start in range(0, len(block), BLOCK_FRAMES):
+                yield block[start:start + BLOCK_FRAMES]
+
+
+def load_bgm(path, gain, rate=SAMPLE_RATE):
+    """
+    整首解码 BGM，转为 rate 采样率的立体声并乘以增益
+
+    Returns:
+        float32 数组，形状 (帧数, 2)
+    """
+    import numpy as np
+    import soxr
+
+    chunks = []
+    in_rate = rate
+    for samples, in_rate in iter_decoded(path):
+        chunks.append(samples)
+    if not chunks:
+        return np.zeros((0, CHANNELS), dtype=np.float32)
+    samples = np.concatenate(chunks, axis=1)
+    if samples.shape[0] == 1:
+        stereo = np.repeat(samples * UPMIX_GAIN, CHANNELS, axis=0)
+    else:
+        stereo = samples[:CHANNELS]
+    stereo = np.ascontiguousarray(stereo.T, dtype=np.float32)
+    if in_rate != rate:
+        stereo = soxr.resample(stereo, in_rate, rate)
+    return (stereo * gain).astype(np.float32, copy=False)
+
+
+class BgmTiler:
+    """按播放位置取 BGM 片段；loop 时首尾相接平铺，否则播完后补零"""
+
+    def __init__(self, samples, loop=True):
+        self.samples = samples
+        self.loop = loop
+        self.pos = 0
+
+    def take(self, n):
+        import numpy as np
+
+        total = len(self.samples)
+        if total == 0:
+            out = np.zeros((n, CHANNELS), dtype=np.float32)
+        elif self.loop:
+            out = self.samples[(self.pos + np.arange(n)) % total]
+        else:
+            out = np.zeros((n, CHANNELS), dtype=np.float32)
+            available = max(0, min(n, total - self.pos))
+            out[:available] = self.samples[self.pos:self.pos + available]
+        self.pos += n
+        return out
+
+
+def to_pcm16(block):
+    """float → int16，与 ffmpeg 的 flt→s16 转换一致（乘 32768 取整后饱和）"""
+    import numpy as np
+
+    return np.clip(np.rint(block * 32768), -32768, 32767).astype("<i2")
+
+
+def mix_to_wav(clip_paths, output_path, silence_duration=0, bgm_file=None, bgm_volume=-20, bgm_loop=True):
+    """
+    把人声片段拼接并叠加 BGM，写成 48k 立体声 16-bit WAV（参数含义同 combine_audio_clips）
+
+    先写到临时文件再原子替换，中途失败不会留下半截的 full_audio.wav。
+
+    Returns:
+        dict: {"output": 输出路径, "frames": 写入的帧数}
+    """
+    import numpy as np
+
+    bgm = BgmTiler(load_bgm(bgm_file, db_to_gain(bgm_volume)), loop=bgm_loop) if bgm_file else None
+    output_path = str(output_path)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    frames = 0
+    try:
+        with wave.open(tmp_path, "wb") as out:
+            out.setnchannels(CHANNELS)
+            out.setsampwidth(2)
+            out.setframerate(SAMPLE_RATE)
+            for block in iter_voice_blocks(clip_paths, silence_duration):
+                stereo = np.repeat((block * UPMIX_GAIN)[:, None], CHANNELS, axis=1)
+                if bgm is not None:
+                    stereo += bgm.take(len(block))
+                out.writeframes(to_pcm16(stereo).tobytes())
+                frames += len(block)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {"output": output_path, "frames": frames}
@@ -0,0 +1,21 @@
+"""
+本地缓存目录约定
+
+跨 lesson、跨系列共享的缓存统一放在项目根目录的 `.cache/` 下（已加入 .gitignore），
+可用环境变量 YYY_CACHE_DIR 改到其他磁盘。
+"""
+import os
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+
+
+def get_cache_root():
+    """返回缓存根目录"""
+    return os.path.abspath(os.getenv("YYY_CACHE_DIR") or os.path.join(PROJECT_ROOT, ".cache"))
+
+
+def get_cache_dir(*parts):
+    """返回（并创建）缓存根目录下的子目录"""
+    path = os.path.join(get_cache_root(), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
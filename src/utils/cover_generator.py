@@ -1,24 +1,42 @@
 import os
+import sys
+import json
 import base64
+from functools import lru_cache
 from jinja2 import Environment, FileSystemLoader
-from playwright.sync_api import sync_playwright
 
-def generate_cover(
-    output_path: str,
-    template_dir:str,
+# 将项目根目录加入 path（支持直接以脚本方式运行）
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from src.utils.cover_renderer import get_cover_assets, get_cover_renderer
+
+
+@lru_cache(maxsize=None)
+def _get_template(template_dir: str):
+    env = Environment(loader=FileSystemLoader(template_dir))
+    return env.get_template("cover_template.html")
+
+
+def build_cover_html(
+    template_dir: str,
     title_main: str,
     title_sub: str,
     main_image_path: str,
     bg_image_path: str = None,
     header_text: str = "孙子兵法 · 谋攻篇",
     toc_items: list = None,
-    decoration_icons: list = None
+    decoration_icons: list = None,
+    inline_images: bool = False
 ):
     """
-    Generate a video cover image using HTML/CSS and Playwright.
+    Render the cover HTML (Jinja2 template).
+
+    Images are referenced by cover_renderer asset URLs and served from its
+    in-process cache; pass inline_images=True to embed them as base64 data URIs
+    (self-contained HTML, much larger).
     
     Args:
-        output_path: Path to save the generated image.
+        template_dir: Directory containing cover_template.html.
         title_main: Main title.
         title_sub: Subtitle.
         main_image_path: Absolute path to the main subject image (foreground).
@@ -27,6 +45,7 @@ def generate_cover(
         toc_items: List of strings for Table of Contents.
         decoration_icons: List of icon names (emoji strings or icon file paths) for decoration. 
                          Defaults to ["🔍", "💡", "📚"] if None.
+        inline_images: Embed images as base64 instead of asset URLs.
     """
     # 0. Default bg to main if not provided
     if bg_image_path is None:
@@ -36,14 +55,7 @@ def generate_cover(
     if decoration_icons is None:
         decoration_icons = ["🔍", "💡", "📚"]
 
-    # 1. Setup paths
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.abspath(os.path.join(base_dir, "../.."))
-    
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
-    
-    # 2. Convert images to Base64
+    # 1. Resolve image sources (same path -> same URL, loaded once by the browser)
     def get_b64_src(path):
         with open(path, "rb") as img_file:
             b64_data = base64.b64encode(img_file.read()).decode("utf-8")
@@ -51,12 +63,12 @@ def generate_cover(
             mime_type = "image/png" if ext == ".png" else "image/jpeg"
             return f"data:{mime_type};base64,{b64_data}"
 
-    main_img_src = get_b64_src(main_image_path)
-    bg_img_src = get_b64_src(bg_image_path)
+    get_src = get_b64_src if inline_images else get_cover_assets().url_for
+    main_img_src = get_src(main_image_path)
+    bg_img_src = main_img_src if bg_image_path == main_image_path else get_src(bg_image_path)
 
-    # 3. Render HTML with Jinja2
-    env = Environment(loader=FileSystemLoader(template_dir))
-    template = env.get_template("cover_template.html")
+    # 2. Render HTML with Jinja2
+    template = _get_template(os.path.abspath(template_dir))
     
     # Auto-scale font size based on title length
     # 减小字体大小，防止超出屏幕宽度（考虑到85%宽度限制）
@@ -75,14 +87,14 @@ def generate_cover(
     else:
         font_size = 70
 
-    # Convert decoration icons to base64 if they are file paths
+    # Resolve decoration icons that are file paths
     decoration_icons_data = []
     for icon in decoration_icons:
         if isinstance(icon, str) and os.path.exists(icon):
-            # It's a file path, convert to base64
+            # It's a file path
             decoration_icons_data.append({
                 "type": "image",
-                "src": get_b64_src(icon)
+                "src": get_src(icon)
             })
         else:
             # It's an emoji or text
@@ -91,7 +103,7 @@ def generate_cover(
                 "content": icon
             })
 
-    html_content = template.render(
+    return template.render(
         title_main=title_main,
         title_sub=title_sub,
         main_image_path=main_img_src,
@@ -101,44 +113,98 @@ def generate_cover(
         toc_items=toc_items,
         decoration_icons=decoration_icons_data
     )
-    
-    # 4. Use Playwright to screenshot
-    with sync_playwright() as p:
-        # Launch browser (chromium is fine)
-        browser = p.chromium.launch()
-        page = browser.new_page(viewport={"width": 1080, "height": 1920})
-        
-        # Load the HTML content directly
-        page.set_content(html_content)
-        
-        # Ensure image is loaded before screenshot
-        # Since we use Base64, it should be instant, but waiting for naturalHeight check is safe.
+
+
+def generate_cover(output_path: str, template_dir: str, title_main: str, title_sub: str,
+                   main_image_path: str, **kwargs):
+    """
+    Generate a video cover image using HTML/CSS and Playwright.
+
+    The browser is shared by the whole process (see cover_renderer), so only the
+    first cover pays for the Chromium launch. Extra kwargs go to build_cover_html.
+
+    Args:
+        output_path: Path to save the generated image.
+        template_dir, title_main, title_sub, main_image_path: See build_cover_html.
+    """
+    html_content = build_cover_html(template_dir, title_main, title_sub, main_image_path, **kwargs)
+    get_cover_renderer().render(html_content, output_path)
+    print(f"Cover generated at: {output_path}")
+
+
+def generate_covers(specs: list):
+    """
+    Batch version of generate_cover: screenshot many covers in parallel tabs of one browser.
+
+    Args:
+        specs: List of dicts, each holding the keyword arguments of generate_cover.
+
+    Returns:
+        list: [(output_path, error or None), ...] in the same order as specs.
+    """
+    jobs = []
+    results = [None] * len(specs)
+    job_index = []
+    for i, spec in enumerate(specs):
+        spec = dict(spec)
+        output_path = spec.pop("output_path")
         try:
-            page.wait_for_function("""
-                () => {
-                    const imgs = Array.from(document.querySelectorAll('img'));
-                    return imgs.every(img => img.complete && img.naturalHeight > 0);
-                }
-            """, timeout=5000) # 5s timeout should be enough for base64
+            jobs.append((build_cover_html(**spec), output_path))
+            job_index.append(i)
         except Exception as e:
-            print(f"Warning: Image load wait timed out or failed: {e}")
-        
-        # Select the canvas element to screenshot exactly that area
-        element = page.locator(".canvas")
-        
-        # Take screenshot
-        element.screenshot(path=output_path, type="png")
-        
-        browser.close()
-        
-    print(f"Cover generated at: {output_path}")
+            results[i] = (output_path, e)
+
+    for i, result in zip(job_index, get_cover_renderer().render_many(jobs)):
+        results[i] = result
+
+    for output_path, error in results:
+        if error is None:
+            print(f"Cover generated at: {output_path}")
+        else:
+            print(f"❌ Cover failed: {output_path}: {error}")
+    return results
+
+
+def save_cover_spec(path: str, spec: dict):
+    """把一课的封面参数写成 JSON（原子替换），供 render-all 收集后一次性批量生成
+
+    批量生成在项目根目录运行，文件路径统一转成绝对路径。
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    spec = dict(
+        spec,
+        output_path=os.path.abspath(spec["output_path"]),
+        template_dir=os.path.abspath(spec["template_dir"]),
+        decoration_icons=[
+            os.path.abspath(icon) if isinstance(icon, str) and os.path.exists(icon) else icon
+            for icon in spec.get("decoration_icons") or []
+        ],
+    )
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(spec, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # 批量模式：python src/utils/cover_generator.py specs.json [results.json]
+        # specs.json 为 generate_cover 关键字参数组成的列表；
+        # results.json 按同样顺序写出 [{"output_path", "error"}, ...]（成功时 error 为 null）
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            results = generate_covers(json.load(f))
+        if len(sys.argv) > 2:
+            with open(sys.argv[2], "w", encoding="utf-8") as f:
+                json.dump([{"output_path": path, "error": str(error) if error else None} for path, error in results],
+                          f, ensure_ascii=False, indent=2)
+        sys.exit(1 if any(error for _, error in results) else 0)
+
     # Test run
     base_dir = os.path.dirname(os.path.abspath(__file__))
     test_img = os.path.abspath(os.path.join(base_dir, "../../series/cover/sunzibingfa/1.jpg"))
     generate_cover(
         output_path="test_cover.png",
+        template_dir=os.path.dirname(test_img),
         title_main="是不打架？",
         title_sub="最好的胜利",
         main_image_path=test_img,
@@ -0,0 +1,275 @@
+"""
+常驻的封面截图服务
+
+原先每张封面都要 sync_playwright() → 启动 Chromium → 截图 → 关闭，浏览器启动占了大头。
+CoverRenderer 在后台线程里跑一个事件循环，整个进程只启动一次 Chromium，
+并维护一个固定大小的标签页池；批量接口把多张封面分发到不同标签页并行截图。
+
+用法：
+    with CoverRenderer(pages=4) as renderer:
+        renderer.render_many([(html1, "a.png"), (html2, "b.png")])
+
+封面里的图片不再 base64 内联：HTML 中写 ASSET_ORIGIN 下的地址，由标签页上的路由
+处理器从 CoverAssets（按路径 + mtime 缓存的进程内图片字节）直接返回。
+同一路径总是同一个 URL，主图与背景图相同时 Chromium 只加载、解码一次。
+
+进程内共享实例见 get_cover_renderer()，退出时自动关闭浏览器。
+"""
+import asyncio
+import atexit
+import hashlib
+import mimetypes
+import os
+import threading
+
+DEFAULT_COVER_PAGES = 4
+COVER_VIEWPORT = {"width": 1080, "height": 1920}
+IMAGE_WAIT_TIMEOUT_MS = 5000
+# 封面图片的虚拟地址前缀，只由标签页路由处理，不会真正发出网络请求
+ASSET_ORIGIN = "http://cover-assets.local"
+
+# 等待页面内所有 <img> 解码完成
+_WAIT_IMAGES_JS = """
+() => {
+    const imgs = Array.from(document.querySelectorAll('img'));
+    return imgs.every(img => img.complete && img.naturalHeight > 0);
+}
+"""
+
+
+def _default_playwright_factory():
+    from playwright.async_api import async_playwright
+    return async_playwright()
+
+
+class CoverAssets:
+    """
+    封面图片登记表 + 字节缓存
+
+    url_for() 把本地路径登记成 ASSET_ORIGIN 下的稳定 URL；load() 供路由处理器读取，
+    文件 mtime/大小不变时直接返回内存中的字节。
+    """
+
+    def __init__(self):
+        self._paths = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def url_for(self, path):
+        path = os.path.abspath(path)
+        ext = os.path.splitext(path)[1].lower()
+        key = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16] + ext
+        with self._lock:
+            self._paths[key] = path
+        return f"{ASSET_ORIGIN}/{key}"
+
+    def load(self, key):
+        """
+        Returns:
+            tuple: (bytes, mime_type)；未登记或文件不存在时返回 None
+        """
+        with self._lock:
+            path = self._paths.get(key)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached and cached[0] == stamp:
+                self.hits += 1
+                return cached[1], cached[2]
+        with open(path, "rb") as f:
+            data = f.read()
+        mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        with self._lock:
+            self._cache[path] = (stamp, data, mime_type)
+            self.loads += 1
+        return data, mime_type
+
+
+_shared_assets = CoverAssets()
+
+
+def get_cover_assets():
+    """进程内共享的 CoverAssets"""
+    return _shared_assets
+
+
+class CoverRenderer:
+    """
+    复用同一个 Chromium 的封面截图器
+
+    Args:
+        pages: 标签页池大小（即批量截图的并行度）
+        viewport: 页面视口
+        playwright_factory: 返回 async_playwright() 对象的工厂，测试时可替换
+        assets: 图片来源，默认使用进程内共享的 CoverAssets
+    """
+
+    def __init__(self, pages=DEFAULT_COVER_PAGES, viewport=None, playwright_factory=None, assets=None):
+        self.pages = max(1, int(pages))
+        self.viewport = dict(viewport or COVER_VIEWPORT)
+        self.assets = assets or get_cover_assets()
+        self._playwright_factory = playwright_factory or _default_playwright_factory
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._browser = None
+        self._page_pool = None
+        self._page_slots = None
+        self._lock = threading.Lock()
+        self.launches = 0
+        self.rendered = 0
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """启动后台事件循环（浏览器在第一次截图时才启动）"""
+        with self._lock:
+            if self._loop is not None:
+                return self
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="cover-renderer", daemon=True)
+            thread.start()
+            self._loop, self._thread = loop, thread
+        return self
+
+    def close(self):
+        """关闭浏览器并停止后台线程"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---------- 对外接口 ----------
+
+    def render(self, html, output_path, selector=".canvas"):
+        """把一段 HTML 截图为 PNG，返回 output_path；失败时抛出原始异常"""
+        output_path, error = self.render_many([(html, output_path)], selector=selector)[0]
+        if error is not None:
+            raise error
+        return output_path
+
+    def render_many(self, jobs, selector=".canvas"):
+        """
+        批量截图，各任务分配到标签页池中并行执行
+
+        Args:
+            jobs: [(html, output_path), ...]
+        Returns:
+            list: 与 jobs 同序的 [(output_path, error 或 None), ...]，单个失败不影响其他任务
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return []
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self._render_all(jobs, selector), self._loop)
+        return future.result()
+
+    # ---------- 事件循环内部 ----------
+
+    async def _ensure_browser(self):
+        if self._browser is not None and self._browser.is_connected():
+            return
+        if self._playwright is None:
+            self._playwright = await self._playwright_factory().start()
+        self._browser = await self._playwright.chromium.launch()
+        self.launches += 1
+        # 空闲标签页列表 + 信号量：信号量限制同时在用的标签页数，空闲页不够时按需新建
+        self._page_pool = []
+        self._page_slots = asyncio.Semaphore(self.pages)
+
+    async def _acquire_page(self):
+        await self._page_slots.acquire()
+        if self._page_pool:
+            return self._page_pool.pop()
+        try:
+            page = await self._browser.new_page(viewport=self.viewport)
+            await page.route(f"{ASSET_ORIGIN}/**", self._serve_asset)
+            return page
+        except Exception:
+            self._page_slots.release()
+            raise
+
+    async def _serve_asset(self, route):
+        key = route.request.url.rsplit("/", 1)[-1]
+        loaded = self.assets.load(key)
+        if loaded is None:
+            await route.fulfill(status=404, body=b"")
+            return
+        data, mime_type = loaded
+        await route.fulfill(status=200, body=data, content_type=mime_type)
+
+    async def _render_one(self, html, output_path, selector):
+        page = None
+        try:
+            # 新建标签页失败也只算本任务失败，不影响同批其他任务
+            page = await self._acquire_page()
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            await page.set_content(html)
+            try:
+                await page.wait_for_function(_WAIT_IMAGES_JS, timeout=IMAGE_WAIT_TIMEOUT_MS)
+            except Exception as e:
+                print(f"Warning: Image load wait timed out or failed: {e}")
+            await page.locator(selector).screenshot(path=output_path, type="png")
+        except Exception as e:
+            if page is not None:
+                # 出错的标签页直接丢弃，归还名额后由等待中的任务按需新建
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+                self._page_slots.release()
+            return output_path, e
+        self.rendered += 1
+        self._page_pool.append(page)
+        self._page_slots.release()
+        return output_path, None
+
+    async def _render_all(self, jobs, selector):
+        await self._ensure_browser()
+        return await asyncio.gather(*(self._render_one(html, path, selector) for html, path in jobs))
+
+    async def _shutdown(self):
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._browser = self._playwright = self._page_pool = self._page_slots = None
+
+
+_shared_renderer = None
+_shared_lock = threading.Lock()
+
+
+def get_cover_renderer():
+    """进程内共享的 CoverRenderer（并行度取 COVER_PAGES 环境变量，默认 4）"""
+    global _shared_renderer
+    with _shared_lock:
+        if _shared_renderer is None:
+            pages = int(os.environ.get("COVER_PAGES", DEFAULT_COVER_PAGES))
+            _shared_renderer = CoverRenderer(pages=pages)
+            atexit.register(_shared_renderer.close)
+        return _shared_renderer
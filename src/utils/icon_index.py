@@ -0,0 +1,269 @@
+"""
+进程级 icons8 图标索引
+
+原先 load_png_icon 每次调用都要重新读取四个 *_png_metadata.json、线性扫描别名、
+对每个文件名跑 SequenceMatcher，找不到时还要 rglob 整个 assets/icons8。
+IconIndex 只构建一次（目录结构与 metadata 未变化时直接读取 .cache/icons/ 下的编译结果），提供：
+
+- 精确/别名查找：名字 → 候选路径列表（按 doodle > plasticine > stickers > color 的优先级）
+- 模糊查找：三元组（trigram）倒排索引按共享三元组数取前 FUZZY_SHORTLIST 个候选，再用 SequenceMatcher 打分
+- 文件名查找：一次目录遍历得到的 stem → 路径表，替代 rglob
+
+resolve() 的结果按名字缓存，并记录每个图标的查找耗时（见 lookup_report()）。
+"""
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+from collections import Counter
+from difflib import SequenceMatcher
+
+from src.utils.cache_dir import get_cache_dir
+
+# (子目录, metadata 文件)，顺序即优先级
+ICON_SOURCES = (
+    ("doodle", "doodle_png_metadata.json"),
+    ("plasticine", "plasticine_png_metadata.json"),
+    ("stickers", "stickers_png_metadata.json"),
+    ("color", "color_png_metadata.json"),
+)
+FUZZY_THRESHOLD = 0.6
+KEYWORD_THRESHOLD = 0.5
+# 模糊匹配先打分的候选数：与查询共享三元组最多的前 K 个单元（常见三元组如 "_ba" 会命中大半图标，取并集起不到筛选作用）
+FUZZY_SHORTLIST = 64
+INDEX_CACHE_VERSION = 1
+
+
+def similarity(a, b):
+    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+
+
+def trigrams(text):
+    """带首尾填充的小写三元组，短名字也至少有一个三元组"""
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IconIndex:
+    """
+    assets/icons8 的内存索引
+
+    Args:
+        icons8_dir: assets/icons8 目录
+        cache_file: 编译结果缓存文件；None 表示不读写缓存
+    """
+
+    def __init__(self, icons8_dir, cache_file=None):
+        self.icons8_dir = os.path.abspath(icons8_dir)
+        self.cache_file = cache_file
+        self._resolved = {}
+        self._lock = threading.Lock()
+        self.lookup_ms = {}
+        self.loaded_from_cache = False
+        self._load()
+
+    # ---------- 构建 ----------
+
+    def _signature(self):
+        """metadata 文件与各图标目录（含一级子目录）的 mtime，用于判断编译缓存是否过期"""
+        parts = []
+        for subdir, metadata_file in ICON_SOURCES:
+            for path in (os.path.join(self.icons8_dir, metadata_file), os.path.join(self.icons8_dir, subdir)):
+                try:
+                    st = os.stat(path)
+                    parts.append([path, st.st_mtime_ns, st.st_size])
+                except OSError:
+                    parts.append([path, None, None])
+            icon_dir = os.path.join(self.icons8_dir, subdir)
+            if os.path.isdir(icon_dir):
+                for entry in sorted(os.scandir(icon_dir), key=lambda e: e.name):
+                    if entry.is_dir():
+                        parts.append([entry.path, entry.stat().st_mtime_ns, None])
+        return hashlib.sha1(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def _scan(self):
+        """读取 metadata 并遍历图标目录，返回可序列化的编译结果"""
+        units = []    # 模糊匹配单元：[文件名, 别名列表, 相对路径]，按优先级排列
+        direct = []   # 精确/别名候选：[名字, 相对路径]，按优先级排列
+        for subdir, metadata_file in ICON_SOURCES:
+            metadata_path = os.path.join(self.icons8_dir, metadata_file)
+            if not os.path.exists(metadata_path):
+                continue
+            try:
+                with open(metadata_path, 'r', encoding='utf-8') as f:
+                    file_map = json.load(f).get("file_map", {})
+            except Exception as e:
+                print(f"⚠️ 读取 metadata 失败 ({metadata_file}): {e}")
+                continue
+
+            source_units = []
+            for filename, icon_info in file_map.items():
+                rel = os.path.join(subdir, icon_info.get("subcategory", ""), f"{filename}.png")
+                source_units.append([filename, list(icon_info.get("aliases", [])), rel])
+            # 同一来源内精确匹配优先于别名匹配
+            direct.extend([filename, rel] for filename, _, rel in source_units)
+            direct.extend([alias, rel] for _, aliases, rel in source_units for alias in aliases)
+            units.extend(source_units)
+
+        files = []
+        for subdir, _ in ICON_SOURCES:
+            icon_dir = os.path.join(self.icons8_dir, subdir)
+            for root, dirs, names in os.walk(icon_dir):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.endswith(".png"):
+                        files.append(os.path.relpath(os.path.join(root, name), self.icons8_dir))
+        return {"units": units, "direct": direct, "files": files}
+
+    def _load(self):
+        signature = self._signature()
+        data = None
+        if self.cache_file and os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get("version") == INDEX_CACHE_VERSION and cached.get("signature") == signature:
+                    data = cached
+                    self.loaded_from_cache = True
+            except (OSError, ValueError):
+                data = None
+        if data is None:
+            data = self._scan()
+            if self.cache_file:
+                self._save(dict(data, version=INDEX_CACHE_VERSION, signature=signature))
+        self._build(data)
+
+    def _save(self, data):
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        tmp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            print(f"⚠️ 图标索引缓存写入失败: {e}")
+
+    def _build(self, data):
+        abspath = lambda rel: os.path.join(self.icons8_dir, rel)
+        self.direct = {}
+        for name, rel in data["direct"]:
+            self.direct.setdefault(name, []).append(abspath(rel))
+
+        self.units = [(filename, aliases, abspath(rel)) for filename, aliases, rel in data["units"]]
+        self.grams = {}
+        for unit_id, (filename, aliases, _) in enumerate(self.units):
+            for term in (filename, *aliases):
+                for gram in trigrams(term):
+                    self.grams.setdefault(gram, set()).add(unit_id)
+
+        self.files = [abspath(rel) for rel in data["files"]]
+        self.by_stem = {}
+        for path in self.files:
+            self.by_stem.setdefault(os.path.splitext(os.path.basename(path))[0], path)
+
+    # ---------- 查找 ----------
+
+    def _fuzzy(self, icon_name, unit_ids):
+        """在给定单元中取相似度最高（> 阈值，同分取靠前者）的存在文件"""
+        best_score, best_path = FUZZY_THRESHOLD, None
+        name = icon_name.lower()
+        for unit_id in unit_ids:
+            filename, aliases, path = self.units[unit_id]
+            for term in (filename, *aliases):
+                matcher = SequenceMatcher(None, name, term.lower())
+                # real_quick_ratio/quick_ratio 是 ratio 的上界，先用它们剪枝
+                if matcher.real_quick_ratio() <= best_score or matcher.quick_ratio() <= best_score:
+                    continue
+                score = matcher.ratio()
+                if score > best_score and os.path.exists(path):
+                    best_score, best_path = score, path
+        return best_path
+
+    def _lookup(self, icon_name):
+        # 方法1: 精确匹配和别名匹配
+        for path in self.direct.get(icon_name, ()):
+            if os.path.exists(path):
+                return path
+
+        # 方法2: 模糊匹配（按共享三元组数取前 K 个候选，筛不出再全量扫描）
+        overlap = Counter()
+        for gram in trigrams(icon_name):
+            overlap.update(self.grams.get(gram, ()))
+        shortlist = set(heapq.nsmallest(FUZZY_SHORTLIST, overlap, key=lambda unit_id: (-overlap[unit_id], unit_id)))
+        path = self._fuzzy(icon_name, sorted(shortlist))
+        if path is None and len(shortlist) < len(self.units):
+            path = self._fuzzy(icon_name, (i for i in range(len(self.units)) if i not in shortlist))
+        if path:
+            return path
+
+        # 方法3: 文件名匹配
+        path = self.find_file(icon_name)
+        if path:
+            return path
+
+        # 方法4: 关键词匹配
+        name = icon_name.lower()
+        for path in self.files:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            stem_lower = stem.lower()
+            if (name in stem_lower or stem_lower in name) and similarity(icon_name, stem) > KEYWORD_THRESHOLD:
+                return path
+        return None
+
+    def find_file(self, icon_name):
+        """按文件名（不含扩展名）查找，替代 rglob(f"{icon_name}.png")"""
+        path = self.by_stem.get(icon_name)
+        if path and os.path.exists(path):
+            return path
+        return None
+
+    def resolve(self, icon_name):
+        """
+        把图标名解析为 PNG 路径（结果按名字缓存）
+
+        优先级：精确匹配 > 别名匹配 > 模糊匹配 > 文件名匹配 > 关键词匹配
+
+        Returns:
+            str: 图标路径，找不到时返回 None
+        """
+        with self._lock:
+            if icon_name in self._resolved:
+                return self._resolved[icon_name]
+        start = time.perf_counter()
+        path = self._lookup(icon_name)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._resolved[icon_name] = path
+            self.lookup_ms[icon_name] = elapsed_ms
+        return path
+
+    def lookup_report(self, top=5):
+        """返回图标查找耗时汇总（多行字符串），没有查找过时返回空字符串"""
+        if not self.lookup_ms:
+            return ""
+        total = sum(self.lookup_ms.values())
+        missing = [name for name, path in self._resolved.items() if path is None]
+        lines = [f"🔎 图标查找 {len(self.lookup_ms)} 个，合计 {total:.1f} ms，未找到 {len(missing)} 个"]
+        slowest = sorted(self.lookup_ms.items(), key=lambda item: item[1], reverse=True)[:top]
+        for name, ms in slowest:
+            lines.append(f"   {ms:8.2f} ms  {name}")
+        return "\n".join(lines)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_icon_index(project_root):
+    """返回 project_root/assets/icons8 的进程级索引（首次调用时构建或读取编译缓存）"""
+    icons8_dir = os.path.abspath(os.path.join(str(project_root), "assets", "icons8"))
+    with _indexes_lock:
+        index = _indexes.get(icons8_dir)
+        if index is None:
+            key = hashlib.sha1(icons8_dir.encode("utf-8")).hexdigest()[:12]
+            cache_file = os.path.join(get_cache_dir("icons"), f"index-{key}.json")
+            index = IconIndex(icons8_dir, cache_file=cache_file)
+            _indexes[icons8_dir] = index
+        return index
@@ -0,0 +1,203 @@
+"""
+解码后图片的进程级 LRU 缓存
+
+课程里同一个图标（"group"、"money_bag_with_coins" 等）会被 load_png_icon 调用很多次，
+每次 ImageMobject(path) 都要重新从磁盘解码 PNG。这里把解码后的 RGBA 数组按
+(路径, mtime, 大小, 目标像素高度) 缓存起来，按字节数做 LRU 淘汰；
+每次返回新的 ImageMobject，但底层共享同一块只读像素数组，需要修改像素时才复制（写时复制）。
+
+可选（max_scale）按目标渲染高度预先缩小数组（icons8 原图通常比画面上实际占用的像素大得多），
+减少常驻内存以及每帧的重采样开销。默认不缩小：场景里把图标放大多少倍事先并不知道，缩小后再放大会发糊，
+只有调用方明确给出最大放大倍数时才预缩放。
+
+渲染结束时 LessonVertical 会打印 report()：命中率、常驻内存、节省的解码时间。
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_MB = 256
+
+
+def presize_target_px(height, max_scale, pixel_height, frame_height):
+    """
+    预缩放的目标像素高度：图片在画面上可能占到的最大像素高度
+
+    Args:
+        height: 目标高度（Manim 单位）
+        max_scale: 场景里对该图片的最大放大倍数；None 表示不预缩放
+        pixel_height, frame_height: 当前分辨率（像素）与画面高度（Manim 单位）
+
+    Returns:
+        int: 像素高度；不预缩放时返回 None
+    """
+    if not height or not max_scale:
+        return None
+    return math.ceil(height * max_scale * pixel_height / frame_height)
+
+
+def decode_rgba(path, target_px=None):
+    """用 PIL 解码为 RGBA uint8 数组；target_px 指定时把高度缩到不超过该像素数"""
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image = image.convert("RGBA")
+        if target_px and image.height > target_px:
+            width = max(1, round(image.width * target_px / image.height))
+            image = image.resize((width, target_px), Image.LANCZOS)
+        pixels = np.array(image)
+    pixels.setflags(write=False)
+    return pixels
+
+
+class DecodedImageCache:
+    """
+    按字节数限额的 LRU 缓存
+
+    Args:
+        max_bytes: 常驻上限（按数组 nbytes 统计）
+        decoder: decoder(path, target_px) -> 只读数组，测试时可替换
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, decoder=decode_rgba):
+        self.max_bytes = max_bytes
+        self.decoder = decoder
+        self._entries = OrderedDict()   # key -> (pixels, decode_ms)
+        self._lock = threading.Lock()
+        self.resident_bytes = 0
+        self.peak_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.decode_ms = 0.0
+        self.saved_ms = 0.0
+
+    def get_pixels(self, path, target_px=None):
+        """返回共享的只读 RGBA 数组（命中时不读盘、不解码）"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        key = (path, st.st_mtime_ns, st.st_size, target_px)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_ms += entry[1]
+                return entry[0]
+
+        start = time.perf_counter()
+        pixels = self.decoder(path, target_px)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self.misses += 1
+            self.decode_ms += elapsed_ms
+            if key not in self._entries:
+                self._entries[key] = (pixels, elapsed_ms)
+                self.resident_bytes += pixels.nbytes
+                self._evict()
+                self.peak_bytes = max(self.peak_bytes, self.resident_bytes)
+        return pixels
+
+    def _evict(self):
+        # 至少保留刚放入的一项，单张超限的图片也照常返回
+        while self.resident_bytes > self.max_bytes and len(self._entries) > 1:
+            _, (pixels, _) = self._entries.popitem(last=False)
+            self.resident_bytes -= pixels.nbytes
+            self.evictions += 1
+
+    def image_mobject(self, path, height=None, max_scale=None):
+        """
+        创建共享像素缓冲的 ImageMobject
+
+        Args:
+            path: 图片路径
+            height: 目标高度（Manim 单位）
+            max_scale: 场景里对该图片的最大放大倍数；给定时把缓存的数组缩到 height * max_scale
+                在当前分辨率下的像素高度。默认 None 保留原图分辨率
+        """
+        target_px = None
+        if height and max_scale:
+            from manim import config
+
+            target_px = presize_target_px(height, max_scale, config.pixel_height, config.frame_height)
+        mob = get_shared_image_mobject_class()(self.get_pixels(path, target_px), path=path)
+        if height:
+            mob.height = height
+        return mob
+
+    def report(self):
+        """返回统计摘要字符串，没有使用过时返回空字符串"""
+        lookups = self.hits + self.misses
+        if not lookups:
+            return ""
+        return (
+            f"🖼️ 图片缓存：{lookups} 次请求，命中 {self.hits}，解码 {self.misses} 次"
+            f"（{self.decode_ms:.0f} ms），节省解码 {self.saved_ms:.0f} ms；"
+            f"常驻 {self.resident_bytes / 1024 / 1024:.1f} MB（峰值 {self.peak_bytes / 1024 / 1024:.1f} MB，"
+            f"{len(self._entries)} 张，淘汰 {self.evictions}）"
+        )
+
+
+def _shared_image_mobject_class():
+    from manim import ImageMobject
+    import numpy as np
+
+    class SharedImageMobject(ImageMobject):
+        """像素数组与缓存共享；set_opacity / set_color / 颜色插值等原地修改前先复制一份"""
+
+        def __init__(self, pixels, path=None, **kwargs):
+            # 先用 1x1 占位数组走父类初始化（避免父类 np.array 复制），再换成共享数组；
+            # 父类按占位数组记下的原始 alpha 也换成共享数组的（只读视图，不复制）
+            super().__init__(np.zeros((1, 1, 4), dtype=np.uint8), **kwargs)
+            self.pixel_array = pixels
+            self.orig_alpha_pixel_array = pixels[:, :, 3]
+            if path is not None:
+                self.path = path
+            self.reset_points()
+
+        def _own_pixels(self):
+            if not self.pixel_array.flags.writeable:
+                self.pixel_array = self.pixel_array.copy()
+
+        def set_opacity(self, alpha):
+            self._own_pixels()
+            return super().set_opacity(alpha)
+
+        def set_color(self, *args, **kwargs):
+            self._own_pixels()
+            return super().set_color(*args, **kwargs)
+
+        def interpolate_color(self, mobject1, mobject2, alpha):
+            self._own_pixels()
+            return super().interpolate_color(mobject1, mobject2, alpha)
+
+    return SharedImageMobject
+
+
+_shared_image_mobject_cls = None
+
+
+def get_shared_image_mobject_class():
+    """首次使用时才导入 manim 并创建子类，保持本模块可在无 manim 环境下导入"""
+    global _shared_image_mobject_cls
+    if _shared_image_mobject_cls is None:
+        _shared_image_mobject_cls = _shared_image_mobject_class()
+    return _shared_image_mobject_cls
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_image_cache():
+    """进程内共享的 DecodedImageCache（上限取 YYY_IMAGE_CACHE_MB 环境变量，默认 256）"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            max_mb = float(os.environ.get("YYY_IMAGE_CACHE_MB", DEFAULT_MAX_MB))
+            _shared_cache = DecodedImageCache(max_bytes=int(max_mb * 1024 * 1024))
+        return _shared_cache
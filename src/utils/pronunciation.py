@@ -0,0 +1,151 @@
+"""
+多音字发音修正的单遍改写器
+
+把同音字替换表编译成 Aho–Corasick 自动机，对文本做一次从左到右的扫描，
+按"最左优先、同起点取最长"的规则替换。替换结果不会被再次匹配，
+耗时与表的大小基本无关。
+"""
+import hashlib
+import json
+import os
+
+
+class PronunciationRewriter:
+    """
+    基于 Aho–Corasick 自动机的同音字替换器
+
+    Args:
+        table: { "误读的词": "正确读音的替换词" }
+    """
+
+    def __init__(self, table):
+        self.table = dict(table)
+        self.version = hashlib.sha1(
+            json.dumps(sorted(self.table.items()), ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:12]
+        self._build()
+
+    def _build(self):
+        # 节点 0 为根；goto[i] 为转移表，depth[i] 为节点深度，
+        # match_len[i] 为以该节点结尾（含 fail 链）的最长词条长度
+        goto = [{}]
+        depth = [0]
+        match_len = [0]
+        for word in self.table:
+            if not word:
+                continue
+            node = 0
+            for ch in word:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    depth.append(depth[node] + 1)
+                    match_len.append(0)
+                node = nxt
+            match_len[node] = len(word)
+
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for node in queue:
+            for ch, child in goto[node].items():
+                queue.append(child)
+                if node:
+                    f = fail[node]
+                    while f and ch not in goto[f]:
+                        f = fail[f]
+                    fail[child] = goto[f].get(ch, 0)
+                match_len[child] = max(match_len[child], match_len[fail[child]])
+
+        self._goto = goto
+        self._fail = fail
+        self._depth = depth
+        self._match_len = match_len
+
+    def rewrite(self, text):
+        """对 text 做单遍替换（最左优先、同起点取最长）"""
+        if not self.table or not text:
+            return text
+
+        goto, fail, depth, match_len = self._goto, self._fail, self._depth, self._match_len
+        out = []
+        last = 0
+        pos = 0
+        n = len(text)
+        while pos < n:
+            state = 0
+            best_start = best_end = -1
+            i = pos
+            while i < n:
+                ch = text[i]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+                i += 1
+                length = match_len[state]
+                if length:
+                    start = i - length
+                    if best_start < 0 or start < best_start or (start == best_start and i > best_end):
+                        best_start, best_end = start, i
+                # 仍在进行中的匹配都从 best_start 之后开始，当前候选已是最左最长
+                if best_start >= 0 and i - depth[state] > best_start:
+                    break
+            if best_start < 0:
+                break
+            out.append(text[last:best_start])
+            out.append(self.table[text[best_start:best_end]])
+            last = pos = best_end
+        out.append(text[last:])
+        return "".join(out)
+
+
+def load_pronunciation_table(path):
+    """
+    读取外部发音修正表
+
+    文件为 UTF-8 文本，每行 `误读的词<TAB>替换词`，空行和 `#` 开头的行忽略。
+
+    Returns:
+        dict: { "误读的词": "替换词" }
+    """
+    table = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if "\t" not in line:
+                raise ValueError(f"{path}:{line_no} 缺少制表符分隔: {line}")
+            word, replacement = line.split("\t", 1)
+            table[word.strip()] = replacement.strip()
+    return table
+
+
+# 编译缓存：键为 (表内容快照, 外部文件路径, 文件 mtime)
+_rewriter_cache = {}
+
+
+def get_pronunciation_rewriter(base_table, table_file=None):
+    """
+    返回编译好的改写器（按表内容与外部文件 mtime 缓存，只在变化时重新编译）
+
+    Args:
+        base_table: 默认修正表
+        table_file: 可选的系列修正表文件，其中的词条覆盖/补充默认表
+    """
+    mtime = None
+    if table_file:
+        table_file = os.path.abspath(table_file)
+        mtime = os.stat(table_file).st_mtime_ns
+    cache_key = (tuple(base_table.items()), table_file, mtime)
+    rewriter = _rewriter_cache.get(cache_key)
+    if rewriter is None:
+        table = dict(base_table)
+        if table_file:
+            table.update(load_pronunciation_table(table_file))
+        rewriter = PronunciationRewriter(table)
+        if len(_rewriter_cache) >= 8:
+            _rewriter_cache.clear()
+        _rewriter_cache[cache_key] = rewriter
+    return rewriter
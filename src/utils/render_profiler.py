@@ -0,0 +1,177 @@
+"""
+渲染性能剖析：按场景、按 play() 记录耗时 / 帧数 / mobject 数 / 内存峰值，输出 Chrome trace
+
+通过 RENDER_PROFILE=true（workflow.py render --profile）开启，RENDER_PROFILE=mem 另外记录
+tracemalloc 内存峰值（tracemalloc 会拖慢分配密集的渲染，使耗时失真，所以默认不开）。LessonVertical 把
+prepare_resources、每个 build_scene_N 以及每次 play()/wait() 包在 span 里，渲染结束后把
+trace 写到视频旁边（{视频名}.trace.json），用 chrome://tracing 或 https://ui.perfetto.dev 打开，
+并在终端打印最慢的场景和动画。
+
+每个 span 记录：
+- wall 时间（trace 的 ts/dur，微秒）
+- 调用方补充的参数（帧数、顶层 mobject 数、mobject 家族总数等）
+- tracemalloc 峰值（仅 RENDER_PROFILE=mem）：span 期间 Python 堆的最高点（嵌套 span 各自正确，父 span 包含子 span 的峰值）
+- 进程 RSS 峰值（ru_maxrss，单调不减，看的是哪个 span 把它推高）
+"""
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+TRACE_SUFFIX = ".trace.json"
+# 动画描述里 Text 内容的最大长度
+TEXT_PREVIEW_CHARS = 16
+
+
+def peak_rss_mb():
+    """进程 RSS 峰值（MB）；不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位是 KB，macOS 是字节
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def describe_animation(animation):
+    """Write(Text "一段很长的中文…") 这样的简短描述，便于在 trace 里认出是哪次调用"""
+    name = type(animation).__name__
+    mobject = getattr(animation, "mobject", None)
+    if name == "_AnimationBuilder":
+        name, mobject = "animate", getattr(animation, "mobject", None)
+    if mobject is None:
+        return name
+    label = type(mobject).__name__
+    text = getattr(mobject, "text", None) or getattr(mobject, "original_text", None)
+    if isinstance(text, str) and text:
+        preview = text if len(text) <= TEXT_PREVIEW_CHARS else text[:TEXT_PREVIEW_CHARS] + "…"
+        label = f'{label} "{preview}"'
+    return f"{name}({label})"
+
+
+def describe_animations(animations):
+    names = [describe_animation(a) for a in animations]
+    if len(names) > 3:
+        return ", ".join(names[:3]) + f" +{len(names) - 3}"
+    return ", ".join(names) or "play"
+
+
+def profiler_from_env():
+    """按 RENDER_PROFILE 创建剖析器：true 只记耗时，mem 另记 tracemalloc 峰值；未开启时返回 None"""
+    mode = os.getenv("RENDER_PROFILE", "False").lower()
+    if mode not in ("true", "mem"):
+        return None
+    return RenderProfiler(trace_memory=mode == "mem")
+
+
+class RenderProfiler:
+    """
+    收集 span 并导出 Chrome trace-event JSON
+
+    Args:
+        trace_memory: 是否启用 tracemalloc（开销不小，默认关闭）
+        clock: 返回秒的计时函数，测试时可替换
+    """
+
+    def __init__(self, trace_memory=False, clock=time.perf_counter):
+        self.clock = clock
+        self.origin = clock()
+        self.events = []
+        self.spans = []   # 已结束的 span：{"name", "cat", "dur_ms", "args"}
+        self._stack = []  # 正在进行的 span 的峰值累计
+        self._lock = threading.Lock()
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _now_us(self):
+        return (self.clock() - self.origin) * 1e6
+
+    def _fold_peak(self):
+        """把当前 tracemalloc 峰值并入所有进行中的 span，然后重置峰值"""
+        if not self.trace_memory or not tracemalloc.is_tracing():
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self._stack:
+            frame["peak"] = max(frame["peak"], peak)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def span(self, name, cat, **args):
+        """
+        记录一个 span；yield 出的 dict 可以在 span 内补充参数（如帧数）
+
+        Example:
+            with profiler.span("Write(Text)", "play") as info:
+                ...
+                info["frames"] = 30
+        """
+        info = dict(args)
+        with self._lock:
+            self._fold_peak()
+            frame = {"peak": 0}
+            self._stack.append(frame)
+        start = self._now_us()
+        try:
+            yield info
+        finally:
+            end = self._now_us()
+            with self._lock:
+                self._fold_peak()
+                self._stack.remove(frame)
+                if self.trace_memory:
+                    info["tracemalloc_peak_mb"] = round(frame["peak"] / 1024 / 1024, 3)
+                rss = peak_rss_mb()
+                if rss is not None:
+                    info["peak_rss_mb"] = round(rss, 1)
+                self.events.append({
+                    "name": name, "cat": cat, "ph": "X",
+                    "ts": round(start, 1), "dur": round(end - start, 1),
+                    "pid": os.getpid(), "tid": threading.get_ident(),
+                    "args": info,
+                })
+                if rss is not None:
+                    self.events.append({
+                        "name": "peak_rss_mb", "ph": "C", "ts": round(end, 1),
+                        "pid": os.getpid(), "args": {"peak_rss_mb": round(rss, 1)},
+                    })
+                self.spans.append({"name": name, "cat": cat, "dur_ms": (end - start) / 1000, "args": info})
+
+    def to_trace(self, metadata=None):
+        return {"traceEvents": list(self.events), "displayTimeUnit": "ms", "otherData": metadata or {}}
+
+    def write(self, path, metadata=None):
+        """原子写入 trace 文件，返回路径"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_trace(metadata), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+    def slowest(self, cat, top=5):
+        return sorted((s for s in self.spans if s["cat"] == cat), key=lambda s: s["dur_ms"], reverse=True)[:top]
+
+    def report(self, top=5):
+        """最慢的场景和 play() 调用（多行字符串），没有记录时返回空字符串"""
+        lines = []
+        for cat, title in (("scene", "场景"), ("play", "动画")):
+            spans = self.slowest(cat, top)
+            if not spans:
+                continue
+            total = sum(s["dur_ms"] for s in self.spans if s["cat"] == cat)
+            lines.append(f"⏱️ 最慢的{title}（{title}合计 {total / 1000:.1f}s）")
+            for s in spans:
+                extra = []
+                if "frames" in s["args"]:
+                    extra.append(f"{s['args']['frames']} 帧")
+                if "family" in s["args"]:
+                    extra.append(f"{s['args']['family']} mobjects")
+                if "tracemalloc_peak_mb" in s["args"]:
+                    extra.append(f"堆峰值 {s['args']['tracemalloc_peak_mb']:.1f} MB")
+                lines.append(f"   {s['dur_ms'] / 1000:8.2f}s  {s['name']}  ({', '.join(extra)})")
+        return "\n".join(lines)
@@ -0,0 +1,354 @@
+"""
+场景级增量渲染：每个 build_scene_N 单独渲染成一个片段，按指纹缓存
+
+指纹包含：
+- 该场景在 script.json 中的条目
+- animate.py 中 build_scene_N 的源码，以及去掉所有 build_scene_N 之后的模块其余部分（公共辅助代码）
+- 基类版本（BASE_SOURCES 的内容摘要）
+- 场景引用的图标文件（源码里 load_png_icon("...") 的字面量）和该场景的配音文件
+- 渲染参数（质量、分辨率、帧率）
+
+指纹未变的片段直接复用 media/segments/ 下的文件；变化的片段用 RENDER_SCENES 环境变量
+单独渲染（只生成画面，不混音）。最后用 ffmpeg concat 流拷贝拼接，再一次性混入 full_audio.wav。
+封面首帧作为 0 号片段（没有封面图时与整课渲染一致，直接跳过）。
+
+各场景结尾都会 FadeOut 全部元素，彼此独立，因此待渲染的片段可以交给多个 manim 进程并行渲染
+（workers > 1）。每个片段在整课中的起点由前面各段配音时长累加得到（见 segment_timeline），
+调度时按时长从长到短派发，整课耗时随核数而不是场景数增长。
+"""
+import ast
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+from src.utils.audio_duration import get_duration_index, prime_audio_durations
+from src.utils.icon_index import get_icon_index
+
+SEGMENT_FORMAT_VERSION = 1
+COVER_SEGMENT = 0
+SEGMENT_DIR = os.path.join("media", "segments")
+# 与 LessonVertical.build_scenes 中封面首帧的停留时长一致
+COVER_SECONDS = 0.5
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+# 所有场景共享的基类代码，任一变化都会让全部片段失效（含决定文字轮廓、图标解析和图片像素的缓存模块）
+BASE_SOURCES = (
+    "src/animate/__init__.py",
+    "src/animate/lesson_vertical.py",
+    "src/utils/anim_helper.py",
+    "src/utils/icon_helper.py",
+    "src/utils/icon_index.py",
+    "src/utils/image_cache.py",
+    "src/utils/text_cache.py",
+)
+
+_BUILD_SCENE_RE = re.compile(r"^build_scene_(\d+)$")
+_ICON_CALL_RE = re.compile(r"""load_png_icon\(\s*["']([^"']+)["']""")
+
+
+def file_digest(path):
+    """文件内容的 sha256；不存在时返回 "missing" """
+    if not path or not os.path.exists(path):
+        return "missing"
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def base_digest(project_root=PROJECT_ROOT):
+    h = hashlib.sha256()
+    for rel in BASE_SOURCES:
+        h.update(rel.encode("utf-8"))
+        h.update(file_digest(os.path.join(project_root, rel)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def extract_scene_sources(animate_path):
+    """
+    解析 animate.py
+
+    Returns:
+        tuple: ({scene_index: build_scene_N 源码}, 去掉所有 build_scene_N 后的模块源码)
+    """
+    with open(animate_path, "r", encoding="utf-8") as f:
+        source = f.read()
+    lines = source.splitlines(keepends=True)
+    methods = {}
+    spans = []
+    for node in ast.walk(ast.parse(source)):
+        if not isinstance(node, ast.ClassDef):
+            continue
+        for item in node.body:
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                match = _BUILD_SCENE_RE.match(item.name)
+                if match:
+                    start = min([d.lineno for d in item.decorator_list] + [item.lineno]) - 1
+                    methods[int(match.group(1))] = "".join(lines[start:item.end_lineno])
+                    spans.append((start, item.end_lineno))
+    keep = [True] * len(lines)
+    for start, end in spans:
+        for i in range(start, end):
+            keep[i] = False
+    prelude = "".join(line for line, k in zip(lines, keep) if k)
+    return methods, prelude
+
+
+def referenced_icons(method_source):
+    """源码中以字符串字面量传给 load_png_icon 的图标名"""
+    return sorted(set(_ICON_CALL_RE.findall(method_source or "")))
+
+
+def _digest(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def scene_fingerprints(lesson_dir, render_args, project_root=PROJECT_ROOT):
+    """
+    计算 lesson 内每个片段的指纹（0 号为封面）
+
+    Args:
+        lesson_dir: lesson 目录（含 script.json / animate.py / voice/ / images/）
+        render_args: 影响画面的 manim 参数（质量、分辨率、帧率等），参与指纹
+
+    Returns:
+        list: [(segment_index, fingerprint), ...]，按播放顺序
+    """
+    with open(os.path.join(lesson_dir, "script.json"), "r", encoding="utf-8") as f:
+        script = json.load(f)
+    methods, prelude = extract_scene_sources(os.path.join(lesson_dir, "animate.py"))
+    common = {
+        "version": SEGMENT_FORMAT_VERSION,
+        "render_args": list(render_args),
+        "base": base_digest(project_root),
+    }
+    icon_index = None
+
+    segments = []
+    cover_path = os.path.join(lesson_dir, "images", "cover_design.png")
+    if os.path.exists(cover_path):
+        segments.append((COVER_SEGMENT, _digest(dict(common, cover=file_digest(cover_path)))))
+    for scene in script.get("scenes", []):
+        idx = scene.get("scene_index")
+        if idx is None:
+            continue
+        method_source = methods.get(idx)
+        icons = {}
+        for name in referenced_icons(method_source):
+            if icon_index is None:
+                icon_index = get_icon_index(project_root)
+            icons[name] = file_digest(icon_index.resolve(name))
+        segments.append((idx, _digest(dict(
+            common,
+            prelude=hashlib.sha256(prelude.encode("utf-8")).hexdigest(),
+            scene=scene,
+            method=method_source or "inherited",
+            icons=icons,
+            audio=file_digest(os.path.join(lesson_dir, "voice", f"{idx}.mp3")),
+        ))))
+    return segments
+
+
+def segment_path(lesson_dir, segment_index, fingerprint):
+    return os.path.join(lesson_dir, SEGMENT_DIR, f"scene_{segment_index:02d}_{fingerprint[:16]}.mp4")
+
+
+def plan_segments(lesson_dir, render_args, project_root=PROJECT_ROOT):
+    """
+    Returns:
+        list: [{"index", "fingerprint", "path", "cached"}, ...]
+    """
+    plan = []
+    for idx, fingerprint in scene_fingerprints(lesson_dir, render_args, project_root):
+        path = segment_path(lesson_dir, idx, fingerprint)
+        plan.append({"index": idx, "fingerprint": fingerprint, "path": path, "cached": os.path.exists(path)})
+    return plan
+
+
+def segment_timeline(lesson_dir, plan, duration=None):
+    """
+    按配音时长推算每个片段在整课中的起点和时长（整课音轨就是各段配音首尾相接）
+
+    Args:
+        plan: plan_segments 的结果
+        duration: duration(path) -> 秒，默认使用进程级时长索引
+
+    Returns:
+        dict: {segment_index: (start_seconds, length_seconds)}，按播放顺序
+    """
+    voice_dir = os.path.join(lesson_dir, "voice")
+    if duration is None:
+        prime_audio_durations(
+            [os.path.join(voice_dir, f"{s['index']}.mp3") for s in plan if s["index"] != COVER_SEGMENT],
+            sidecar_dir=voice_dir,
+        )
+        duration = get_duration_index().get
+
+    timeline = {}
+    start = 0.0
+    for segment in plan:
+        idx = segment["index"]
+        if idx == COVER_SEGMENT:
+            length = COVER_SECONDS
+        else:
+            audio_path = os.path.join(voice_dir, f"{idx}.mp3")
+            try:
+                length = duration(audio_path) if os.path.exists(audio_path) else 0.0
+            except RuntimeError as e:
+                print(f"⚠️ {e}")
+                length = 0.0
+        timeline[idx] = (start, length)
+        start += length
+    return timeline
+
+
+def render_segment(lesson_dir, class_name, segment, render_args, env=None, runner=subprocess.run, log=None):
+    """
+    单独渲染一个片段（RENDER_SCENES=<index>），产物原子地移动到 segment["path"]
+
+    每个片段使用独立的 --media_dir，多个片段并行渲染时 partial_movie_files 不会冲突。
+    """
+    idx = segment["index"]
+    name = f"scene_{idx:02d}"
+    work_dir = os.path.join(lesson_dir, SEGMENT_DIR, "work", name)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    cmd = ["uv", "run", "manim", *render_args, "--media_dir", work_dir, "-o", name, "animate.py", class_name]
+    runner(
+        cmd,
+        cwd=lesson_dir,
+        env={**os.environ, **(env or {}), "RENDER_SCENES": str(idx)},
+        check=True,
+        stdout=log,
+        stderr=subprocess.STDOUT if log else None,
+    )
+    produced = None
+    for root, _, files in os.walk(os.path.join(work_dir, "videos")):
+        if f"{name}.mp4" in files:
+            produced = os.path.join(root, f"{name}.mp4")
+            break
+    if produced is None:
+        raise RuntimeError(f"片段 {idx} 渲染后未找到输出文件 ({work_dir})")
+    os.makedirs(os.path.dirname(segment["path"]), exist_ok=True)
+    os.replace(produced, segment["path"])
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return segment["path"]
+
+
+def concat_segments(paths, output_path, runner=subprocess.run):
+    """ffmpeg concat demuxer 流拷贝拼接（各片段编码参数一致，无需重新编码）"""
+    list_path = f"{output_path}.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("'", r"'\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        runner(
+            ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+             "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path],
+            check=True,
+        )
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+def mux_audio(video_path, audio_path, output_path, runner=subprocess.run):
+    """视频流拷贝，混入整课音轨（AAC）"""
+    runner(
+        ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+         "-i", video_path, "-i", audio_path,
+         "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", "aac", "-b:a", "192k",
+         output_path],
+        check=True,
+    )
+    return output_path
+
+
+def prune_segments(lesson_dir, keep_paths):
+    """删除 media/segments/ 下不再被引用的旧版本片段"""
+    segment_dir = os.path.join(lesson_dir, SEGMENT_DIR)
+    keep = {os.path.abspath(p) for p in keep_paths}
+    removed = 0
+    for name in os.listdir(segment_dir):
+        path = os.path.abspath(os.path.join(segment_dir, name))
+        if name.endswith(".mp4") and path not in keep:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def render_pending_segments(lesson_dir, class_name, pending, render_args, workers=1,
+                            env=None, runner=subprocess.run, log=None):
+    """
+    渲染一组片段；workers > 1 时每个片段一个 manim 进程并行渲染
+
+    任一片段失败时不再派发剩余片段，等已启动的进程结束后抛出第一个异常。
+
+    Returns:
+        list: 渲染完成的片段索引（按派发顺序）
+    """
+    def render_one(segment):
+        print(f"🎞️ 渲染片段 {segment['index']} ...", flush=True)
+        render_segment(lesson_dir, class_name, segment, render_args, env=env, runner=runner, log=log)
+        return segment["index"]
+
+    if workers <= 1 or len(pending) <= 1:
+        return [render_one(segment) for segment in pending]
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+        futures = [executor.submit(render_one, segment) for segment in pending]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        failed = [f for f in done if f.exception() is not None]
+        if failed:
+            for future in not_done:
+                future.cancel()
+            wait(not_done)
+            raise failed[0].exception()
+        return [future.result() for future in futures]
+
+
+def render_incremental(lesson_dir, class_name, render_args, output_path, env=None,
+                       runner=subprocess.run, log=None, project_root=PROJECT_ROOT,
+                       workers=1, duration=None):
+    """
+    增量渲染整课：只渲染指纹变化的片段，拼接后混入 voice/full_audio.wav
+
+    调用前需要已经准备好语音、封面和 full_audio.wav（见 workflow 的准备阶段）。
+
+    Args:
+        workers: 并行渲染片段的 manim 进程数
+        duration: 传给 segment_timeline 的时长函数
+
+    Returns:
+        dict: {"rendered": [index, ...], "reused": [index, ...], "output": output_path,
+               "timeline": {index: (start, length)}}
+    """
+    plan = plan_segments(lesson_dir, render_args, project_root)
+    timeline = segment_timeline(lesson_dir, plan, duration=duration)
+    reused = [segment["index"] for segment in plan if segment["cached"]]
+    rendered = [segment["index"] for segment in plan if not segment["cached"]]
+    # 最长的场景先派发，避免最后只剩一个长场景在跑
+    pending = sorted(
+        (segment for segment in plan if not segment["cached"]),
+        key=lambda segment: timeline[segment["index"]][1],
+        reverse=True,
+    )
+    render_pending_segments(
+        lesson_dir, class_name, pending, render_args,
+        workers=workers, env=env, runner=runner, log=log,
+    )
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    video_only = os.path.join(lesson_dir, SEGMENT_DIR, "video_only.mp4")
+    concat_segments([segment["path"] for segment in plan], video_only, runner=runner)
+    part_path = f"{output_path}.{os.getpid()}.part.mp4"
+    mux_audio(video_only, os.path.join(lesson_dir, "voice", "full_audio.wav"), part_path, runner=runner)
+    os.replace(part_path, output_path)
+    os.remove(video_only)
+    prune_segments(lesson_dir, [segment["path"] for segment in plan])
+    return {"rendered": rendered, "reused": reused, "output": output_path, "timeline": timeline}
@@ -0,0 +1,83 @@
+"""
+故事板：每个场景一张缩略图 + 整课联系表（contact sheet）
+
+workflow.py storyboard 以 STORYBOARD=true 和 manim -s 运行 lesson：跳过所有动画（每个 play 直接到终态）、
+不编码视频，LessonVertical 在每个场景收尾的 FadeOut 之前定格画面，写到 media/storyboard/{scene_index}.png，
+最后调用 build_contact_sheet 把封面和全部缩略图拼成 media/storyboard/contact_sheet.png，
+供内容审核在正式渲染前确认版式。
+"""
+import os
+import re
+
+STORYBOARD_DIR = os.path.join("media", "storyboard")
+CONTACT_SHEET_NAME = "contact_sheet.png"
+
+_THUMBNAIL_RE = re.compile(r"^(\d+)\.png$")
+
+
+def storyboard_tiles(storyboard_dir, cover_path=None, scene_indices=None):
+    """
+    收集联系表的格子
+
+    Args:
+        storyboard_dir: 缩略图目录
+        cover_path: 封面图（存在时放在第一格）
+        scene_indices: 只收这些场景的缩略图；目录里可能留着已删除 / 改号场景的旧缩略图，
+            传入本次渲染的场景编号可以把它们排除。None 表示目录里的全部缩略图
+
+    Returns:
+        list: [(标签, 图片路径), ...]，封面在前，场景按编号排序
+    """
+    tiles = []
+    if cover_path and os.path.exists(cover_path):
+        tiles.append(("cover", cover_path))
+    scenes = []
+    if os.path.isdir(storyboard_dir):
+        for name in os.listdir(storyboard_dir):
+            match = _THUMBNAIL_RE.match(name)
+            if match and (scene_indices is None or int(match.group(1)) in scene_indices):
+                scenes.append((int(match.group(1)), os.path.join(storyboard_dir, name)))
+    tiles.extend((f"scene {idx}", path) for idx, path in sorted(scenes))
+    return tiles
+
+
+def build_contact_sheet(tiles, output_path, columns=4, tile_width=270, padding=16, label_height=28,
+                        background=(24, 24, 24), label_color=(230, 230, 230)):
+    """
+    把若干缩略图按网格拼成一张图（等比缩放到 tile_width 宽，下方标注标签）
+
+    Args:
+        tiles: [(标签, 图片路径), ...]
+        output_path: 输出 PNG
+
+    Returns:
+        str: output_path；没有格子时返回 None
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    if not tiles:
+        return None
+    images = []
+    for label, path in tiles:
+        with Image.open(path) as image:
+            image = image.convert("RGB")
+            height = max(1, round(image.height * tile_width / image.width))
+            images.append((label, image.resize((tile_width, height), Image.LANCZOS)))
+
+    tile_height = max(image.height for _, image in images)
+    columns = max(1, min(columns, len(images)))
+    rows = (len(images) + columns - 1) // columns
+    cell_w = tile_width + padding
+    cell_h = tile_height + label_height + padding
+    sheet = Image.new("RGB", (columns * cell_w + padding, rows * cell_h + padding), background)
+    draw = ImageDraw.Draw(sheet)
+    font = ImageFont.load_default()
+    for i, (label, image) in enumerate(images):
+        x = padding + (i % columns) * cell_w
+        y = padding + (i // columns) * cell_h
+        sheet.paste(image, (x, y))
+        draw.text((x, y + tile_height + 6), label, fill=label_color, font=font)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    sheet.save(output_path)
+    return output_path
@@ -0,0 +1,312 @@
+"""
+Text 轮廓的磁盘缓存（跨 lesson、跨系列共享）
+
+每个 Text(..., font=self.title_font) 都要经过 Pango 排版成临时 SVG，再由 manim 解析回 VMobject。
+manim 自带的缓存只在 lesson 自己的 media/texts 和进程内生效，"投资人"、"→"、系列标题这类
+反复出现的文字在每一课里都要重新排版、解析一遍（楷体 / 苹方的 CJK 字形尤其慢）。
+
+这里按 (文字, 字体, 字号, 字重, 倾斜, 行距, 其他影响字形的参数, manim 版本) 计算键，
+把解析后每个字形的轮廓点存成紧凑的二进制文件（float32），放在 .cache/text_outlines/ 下：
+
+    b"YTXO" | u16 格式版本 | u32 字形数 | f32 生成耗时(ms) | u32[字形数] 点数 | f32[...] 点坐标 (x, y, z)
+
+命中时 CachedText 跳过 Pango 和 SVG 解析，直接用缓存的点构造字形；颜色、透明度、描边等样式不进键，
+命中后按本次参数重新设置（见 outline_style）。带 t2c / t2f / t2s / t2w / t2g / gradient 的富文本不走缓存。
+
+lesson 通过 `from src.animate import CachedText as Text` 显式启用；TEXT_CACHE=false 时 CachedText 等同于 Text。
+
+渲染结束时 LessonVertical 打印 report()：命中数、生成数，以及按缓存项记录的生成耗时算出的节省时间。
+同一进程内重复出现的文字原本就有 manim 的内存缓存，只有每个键在进程内的第一次磁盘命中计入节省。
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from src.utils.cache_dir import get_cache_dir
+
+FORMAT_VERSION = 1
+MAGIC = b"YTXO"
+_HEADER = struct.Struct("<4sHIf")
+# 这些参数只影响样式或摆放位置，不影响字形轮廓，不进缓存键
+STYLE_KWARGS = frozenset({
+    "color", "fill_color", "fill_opacity", "stroke_color", "stroke_opacity", "stroke_width",
+    "opacity", "height", "width", "should_center", "z_index", "name",
+})
+# 按字符单独着色 / 换字体的富文本不缓存
+RICH_KWARGS = frozenset({"t2c", "t2f", "t2g", "t2s", "t2w", "gradient"})
+# 命中缓存时交给 Text.__init__ 的占位 SVG（不会被解析）
+PLACEHOLDER_SVG = '<svg xmlns="http://www.w3.org/2000/svg" width="1" height="1"></svg>\n'
+
+
+def is_cacheable(kwargs):
+    """只有纯文本（没有富文本参数）才缓存"""
+    return not any(kwargs.get(name) for name in RICH_KWARGS)
+
+
+def text_cache_enabled():
+    """TEXT_CACHE=false 可临时关闭轮廓缓存"""
+    return os.getenv("TEXT_CACHE", "True").lower() == "true"
+
+
+def outline_style(kwargs, default_color):
+    """
+    命中缓存时每个字形的样式，与走 SVG 解析时一致（Text 默认 fill_opacity=1、stroke_width=0）
+
+    Returns:
+        dict: VMobject.set_style 的关键字参数
+    """
+    fill_color = kwargs.get("color") or kwargs.get("fill_color") or default_color
+    style = {
+        "fill_color": fill_color,
+        "fill_opacity": kwargs.get("fill_opacity", 1.0),
+        "stroke_color": kwargs.get("stroke_color") or fill_color,
+        "stroke_width": kwargs.get("stroke_width", 0),
+    }
+    if kwargs.get("stroke_opacity") is not None:
+        style["stroke_opacity"] = kwargs["stroke_opacity"]
+    return style
+
+
+def outline_key(text, kwargs, version=""):
+    """缓存键：文字 + 所有影响字形的参数 + manim 版本 + 格式版本"""
+    settings = {name: value for name, value in kwargs.items() if name not in STYLE_KWARGS}
+    payload = json.dumps(
+        {"text": text, "settings": settings, "version": str(version), "format": FORMAT_VERSION},
+        ensure_ascii=False, sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def pack_outlines(glyphs, build_ms=0.0):
+    """
+    Args:
+        glyphs: 每个字形一组展平的点坐标 [x0, y0, z0, x1, ...]
+        build_ms: 这份轮廓原本的生成耗时（排版 + 解析）
+    """
+    counts = array("I")
+    points = array("f")
+    for flat in glyphs:
+        values = array("f", flat)
+        if len(values) % 3:
+            raise ValueError("点坐标数量必须是 3 的倍数")
+        counts.append(len(values) // 3)
+        points.extend(values)
+    if sys.byteorder != "little":
+        counts.byteswap()
+        points.byteswap()
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, len(counts), build_ms) + counts.tobytes() + points.tobytes()
+
+
+def unpack_outlines(data):
+    """
+    Returns:
+        (glyphs, build_ms)：glyphs 为每个字形一个 array("f")；格式不对时返回 None
+    """
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, count, build_ms = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    counts = array("I")
+    counts_end = _HEADER.size + count * counts.itemsize
+    counts.frombytes(data[_HEADER.size:counts_end])
+    points = array("f")
+    if sys.byteorder != "little":
+        counts.byteswap()
+    if len(data) - counts_end != sum(counts) * 3 * points.itemsize:
+        return None
+    points.frombytes(data[counts_end:])
+    if sys.byteorder != "little":
+        points.byteswap()
+    glyphs = []
+    offset = 0
+    for n in counts:
+        glyphs.append(points[offset:offset + n * 3])
+        offset += n * 3
+    return glyphs, build_ms
+
+
+class TextOutlineCache:
+    """
+    磁盘上按键一文件的轮廓缓存，带进程内副本
+
+    Args:
+        cache_dir: 缓存目录（默认 .cache/text_outlines/）
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or get_cache_dir("text_outlines")
+        self._memory = {}       # 键 -> glyphs
+        self._credited = set()  # 已经计入节省时间的键
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.load_ms = 0.0
+        self.build_ms = 0.0
+        self.saved_ms = 0.0
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.bin")
+
+    def placeholder_svg(self):
+        """命中时交给 Text 的占位 SVG 路径"""
+        path = os.path.join(self.cache_dir, "placeholder.svg")
+        if not os.path.exists(path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(PLACEHOLDER_SVG)
+            os.replace(tmp_path, path)
+        return path
+
+    def load(self, key):
+        """命中时返回字形点坐标列表，否则返回 None"""
+        with self._lock:
+            glyphs = self._memory.get(key)
+            if glyphs is not None:
+                self.hits += 1
+                return glyphs
+
+        start = time.perf_counter()
+        try:
+            with open(self.path_for(key), "rb") as f:
+                entry = unpack_outlines(f.read())
+        except OSError:
+            entry = None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if entry is None:
+            return None
+
+        glyphs, build_ms = entry
+        with self._lock:
+            self.hits += 1
+            self.load_ms += elapsed_ms
+            self._memory[key] = glyphs
+            if key not in self._credited:
+                self._credited.add(key)
+                self.saved_ms += max(0.0, build_ms - elapsed_ms)
+        return glyphs
+
+    def store(self, key, glyphs, build_ms):
+        """记录一次未命中，并原子写入缓存文件（写失败只影响缓存，不影响渲染）"""
+        data = pack_outlines(glyphs, build_ms)
+        with self._lock:
+            self.misses += 1
+            self.build_ms += build_ms
+            self._memory[key] = unpack_outlines(data)[0]
+            self._credited.add(key)
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ 文字轮廓缓存写入失败: {e}")
+
+    def record_uncached(self, build_ms):
+        """富文本等不走缓存的 Text 也计入生成耗时"""
+        with self._lock:
+            self.misses += 1
+            self.build_ms += build_ms
+
+    def forget(self):
+        """清空进程内副本（下次 load 重新读盘，基准测试模拟新进程用）"""
+        with self._lock:
+            self._memory.clear()
+            self._credited.clear()
+
+    def report(self):
+        """返回统计摘要字符串，没有使用过时返回空字符串"""
+        total = self.hits + self.misses
+        if not total:
+            return ""
+        return (
+            f"🔤 文字轮廓缓存：{total} 个 Text，命中 {self.hits}（读盘 {self.load_ms:.0f} ms），"
+            f"排版解析 {self.misses} 个（{self.build_ms:.0f} ms），节省约 {self.saved_ms:.0f} ms"
+        )
+
+
+def _cached_text_class():
+    import numpy as np
+    import manim
+    from manim import WHITE, Text, VMobject
+
+    version = getattr(manim, "__version__", "")
+
+    class CachedText(Text):
+        """与 Text 用法完全相同；纯文本的字形轮廓走 TextOutlineCache（TEXT_CACHE=false 时等同于 Text）"""
+
+        def __init__(self, text, *args, **kwargs):
+            # 缓存对象带锁，不能挂在实例上（manim 会 deepcopy mobject）
+            self._outline_started = time.perf_counter()
+            self._outline_key = None
+            self._outline = None
+            self._outline_style = outline_style(kwargs, WHITE)
+            if not args and is_cacheable(kwargs) and text_cache_enabled():
+                self._outline_key = outline_key(text, kwargs, version)
+                self._outline = get_text_outline_cache().load(self._outline_key)
+            super().__init__(text, *args, **kwargs)
+            if self._outline_key is None:
+                get_text_outline_cache().record_uncached((time.perf_counter() - self._outline_started) * 1000)
+            del self._outline_started, self._outline_key, self._outline, self._outline_style
+
+        def _text2svg(self, *args, **kwargs):
+            # 命中时不调用 Pango；Text.__init__ 仍会读写一次返回的文件，给它一个占位 SVG
+            if self._outline is not None:
+                return get_text_outline_cache().placeholder_svg()
+            return super()._text2svg(*args, **kwargs)
+
+        def init_svg_mobject(self, *args, **kwargs):
+            if self._outline is not None:
+                glyphs = []
+                for flat in self._outline:
+                    glyph = VMobject()
+                    glyph.set_points(np.asarray(flat, dtype=float).reshape(-1, 3))
+                    glyph.set_style(**self._outline_style)
+                    glyphs.append(glyph)
+                self.add(*glyphs)
+                return
+            super().init_svg_mobject(*args, **kwargs)
+            if self._outline_key is None:
+                return
+            build_ms = (time.perf_counter() - self._outline_started) * 1000
+            # 字形里再嵌套子对象的情况（不应出现）不缓存，避免丢内容
+            if any(mob.submobjects for mob in self.submobjects):
+                get_text_outline_cache().record_uncached(build_ms)
+            else:
+                get_text_outline_cache().store(
+                    self._outline_key, [mob.points.ravel().tolist() for mob in self.submobjects], build_ms,
+                )
+
+    return CachedText
+
+
+_cached_text_cls = None
+
+
+def get_cached_text_class():
+    """首次使用时才导入 manim 并创建 Text 子类，保持本模块可在无 manim 环境下导入"""
+    global _cached_text_cls
+    if _cached_text_cls is None:
+        _cached_text_cls = _cached_text_class()
+    return _cached_text_cls
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_text_outline_cache():
+    """进程内共享的 TextOutlineCache"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = TextOutlineCache()
+        return _shared_cache
@@ -5,8 +5,14 @@ Edge TTS 语音生成模块
 """
 import asyncio
 import edge_tts
+import hashlib
 import os
 import json
+import shutil
+
+from src.utils.audio_duration import matches_sidecar, read_sidecar_entries
+from src.utils.cache_dir import get_cache_dir
+from src.utils.pronunciation import get_pronunciation_rewriter
 
 
 # ============================================================================
@@ -19,6 +25,9 @@ import json
 #
 # 添加新词条：
 #   "误读的词": "正确读音的替换词",
+#
+# 系列专属词条可放在外部表文件中（每行 `误读的词<TAB>替换词`），
+# 通过 pronunciation_file 参数叠加到本表之上。
 # ============================================================================
 PRONUNCIATION_FIXES = {
     # "降"字：应读 jiàng（下降），Edge TTS 有时误读为 xiáng（投降）
@@ -35,22 +44,26 @@ PRONUNCIATION_FIXES = {
 }
 
 
-def fix_pronunciation(text):
+def fix_pronunciation(text, pronunciation_file=None):
     """
     修正文本中的多音字发音问题（使用同音字替换）
+
+    替换表编译为 Aho–Corasick 自动机后单遍扫描，最左优先、同起点取最长，
+    已替换出的文字不会被再次改写。
     
     Args:
         text: 原始文本
+        pronunciation_file: 可选的系列发音修正表文件
         
     Returns:
         str: 替换后的文本（仅用于语音合成）
     """
-    fixed_text = text
-    # 按照词条长度降序排列，优先匹配长词组
-    sorted_fixes = sorted(PRONUNCIATION_FIXES.items(), key=lambda x: len(x[0]), reverse=True)
-    for word, replacement in sorted_fixes:
-        fixed_text = fixed_text.replace(word, replacement)
-    return fixed_text
+    return get_pronunciation_rewriter(PRONUNCIATION_FIXES, pronunciation_file).rewrite(text)
+
+
+def pronunciation_table_version(pronunciation_file=None):
+    """返回发音修正表（含系列表）的版本指纹，表内容变化时变化"""
+    return get_pronunciation_rewriter(PRONUNCIATION_FIXES, pronunciation_file).version
 
 
 def parse_json_script(file_path):
@@ -252,9 +265,50 @@ def categorize_voices(voices):
     return categorized
 
 
-async def generate_voice_for_scripts(scripts_dict, output_dir, voice="zh-CN-XiaoxiaoNeural"):
+# Edge TTS 并发合成的默认参数
+DEFAULT_TTS_CONCURRENCY = 4  # 同时进行的合成请求数
+DEFAULT_TTS_RETRIES = 3      # 单个片段失败后的重试次数
+DEFAULT_TTS_BACKOFF = 1.0    # 重试退避基数（秒），按 1x / 2x / 4x 递增
+
+
+async def _synthesize_clip(text, voice, output_file, semaphore, retries, backoff):
+    """
+    合成单个片段：先写临时文件，完整写完后原子替换，失败按指数退避重试
+
+    半途中断不会在 output_file 留下截断的 MP3；临时文件按进程区分，
+    多个 lesson 同时向共享缓存合成同一片段时互不覆盖。
+    """
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    async with semaphore:
+        for attempt in range(retries + 1):
+            try:
+                communicate = edge_tts.Communicate(text, voice)
+                await communicate.save(tmp_file)
+                os.replace(tmp_file, output_file)
+                return
+            except Exception as e:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                if attempt >= retries:
+                    raise
+                delay = backoff * (2 ** attempt)
+                print(f"⚠️ 合成失败，{delay:.1f}s 后重试 ({attempt + 1}/{retries}): {os.path.basename(output_file)} - {e}")
+                await asyncio.sleep(delay)
+
+
+async def generate_voice_for_scripts(
+    scripts_dict,
+    output_dir,
+    voice="zh-CN-XiaoxiaoNeural",
+    concurrency=DEFAULT_TTS_CONCURRENCY,
+    retries=DEFAULT_TTS_RETRIES,
+    backoff=DEFAULT_TTS_BACKOFF,
+    pronunciation_file=None,
+):
     """
     根据脚本字典生成 MP3 音频。
+
+    各片段并发合成（最多 concurrency 个同时进行），整体耗时接近最慢的那个片段。
     
     Args:
         scripts_dict (dict): { "filename_key": "text_content" }
@@ -268,32 +322,197 @@ async def generate_voice_for_scripts(scripts_dict, output_dir, voice="zh-CN-Xiao
                     - zh-CN-YunxiaNeural: 成熟男性，温暖亲切，适合故事讲述
                     - zh-CN-YunyangNeural: 年轻男性，有活力，适合娱乐内容
                     更多选项请参考文件顶部的注释或运行 print_voice_options()
+        concurrency (int): 最大并发合成数
+        retries (int): 单个片段的最大重试次数
+        backoff (float): 重试退避基数（秒）
+        pronunciation_file (str): 可选的系列发音修正表文件
+
+    Raises:
+        RuntimeError: 重试耗尽后仍有片段失败（其余片段照常完成）
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         
-    print(f"🎙️ 正在生成语音 (Voice: {voice})...")
+    print(f"🎙️ 正在生成语音 (Voice: {voice}, 并发: {concurrency})...")
     print(f"📂 输出目录: {output_dir}")
-    
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    filenames = []
+    tasks = []
     for key, text in scripts_dict.items():
         # 自动补全 .mp3 后缀
         filename = key if key.endswith(".mp3") else f"{key}.mp3"
         output_file = os.path.join(output_dir, filename)
         
         # 修正多音字发音问题
-        fixed_text = fix_pronunciation(text)
-        
-        # 调用 Edge TTS
-        communicate = edge_tts.Communicate(fixed_text, voice)
-        await communicate.save(output_file)
-        print(f"✅ 已生成: {filename}")
+        fixed_text = fix_pronunciation(text, pronunciation_file)
+
+        filenames.append(filename)
+        tasks.append(_synthesize_clip(fixed_text, voice, output_file, semaphore, retries, backoff))
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    failed = []
+    for filename, result in zip(filenames, results):
+        if isinstance(result, Exception):
+            print(f"❌ 生成失败: {filename} - {result}")
+            failed.append(filename)
+        else:
+            print(f"✅ 已生成: {filename}")
+
+    if failed:
+        raise RuntimeError(f"语音生成失败：{failed}")
         
     print("\n🎉 所有语音生成完毕！")
 
 
-def gen_voice_clips_from_json(script_path, output_dir, voice="zh-CN-YunxiNeural"):
+# ============================================================================
+# 内容寻址的语音片段缓存
+# ============================================================================
+# 片段以 hash(修正后的文本, 音色, 引擎, 发音表版本) 为键存放在共享缓存目录，
+# 跨 lesson、跨系列复用；lesson 的 voice/ 目录只是指向缓存的硬链接（或副本）。
+# voice/.clips.json 记录每个片段当前对应的键，只有键变化的片段才会重新合成。
+# ============================================================================
+TTS_ENGINE = "edge-tts"
+CLIP_MANIFEST_NAME = ".clips.json"
+
+
+def clip_cache_key(text, voice, engine=TTS_ENGINE, pronunciation_file=None):
+    """计算语音片段的内容寻址键"""
+    payload = json.dumps(
+        [
+            fix_pronunciation(text, pronunciation_file),
+            voice,
+            engine,
+            pronunciation_table_version(pronunciation_file),
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _load_clip_manifest(output_dir):
+    manifest_path = os.path.join(output_dir, CLIP_MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_clip_manifest(output_dir, manifest):
+    # 并行渲染片段时多个 manim 进程会同时同步同一个 voice/ 目录，临时文件按进程区分
+    manifest_path = os.path.join(output_dir, CLIP_MANIFEST_NAME)
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _link_or_copy(src, dst):
+    """用硬链接把缓存片段放到 dst（跨设备时退回复制），原子替换已有文件"""
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+async def sync_voice_clips(
+    scripts_dict,
+    output_dir,
+    voice="zh-CN-YunxiNeural",
+    concurrency=DEFAULT_TTS_CONCURRENCY,
+    force=False,
+    cache_dir=None,
+    pronunciation_file=None,
+):
+    """
+    增量同步 lesson 的语音片段：只合成内容变化的片段，其余从缓存链接
+
+    Args:
+        scripts_dict (dict): { "filename_key": "text_content" }
+        output_dir (str): lesson 的 voice 目录
+        voice (str): Edge TTS 语音模型
+        concurrency (int): 最大并发合成数
+        force (bool): 忽略缓存，全部重新合成（并刷新缓存）
+        cache_dir (str): 片段缓存目录，默认 `.cache/tts/edge-tts`
+        pronunciation_file (str): 可选的系列发音修正表文件
+
+    Returns:
+        dict: {"reused": [...], "linked": [...], "synthesized": [...]}
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache_dir = cache_dir or get_cache_dir("tts", TTS_ENGINE)
+    manifest = _load_clip_manifest(output_dir)
+    saved_manifest = dict(manifest)
+    durations = read_sidecar_entries(output_dir)
+
+    summary = {"reused": [], "linked": [], "synthesized": []}
+    stale = {}
+    for key, text in scripts_dict.items():
+        filename = key if key.endswith(".mp3") else f"{key}.mp3"
+        output_file = os.path.join(output_dir, filename)
+        cache_key = clip_cache_key(text, voice, pronunciation_file=pronunciation_file)
+
+        if not force and os.path.exists(output_file):
+            if manifest.get(filename) == cache_key:
+                summary["reused"].append(filename)
+                continue
+            if filename not in manifest and matches_sidecar(output_file, durations):
+                # 旧版本生成的片段没有清单记录：时长 sidecar 证明它就是上次渲染用的那个文件，
+                # 视为与当前文本一致，沿用而不重新合成；没有 sidecar 记录或已被改动的照常重新合成
+                print(f"🎤 沿用无清单记录的旧片段: {filename}")
+                manifest[filename] = cache_key
+                summary["reused"].append(filename)
+                continue
+        stale[filename] = (cache_key, text)
+
+    to_synthesize = {}
+    for filename, (cache_key, text) in stale.items():
+        if force or not os.path.exists(os.path.join(cache_dir, f"{cache_key}.mp3")):
+            to_synthesize[cache_key] = text
+            summary["synthesized"].append(filename)
+        else:
+            summary["linked"].append(filename)
+
+    if to_synthesize:
+        await generate_voice_for_scripts(
+            to_synthesize, cache_dir, voice,
+            concurrency=concurrency, pronunciation_file=pronunciation_file,
+        )
+
+    for filename, (cache_key, _) in stale.items():
+        _link_or_copy(os.path.join(cache_dir, f"{cache_key}.mp3"), os.path.join(output_dir, filename))
+        manifest[filename] = cache_key
+
+    if manifest != saved_manifest:
+        _save_clip_manifest(output_dir, manifest)
+    print(
+        f"🎤 语音片段：沿用 {len(summary['reused'])}，缓存命中 {len(summary['linked'])}，"
+        f"新合成 {len(summary['synthesized'])}"
+    )
+    return summary
+
+
+def gen_voice_clips_from_json(
+    script_path,
+    output_dir,
+    voice="zh-CN-YunxiNeural",
+    concurrency=DEFAULT_TTS_CONCURRENCY,
+    force=False,
+    pronunciation_file=None,
+):
     """
     从 JSON 脚本生成语音的入口函数
+
+    只有 voiceover_script（或音色、发音表）变化的场景会重新合成，
+    其余片段沿用现有文件或从共享缓存链接。
     
     Args:
         script_path (str): JSON 脚本文件路径
@@ -303,6 +522,9 @@ def gen_voice_clips_from_json(script_path, output_dir, voice="zh-CN-YunxiNeural"
                     - zh-CN-XiaoxiaoNeural: 年轻女性，活泼甜美，适合儿童教育 ⭐
                     - zh-CN-YunxiNeural: 年轻男性，清晰自然，适合知识科普 ⭐
                     更多选项请参考文件顶部的注释或运行 print_voice_options()
+        concurrency (int): 最大并发合成数
+        force (bool): 忽略缓存，全部重新合成
+        pronunciation_file (str): 可选的系列发音修正表文件（叠加在 PRONUNCIATION_FIXES 之上）
     """
     print(f"📄 解析脚本: {script_path}")
     scripts = parse_json_script(script_path)
@@ -311,5 +533,7 @@ def gen_voice_clips_from_json(script_path, output_dir, voice="zh-CN-YunxiNeural"
         print("⚠️ 未找到任何口播内容，请检查 JSON 格式")
         return
         
-    asyncio.run(generate_voice_for_scripts(scripts, output_dir, voice))
-
+    asyncio.run(sync_voice_clips(
+        scripts, output_dir, voice,
+        concurrency=concurrency, force=force, pronunciation_file=pronunciation_file,
+    ))
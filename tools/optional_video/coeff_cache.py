@@ -0,0 +1,135 @@
+"""
+SadTalker 3DMM 提取结果的内容寻址缓存
+
+主讲人照片和参考视频几乎每课都一样，但每个片段都要重新做一遍
+"3DMM Extraction for source image"（以及参考视频的姿态 / 眨眼提取）。
+这里按 (文件 sha256, 预处理模式, 输出尺寸, 是否源图片) 把 CropAndExtract.generate 的结果缓存起来：
+
+    .cache/sadtalker_3dmm/{key}/
+        {stem}.mat          3DMM 系数
+        {stem}.png          裁剪后的人脸图
+        crop_info.pkl       裁剪信息（原图尺寸、裁剪框、四边形）
+
+命中时直接返回缓存目录里的路径（下游只读取这些文件），提取阶段变成一次查表。
+文件摘要按 (路径, 大小, mtime) 在进程内复用，常驻进程里同一张照片只读一次。
+
+SadTalker 进程里不能导入本项目的 src 包（同名冲突），缓存目录约定与 src/utils/cache_dir.py 保持一致。
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+
+CACHE_VERSION = 1
+CROP_INFO_NAME = "crop_info.pkl"
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+
+
+def default_cache_dir():
+    """与 src/utils/cache_dir.py 相同：YYY_CACHE_DIR 或项目根目录的 .cache/"""
+    root = os.getenv("YYY_CACHE_DIR") or os.path.join(PROJECT_ROOT, ".cache")
+    return os.path.join(os.path.abspath(root), "sadtalker_3dmm")
+
+
+class CoeffCache:
+    """
+    Args:
+        cache_dir: 缓存目录（默认 .cache/sadtalker_3dmm/）
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self._digests = {}  # 绝对路径 -> (size, mtime_ns, sha256)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def file_digest(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            memo = self._digests.get(path)
+        if memo and memo[:2] == (st.st_size, st.st_mtime_ns):
+            return memo[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._digests[path] = (st.st_size, st.st_mtime_ns, digest)
+        return digest
+
+    def key(self, path, preprocess, source_image_flag, pic_size):
+        payload = json.dumps({
+            "sha256": self.file_digest(path), "preprocess": preprocess,
+            "source_image": bool(source_image_flag), "pic_size": pic_size, "version": CACHE_VERSION,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def lookup(self, key):
+        """命中时返回 (coeff_path, crop_pic_path, crop_info)，否则返回 None"""
+        entry_dir = os.path.join(self.cache_dir, key)
+        manifest = os.path.join(entry_dir, "entry.json")
+        try:
+            with open(manifest, encoding="utf-8") as f:
+                names = json.load(f)
+            with open(os.path.join(entry_dir, CROP_INFO_NAME), "rb") as f:
+                crop_info = pickle.load(f)
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+            return None
+        coeff_path = os.path.join(entry_dir, names["coeff"])
+        crop_pic_path = os.path.join(entry_dir, names["crop_pic"]) if names.get("crop_pic") else None
+        if not os.path.exists(coeff_path) or (crop_pic_path and not os.path.exists(crop_pic_path)):
+            return None
+        return coeff_path, crop_pic_path, crop_info
+
+    def store(self, key, coeff_path, crop_pic_path, crop_info):
+        """把一次提取结果复制进缓存（整个目录原子落盘）；返回缓存里的结果"""
+        entry_dir = os.path.join(self.cache_dir, key)
+        tmp_dir = f"{entry_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        try:
+            names = {"coeff": os.path.basename(coeff_path), "crop_pic": None}
+            shutil.copy2(coeff_path, os.path.join(tmp_dir, names["coeff"]))
+            if crop_pic_path and os.path.exists(crop_pic_path):
+                names["crop_pic"] = os.path.basename(crop_pic_path)
+                shutil.copy2(crop_pic_path, os.path.join(tmp_dir, names["crop_pic"]))
+            with open(os.path.join(tmp_dir, CROP_INFO_NAME), "wb") as f:
+                pickle.dump(crop_info, f)
+            with open(os.path.join(tmp_dir, "entry.json"), "w", encoding="utf-8") as f:
+                json.dump(names, f)
+            # 损坏的旧缓存项（文件缺失等）先删掉再替换
+            if os.path.isdir(entry_dir) and self.lookup(key) is None:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            try:
+                os.replace(tmp_dir, entry_dir)
+            except OSError:
+                # 其他进程已经写入了同一个键
+                pass
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return self.lookup(key) or (coeff_path, crop_pic_path, crop_info)
+
+    def extract(self, generate, path, save_dir, preprocess, source_image_flag=False, pic_size=None):
+        """
+        带缓存的 CropAndExtract.generate
+
+        Returns:
+            (coeff_path, crop_pic_path, crop_info, hit)
+        """
+        kwargs = {"source_image_flag": source_image_flag}
+        if pic_size is not None:
+            kwargs["pic_size"] = pic_size
+        key = self.key(path, preprocess, source_image_flag, pic_size)
+        cached = self.lookup(key)
+        if cached is not None:
+            self.hits += 1
+            return (*cached, True)
+        self.misses += 1
+        coeff_path, crop_pic_path, crop_info = generate(path, save_dir, preprocess, **kwargs)
+        if coeff_path is None:
+            return None, None, None, False
+        return (*self.store(key, coeff_path, crop_pic_path, crop_info), False)
@@ -0,0 +1,269 @@
+"""
+说话头像视频的分块并行面部增强（后处理）
+
+SadTalker 的 --enhancer gfpgan 在同一个进程里逐帧调用 GFPGAN：25fps 的 60 秒片段就是 1500 次串行增强。
+这里改为在生成之后单独做一遍：
+
+    ffmpeg 解码原始视频（bgr24 原始帧，经管道）
+      → 按 chunk_size 帧分块，交给 workers 个进程（spawn，各自加载一份增强模型，torch 线程数受限）
+      → 按原顺序取回结果，经同一条管道交给一个 ffmpeg 编码，并直接带上原视频的音轨
+
+与上一个送去增强的帧相比没有可见变化的帧不送去增强，直接复用上一帧的增强结果（静音、still 模式下很常见）。
+SadTalker 的输出已经过一次 H.264 有损编码，静止画面解码出来也不会逐字节相同，所以按 16×16 小块比较
+平均绝对差：任一小块超过 tolerance（0–255 灰度）就算变化。按小块而不是整帧平均，嘴部这样的小区域
+变化不会被大片静止背景稀释；每次都与上一个增强过的帧比较，缓慢漂移累积超过阈值后也会重新增强。
+tolerance=0（或未安装 numpy）时退回逐字节比较。
+同时在途的分块数受 window 限制，内存里只有有限几块原始帧和结果。
+
+增强模型由 "模块:函数" 工厂创建（默认 gfpgan_enhancer，与 SadTalker 相同的 GFPGANv1.4、2 倍放大），
+工厂返回 enhance(frame_bytes, width, height) -> (bytes, out_width, out_height)，测试时可换成桩函数。
+"""
+import importlib
+import json
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+SADTALKER_PATH = Path(__file__).resolve().parent.parent.parent / "external" / "SadTalker"
+GFPGAN_URL = "https://github.com/TencentARC/GFPGAN/releases/download/v1.3.0/GFPGANv1.4.pth"
+DEFAULT_ENHANCER = f"{Path(__file__).stem}:gfpgan_enhancer"
+DEFAULT_CHUNK_SIZE = 16
+DEFAULT_SKIP_TOLERANCE = 2.0
+SKIP_TILE = 16
+
+
+def gfpgan_enhancer(threads=None, upscale=2, model_path=None):
+    """GFPGANv1.4，参数与 SadTalker 的 face_enhancer 一致（clean 架构，2 倍放大，贴回整帧）"""
+    import numpy as np
+    import torch
+    from gfpgan import GFPGANer
+
+    if threads:
+        torch.set_num_threads(threads)
+    local_weights = SADTALKER_PATH / "gfpgan" / "weights" / "GFPGANv1.4.pth"
+    model_path = model_path or (str(local_weights) if local_weights.exists() else GFPGAN_URL)
+    restorer = GFPGANer(model_path=model_path, upscale=upscale, arch="clean", channel_multiplier=2, bg_upsampler=None)
+
+    def enhance(frame, width, height):
+        image = np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 3)
+        _, _, restored = restorer.enhance(image, has_aligned=False, only_center_face=False, paste_back=True)
+        restored = np.ascontiguousarray(restored, dtype=np.uint8)
+        return restored.tobytes(), restored.shape[1], restored.shape[0]
+
+    return enhance
+
+
+def load_enhancer_factory(spec):
+    """"模块:函数" → 函数"""
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def frame_changed(frame, reference, width, height, tolerance=DEFAULT_SKIP_TOLERANCE):
+    """
+    frame 与 reference（bgr24，width × height）相比是否有可见变化
+
+    任一 SKIP_TILE × SKIP_TILE 小块的平均绝对差超过 tolerance 即为变化（画面小于一个小块时按整帧算）；
+    tolerance <= 0 或没有 numpy 时按字节比较。
+    """
+    if reference is None:
+        return True
+    if tolerance <= 0:
+        return frame != reference
+    try:
+        import numpy as np
+    except ImportError:
+        return frame != reference
+    diff = np.abs(
+        np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 3).astype(np.int16)
+        - np.frombuffer(reference, dtype=np.uint8).reshape(height, width, 3)
+    )
+    rows, cols = height // SKIP_TILE, width // SKIP_TILE
+    if not rows or not cols:
+        return float(diff.mean()) > tolerance
+    tiles = diff[:rows * SKIP_TILE, :cols * SKIP_TILE].reshape(rows, SKIP_TILE, cols, SKIP_TILE, 3)
+    return float(tiles.mean(axis=(1, 3, 4)).max()) > tolerance
+
+
+def plan_chunks(frames, chunk_size=DEFAULT_CHUNK_SIZE, width=0, height=0, tolerance=0):
+    """
+    把原始帧流切成块；与上一个送去增强的帧相比没有变化的帧记为 None（复用上一帧的增强结果）
+
+    Args:
+        tolerance: 见 frame_changed；默认 0，只跳过逐字节相同的帧
+
+    Yields:
+        list: 每块 chunk_size 个条目，条目为帧字节或 None（最后一块可能不足）
+    """
+    chunk = []
+    reference = None
+    for frame in frames:
+        if frame_changed(frame, reference, width, height, tolerance):
+            chunk.append(frame)
+            reference = frame
+        else:
+            chunk.append(None)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# worker 进程内的增强函数（由 _init_worker 创建）
+_enhance = None
+
+
+def _init_worker(enhancer, threads):
+    global _enhance
+    _enhance = load_enhancer_factory(enhancer)(threads=threads)
+
+
+def _enhance_chunk(chunk, width, height):
+    """返回与 chunk 等长的列表：(bytes, out_width, out_height) 或 None（重复帧）"""
+    return [None if frame is None else _enhance(frame, width, height) for frame in chunk]
+
+
+def enhance_frames(frames, width, height, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, enhancer=DEFAULT_ENHANCER,
+                   threads=None, window=None, stats=None, tolerance=DEFAULT_SKIP_TOLERANCE):
+    """
+    按原顺序产出增强后的帧 (bytes, out_width, out_height)
+
+    Args:
+        frames: 原始帧字节的可迭代对象（bgr24，width × height）
+        workers: 进程数；<= 1 时在当前进程里逐块增强
+        threads: 每个 worker 的 torch 线程数（默认按 CPU 核数均分）
+        window: 同时在途的最大分块数（默认 workers × 2）
+        stats: 传入 dict 时填写 {"frames", "skipped"}
+        tolerance: 跳过未变化帧的阈值（见 frame_changed），0 时只跳过逐字节相同的帧
+    """
+    stats = stats if stats is not None else {}
+    stats.update(frames=0, skipped=0)
+    chunks = plan_chunks(frames, chunk_size, width, height, tolerance)
+    previous = None
+
+    def expand(results):
+        nonlocal previous
+        for result in results:
+            stats["frames"] += 1
+            if result is None:
+                stats["skipped"] += 1
+                if previous is None:
+                    raise RuntimeError("第一帧不能是重复帧")
+                result = previous
+            previous = result
+            yield result
+
+    if workers <= 1:
+        _init_worker(enhancer, threads)
+        for chunk in chunks:
+            yield from expand(_enhance_chunk(chunk, width, height))
+        return
+
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    window = window or workers * 2
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker, initargs=(enhancer, threads),
+    ) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_enhance_chunk, chunk, width, height))
+            if len(pending) >= window:
+                yield from expand(pending.popleft().result())
+        while pending:
+            yield from expand(pending.popleft().result())
+
+
+def probe_video(path):
+    """ffprobe 读取 (宽, 高, 帧率字符串)"""
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,r_frame_rate", "-of", "json", str(path),
+    ], capture_output=True, text=True, check=True)
+    stream = json.loads(result.stdout)["streams"][0]
+    return int(stream["width"]), int(stream["height"]), stream["r_frame_rate"]
+
+
+def read_frames(path, width, height):
+    """
+    ffmpeg 把视频解码成 bgr24 原始帧，逐帧产出
+
+    解码出错（-xerror 让 ffmpeg 遇错即退出）或末尾只剩半帧时抛出 RuntimeError，
+    而不是把截断的帧流当成完整视频交给编码器。
+    """
+    frame_size = width * height * 3
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            ["ffmpeg", "-v", "error", "-xerror", "-i", str(path), "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"],
+            stdout=subprocess.PIPE, stderr=errors, bufsize=frame_size,
+        )
+        try:
+            while True:
+                frame = process.stdout.read(frame_size)
+                if len(frame) < frame_size:
+                    break
+                yield frame
+            if process.wait() != 0 or frame:
+                errors.seek(0)
+                detail = errors.read().decode("utf-8", "replace").strip()
+                raise RuntimeError(f"ffmpeg 解码失败（返回码 {process.returncode}）: {path}\n{detail}".rstrip())
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+
+def enhance_video(input_path, output_path, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, enhancer=DEFAULT_ENHANCER,
+                  threads=None, tolerance=DEFAULT_SKIP_TOLERANCE):
+    """
+    对说话头像视频做分块并行面部增强，按原顺序重新编码（H.264 + 原音轨）
+
+    Args:
+        workers: 增强进程数（默认 CPU 核数的一半，至少 1）
+        tolerance: 跳过未变化帧的阈值（见 frame_changed）
+
+    Returns:
+        dict: {"frames", "skipped", "seconds", "fps"}
+    """
+    start = time.perf_counter()
+    workers = workers or max(1, (os.cpu_count() or 2) // 2)
+    width, height, rate = probe_video(input_path)
+    stats = {}
+    encoder = None
+    tmp_path = f"{output_path}.{os.getpid()}.tmp.mp4"
+    try:
+        for frame, out_width, out_height in enhance_frames(
+            read_frames(input_path, width, height), width, height,
+            workers=workers, chunk_size=chunk_size, enhancer=enhancer, threads=threads, stats=stats,
+            tolerance=tolerance,
+        ):
+            if encoder is None:
+                # 输出尺寸取第一帧增强结果（GFPGAN 默认放大 2 倍）
+                encoder = subprocess.Popen([
+                    "ffmpeg", "-y", "-v", "error",
+                    "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{out_width}x{out_height}", "-r", rate, "-i", "pipe:0",
+                    "-i", str(input_path), "-map", "0:v", "-map", "1:a?",
+                    "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "copy", "-shortest", tmp_path,
+                ], stdin=subprocess.PIPE)
+            encoder.stdin.write(frame)
+        if encoder is None:
+            raise RuntimeError(f"视频没有可解码的帧: {input_path}")
+        encoder.stdin.close()
+        if encoder.wait() != 0:
+            raise RuntimeError(f"ffmpeg 编码失败（返回码 {encoder.returncode}）")
+        os.replace(tmp_path, output_path)
+    finally:
+        if encoder is not None and encoder.poll() is None:
+            encoder.kill()
+            encoder.wait()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    seconds = time.perf_counter() - start
+    return {**stats, "seconds": round(seconds, 3), "fps": round(stats["frames"] / seconds, 2) if seconds else None}
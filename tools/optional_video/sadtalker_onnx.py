@@ -0,0 +1,323 @@
+"""
+SadTalker 的 ONNX Runtime 推理后端（CPU）
+
+渲染节点没有 GPU，PyTorch 逐帧跑 face renderer 非常慢。这里把三个推理阶段的子网络导出成 ONNX，
+用 ONNX Runtime 执行（开启全部图优化，intra-op 线程数可配置）：
+
+    audio2exp.onnx            表情网络 netG(mel, ref, ratio) → 表情系数
+    audio2pose_encoder.onnx   姿态分支音频编码器的卷积栈（逐帧，帧数可变）
+    audio2pose_decoder.onnx   姿态 CVAE 解码器 (z, class, ref, audio_emb) → 姿态增量
+    face_render_source.onnx   源图关键点 + 源姿态变换（每个片段一次）
+    face_render_step.onnx     mapping → 关键点变换 → 生成器（每帧一次）
+
+数据准备、姿态平滑、缩放 / 贴回原图 / 合成音频 / 增强等前后处理仍走 SadTalker 原来的代码，
+只把这几个子网络换成 OnnxModule。首次使用时从已加载的 torch 权重导出到
+.cache/sadtalker_onnx/{尺寸}_{权重摘要}/，之后直接加载导出结果。
+
+SadTalkerWorker(backend="onnx") 通过模型工厂 load_sadtalker_onnx_models 使用本后端；
+线程数取环境变量 SADTALKER_ONNX_THREADS（默认 CPU 核数）。
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from coeff_cache import PROJECT_ROOT
+from sadtalker_worker import ONNX_THREADS_ENV, SADTALKER_PATH, load_sadtalker_models
+
+# face renderer 的 3D 形变用 5 维 grid_sample，需要 GridSample-20
+ONNX_OPSET = 20
+EXPORT_VERSION = 2
+GRAPH_NAMES = (
+    "audio2exp", "audio2pose_encoder", "audio2pose_decoder", "face_render_source", "face_render_step",
+)
+
+
+def default_onnx_dir():
+    """与 src/utils/cache_dir.py 相同：YYY_CACHE_DIR 或项目根目录的 .cache/"""
+    root = os.getenv("YYY_CACHE_DIR") or os.path.join(PROJECT_ROOT, ".cache")
+    return os.path.join(os.path.abspath(root), "sadtalker_onnx")
+
+
+def onnx_threads(threads=None):
+    """参数 > 环境变量 SADTALKER_ONNX_THREADS > CPU 核数"""
+    threads = threads or os.getenv(ONNX_THREADS_ENV)
+    return max(1, int(threads)) if threads else (os.cpu_count() or 1)
+
+
+def export_key(checkpoint_dir, size, preprocess):
+    """导出目录名：尺寸 + 权重文件（名字 / 大小 / mtime）+ 导出格式版本的摘要；换了权重就重新导出"""
+    files = sorted(
+        (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+        for entry in os.scandir(checkpoint_dir) if entry.is_file()
+    ) if os.path.isdir(checkpoint_dir) else []
+    payload = json.dumps({
+        "files": files, "size": size, "preprocess": preprocess,
+        "opset": ONNX_OPSET, "version": EXPORT_VERSION,
+    }, sort_keys=True)
+    return f"{size}_{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]}"
+
+
+def session_options(threads):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    return options
+
+
+class OnnxModule:
+    """
+    ONNX Runtime 会话的包装：torch 张量进、torch 张量出，可以直接替换 SadTalker 里的 torch 子网络
+
+    Args:
+        path: .onnx 文件
+        threads: intra-op 线程数
+    """
+
+    def __init__(self, path, threads):
+        import onnxruntime as ort
+
+        self.path = path
+        self.session = ort.InferenceSession(
+            path, sess_options=session_options(threads), providers=["CPUExecutionProvider"],
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.output_names = [node.name for node in self.session.get_outputs()]
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __call__(self, *tensors):
+        import torch
+
+        start = time.perf_counter()
+        feeds = {name: tensor.detach().cpu().numpy() for name, tensor in zip(self.input_names, tensors)}
+        outputs = [torch.from_numpy(value) for value in self.session.run(self.output_names, feeds)]
+        self.calls += 1
+        self.seconds += time.perf_counter() - start
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+
+class OnnxAudioEncoder:
+    """
+    替换 Audio2Pose.audio_encoder：forward 里按帧数循环拼接，导出时会按示例输入的帧数展开，
+    所以 ONNX 图只包含逐帧的卷积栈（帧数在批维上可变），拼接和还原形状在这里用 torch 做
+    """
+
+    def __init__(self, conv):
+        self.conv = conv
+
+    def __call__(self, audio_sequences):
+        import torch
+
+        batch = audio_sequences.size(0)
+        mels = torch.cat([audio_sequences[:, i] for i in range(audio_sequences.size(1))], dim=0)
+        embedding = self.conv(mels)
+        # 与 AudioEncoder.forward 相同的 reshape
+        return embedding.reshape((batch, -1, embedding.shape[1], 1, 1)).squeeze(-1).squeeze(-1)
+
+
+class OnnxPoseCVAE:
+    """替换 Audio2Pose.netG：test(batch) 与 CVAE.test 相同，只跑解码器"""
+
+    def __init__(self, decoder):
+        self.decoder = decoder
+
+    def test(self, batch):
+        batch["pose_motion_pred"] = self.decoder(batch["z"], batch["class"], batch["ref"], batch["audio_emb"])
+        return batch
+
+
+class OnnxFaceRenderer:
+    """
+    替换 src.facerender.animate 里的 make_animation（参数相同，传入的 torch 网络不再使用）
+
+    自定义头部角度序列（yaw / pitch / roll）只在 torch 路径支持，遇到时交回原函数。
+    """
+
+    def __init__(self, source, step, torch_make_animation):
+        self.source = source
+        self.step = step
+        self.torch_make_animation = torch_make_animation
+
+    def __call__(self, source_image, source_semantics, target_semantics, generator, kp_detector, he_estimator,
+                 mapping, yaw_c_seq=None, pitch_c_seq=None, roll_c_seq=None, use_exp=True, use_half=False):
+        import torch
+        from tqdm import tqdm
+
+        if yaw_c_seq is not None or pitch_c_seq is not None or roll_c_seq is not None:
+            return self.torch_make_animation(
+                source_image, source_semantics, target_semantics, generator, kp_detector, he_estimator, mapping,
+                yaw_c_seq, pitch_c_seq, roll_c_seq, use_exp=use_exp, use_half=use_half,
+            )
+        kp_canonical, kp_source = self.source(source_image, source_semantics)
+        predictions = [
+            self.step(source_image, kp_canonical, kp_source, target_semantics[:, frame_idx])
+            for frame_idx in tqdm(range(target_semantics.shape[1]), "Face Renderer:")
+        ]
+        return torch.stack(predictions, dim=1)
+
+
+def _export_modules():
+    """导出用的 torch 包装模块（只能在 SadTalker 的 src 包可导入的进程里调用）"""
+    import torch
+    from src.facerender.modules.make_animation import keypoint_transformation
+
+    class PoseDecoder(torch.nn.Module):
+        def __init__(self, decoder):
+            super().__init__()
+            self.decoder = decoder
+
+        def forward(self, z, class_id, ref, audio_emb):
+            batch = {"z": z, "class": class_id, "ref": ref, "audio_emb": audio_emb}
+            return self.decoder(batch)["pose_motion_pred"]
+
+    class FaceRenderSource(torch.nn.Module):
+        def __init__(self, kp_extractor, mapping):
+            super().__init__()
+            self.kp_extractor = kp_extractor
+            self.mapping = mapping
+
+        def forward(self, source_image, source_semantics):
+            kp_canonical = self.kp_extractor(source_image)
+            kp_source = keypoint_transformation(kp_canonical, self.mapping(source_semantics))
+            return kp_canonical["value"], kp_source["value"]
+
+    class FaceRenderStep(torch.nn.Module):
+        def __init__(self, generator, mapping):
+            super().__init__()
+            self.generator = generator
+            self.mapping = mapping
+
+        def forward(self, source_image, kp_canonical, kp_source, target_semantics):
+            kp_driving = keypoint_transformation({"value": kp_canonical}, self.mapping(target_semantics))
+            out = self.generator(source_image, kp_source={"value": kp_source}, kp_driving=kp_driving)
+            return out["prediction"]
+
+    return PoseDecoder, FaceRenderSource, FaceRenderStep
+
+
+def _export(module, args, path, input_names, output_names, dynamic_axes):
+    """原子导出一个 ONNX 图（先写临时文件再改名）"""
+    import torch
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    module.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            module, args, tmp_path, input_names=input_names, output_names=output_names,
+            dynamic_axes=dynamic_axes, opset_version=ONNX_OPSET, do_constant_folding=True, dynamo=False,
+        )
+    os.replace(tmp_path, path)
+
+
+def export_sadtalker_onnx(models, export_dir, size, log=print):
+    """
+    把已加载的 torch 子网络导出到 export_dir（已存在的图跳过）
+
+    示例输入的形状与 SadTalker 推理时一致：每 10 帧一段的 mel、CVAE 的 seq_len 段、70 维 × 27 帧的语义窗口。
+    """
+    import torch
+
+    os.makedirs(export_dir, exist_ok=True)
+    missing = [name for name in GRAPH_NAMES if not os.path.exists(os.path.join(export_dir, f"{name}.onnx"))]
+    if not missing:
+        return
+    log(f"📦 导出 ONNX 模型: {', '.join(missing)} → {export_dir}")
+    PoseDecoder, FaceRenderSource, FaceRenderStep = _export_modules()
+    exp_model = models.audio_to_coeff.audio2exp_model
+    pose_model = models.audio_to_coeff.audio2pose_model
+    animate = models.animate
+    seq_len, latent_dim = pose_model.seq_len, pose_model.latent_dim
+
+    def path_of(name):
+        return os.path.join(export_dir, f"{name}.onnx")
+
+    frames = {0: "frames"}
+    if "audio2exp" in missing:
+        _export(
+            exp_model.netG, (torch.randn(10, 1, 80, 16), torch.randn(1, 10, 64), torch.rand(1, 10, 1)),
+            path_of("audio2exp"), ["mel", "ref", "ratio"], ["exp"],
+            {"mel": frames, "ref": {1: "frames"}, "ratio": {1: "frames"}, "exp": {1: "frames"}},
+        )
+    if "audio2pose_encoder" in missing:
+        _export(
+            pose_model.audio_encoder.audio_encoder, (torch.randn(seq_len, 1, 80, 16),),
+            path_of("audio2pose_encoder"), ["mel"], ["audio_emb"], {"mel": frames, "audio_emb": frames},
+        )
+    if "audio2pose_decoder" in missing:
+        _export(
+            PoseDecoder(pose_model.netG.decoder),
+            (torch.randn(1, latent_dim), torch.zeros(1, dtype=torch.long), torch.randn(1, 6), torch.randn(1, seq_len, 512)),
+            path_of("audio2pose_decoder"), ["z", "class_id", "ref", "audio_emb"], ["pose_motion"], None,
+        )
+
+    source_image = torch.rand(1, 3, size, size)
+    semantics = torch.randn(1, 70, 27)
+    source = FaceRenderSource(animate.kp_extractor, animate.mapping).eval()
+    batch = {0: "batch"}
+    if "face_render_source" in missing:
+        _export(
+            source, (source_image, semantics), path_of("face_render_source"),
+            ["source_image", "source_semantics"], ["kp_canonical", "kp_source"],
+            {"source_image": batch, "source_semantics": batch, "kp_canonical": batch, "kp_source": batch},
+        )
+    if "face_render_step" in missing:
+        with torch.no_grad():
+            kp_canonical, kp_source = source(source_image, semantics)
+        _export(
+            FaceRenderStep(animate.generator, animate.mapping), (source_image, kp_canonical, kp_source, semantics),
+            path_of("face_render_step"), ["source_image", "kp_canonical", "kp_source", "target_semantics"],
+            ["prediction"],
+            {name: batch for name in ("source_image", "kp_canonical", "kp_source", "target_semantics", "prediction")},
+        )
+
+
+def _swap(module, name, replacement):
+    """把 nn.Module 的子网络换成普通对象（nn.Module 不允许直接给子模块赋非 Module 值）"""
+    delattr(module, name)
+    setattr(module, name, replacement)
+
+
+def install_onnx_backend(models, export_dir, threads):
+    """把 SadTalkerModels 里的 torch 子网络换成 ONNX Runtime 会话；返回 {图名: OnnxModule}"""
+    import src.facerender.animate as animate_module
+
+    sessions = {name: OnnxModule(os.path.join(export_dir, f"{name}.onnx"), threads) for name in GRAPH_NAMES}
+    _swap(models.audio_to_coeff.audio2exp_model, "netG", sessions["audio2exp"])
+    pose_model = models.audio_to_coeff.audio2pose_model
+    _swap(pose_model, "audio_encoder", OnnxAudioEncoder(sessions["audio2pose_encoder"]))
+    _swap(pose_model, "netG", OnnxPoseCVAE(sessions["audio2pose_decoder"]))
+    torch_make_animation = animate_module.make_animation
+    if isinstance(torch_make_animation, OnnxFaceRenderer):
+        torch_make_animation = torch_make_animation.torch_make_animation
+    animate_module.make_animation = OnnxFaceRenderer(
+        sessions["face_render_source"], sessions["face_render_step"], torch_make_animation,
+    )
+    return sessions
+
+
+def load_sadtalker_onnx_models(size=512, preprocess="full", device=None, sadtalker_path=None, export_dir=None):
+    """
+    SadTalkerWorker 的模型工厂：先按 torch 方式加载（数据准备和前后处理仍要用），
+    按需导出 ONNX，再把三个推理阶段换成 ONNX Runtime。整个进程固定在 CPU 上运行。
+    """
+    import torch
+
+    start = time.perf_counter()
+    threads = onnx_threads()
+    torch.set_num_threads(threads)
+    sadtalker_path = Path(sadtalker_path or SADTALKER_PATH)
+    models = load_sadtalker_models(size=size, preprocess=preprocess, device="cpu", sadtalker_path=sadtalker_path)
+    export_dir = export_dir or os.path.join(
+        default_onnx_dir(), export_key(str(sadtalker_path / "checkpoints"), size, preprocess),
+    )
+    export_sadtalker_onnx(models, export_dir, size, log=lambda message: print(message, flush=True))
+    install_onnx_backend(models, export_dir, threads)
+    print(f"⚙️ ONNX Runtime 后端就绪（intra-op 线程 {threads}）", flush=True)
+    models.load_seconds = time.perf_counter() - start
+    return models
@@ -0,0 +1,438 @@
+"""
+常驻 SadTalker 推理进程
+
+generate_talking_head 原先每个音频片段都启动一次 external/SadTalker/inference.py，
+每次都要重新初始化 torch、加载 safetensors 和 mapping 模型。这里改为：
+
+- SadTalkerPipeline：模型只加载一次，按 (图片, 音频) 任务依次执行
+  3DMM 提取 → audio2coeff → face render，并记录每个阶段的耗时；模型对象可替换（测试用桩模型）。
+  源图片和参考视频的 3DMM 提取结果走 coeff_cache.CoeffCache（跨任务、跨运行复用）
+- serve()：常驻进程的主循环，从 stdin 逐行读 JSON 任务，把结果以 PROTOCOL_PREFIX 开头的一行 JSON 写回 stdout
+  （进程启动后把 fd 1 改指 stderr，SadTalker 自己的 print、tqdm 的 \r 进度条都进 stderr；
+  原 stdout 只留给协议行，半行进度条不会把协议行拼坏）
+- SadTalkerWorker：客户端，启动一个常驻进程并逐个提交任务（batch_generate_talking_heads 默认使用）
+
+SadTalker 的代码以顶层包 `src` 组织，与本项目的 `src` 同名，不能在同一个解释器里导入，
+所以推理放在 cwd 为 external/SadTalker 的独立进程里，由客户端通过管道通信。
+
+Usage:
+    with SadTalkerWorker(size=512, preprocess="full") as worker:
+        for audio in audios:
+            worker.submit(TalkingHeadJob(image_path="avatar.png", audio_path=audio, output_path=...))
+"""
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from coeff_cache import CoeffCache
+
+PROTOCOL_PREFIX = "@@sadtalker-worker@@ "
+SADTALKER_PATH = Path(__file__).resolve().parent.parent.parent / "external" / "SadTalker"
+DEFAULT_MODELS = f"{Path(__file__).stem}:load_sadtalker_models"
+# 推理后端 → 模型工厂（onnx 见 sadtalker_onnx.py）
+BACKEND_MODELS = {"torch": DEFAULT_MODELS, "onnx": "sadtalker_onnx:load_sadtalker_onnx_models"}
+ONNX_THREADS_ENV = "SADTALKER_ONNX_THREADS"
+
+# 各阶段在日志里的中文名（与 talking_head 的阶段提示一致）
+STAGE_LABELS = {
+    "extract_source": "3DMM 提取（源图片）",
+    "extract_ref_eyeblink": "3DMM 提取（参考视频眨眼）",
+    "extract_ref_pose": "3DMM 提取（参考视频姿态）",
+    "audio_to_coeff": "音频到表情/姿态系数",
+    "face_render": "动画生成与编码",
+}
+
+
+@dataclass
+class TalkingHeadJob:
+    """一个说话头像任务（字段与 SadTalker inference.py 的参数对应）"""
+    image_path: str
+    audio_path: str
+    output_path: str
+    still: bool = False
+    pose_style: int = 0
+    ref_pose: Optional[str] = None
+    ref_eyeblink: Optional[str] = None
+    enhancer: Optional[str] = None
+    background_enhancer: Optional[str] = None
+    batch_size: int = 1
+    expression_scale: float = 1.0
+
+
+@dataclass
+class SadTalkerModels:
+    """
+    SadTalker 的三个模型和两个数据准备函数（与 inference.py 中的对象一一对应）
+
+    preprocess.generate(path, save_dir, preprocess, source_image_flag, pic_size) -> (coeff_path, crop_pic_path, crop_info)
+    audio_to_coeff.generate(batch, save_dir, pose_style, ref_pose_coeff_path) -> coeff_path
+    animate.generate(data, save_dir, pic_path, crop_info, enhancer=, background_enhancer=, preprocess=, img_size=) -> video_path
+    """
+    preprocess: object
+    audio_to_coeff: object
+    animate: object
+    get_data: Callable
+    get_facerender_data: Callable
+    device: str = "cpu"
+    load_seconds: float = 0.0
+
+
+def load_sadtalker_models(size=512, preprocess="full", device=None, old_version=False, sadtalker_path=None):
+    """在 SadTalker 目录下加载全部模型（只能在 sys.path 首位是 SadTalker 的进程里调用）"""
+    start = time.perf_counter()
+    sadtalker_path = Path(sadtalker_path or SADTALKER_PATH)
+    import torch
+    from src.facerender.animate import AnimateFromCoeff
+    from src.generate_batch import get_data
+    from src.generate_facerender_batch import get_facerender_data
+    from src.test_audio2coeff import Audio2Coeff
+    from src.utils.init_path import init_path
+    from src.utils.preprocess import CropAndExtract
+
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    paths = init_path(
+        str(sadtalker_path / "checkpoints"), str(sadtalker_path / "src" / "config"),
+        size, old_version, preprocess,
+    )
+    return SadTalkerModels(
+        preprocess=CropAndExtract(paths, device),
+        audio_to_coeff=Audio2Coeff(paths, device),
+        animate=AnimateFromCoeff(paths, device),
+        get_data=get_data,
+        get_facerender_data=get_facerender_data,
+        device=device,
+        load_seconds=time.perf_counter() - start,
+    )
+
+
+class SadTalkerPipeline:
+    """
+    模型常驻的推理流水线，等价于 inference.py 的 main()，但不重复加载模型
+
+    Args:
+        models: SadTalkerModels（测试时可用桩对象）
+        size: 模型输入尺寸（256 / 512，决定加载的模型，不能按任务切换）
+        preprocess: 预处理模式（同上）
+        log: 日志函数
+        coeff_cache: 3DMM 提取缓存；None 时每次都重新提取
+    """
+
+    def __init__(self, models: SadTalkerModels, size: int = 512, preprocess: str = "full", log=print,
+                 coeff_cache: Optional[CoeffCache] = None):
+        self.models = models
+        self.size = size
+        self.preprocess = preprocess
+        self.log = log
+        self.coeff_cache = coeff_cache
+        self.jobs_done = 0
+
+    def _stage(self, timings, name, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings[name] = round(time.perf_counter() - start, 3)
+        return result
+
+    def _extract(self, timings, cache_hits, stage, path, save_dir, source_image_flag, pic_size=None):
+        """CropAndExtract.generate，有缓存时先查缓存"""
+        start = time.perf_counter()
+        if self.coeff_cache is None:
+            kwargs = {"pic_size": pic_size} if pic_size is not None else {}
+            result = self.models.preprocess.generate(path, save_dir, self.preprocess, source_image_flag=source_image_flag, **kwargs)
+        else:
+            *result, hit = self.coeff_cache.extract(
+                self.models.preprocess.generate, path, save_dir, self.preprocess,
+                source_image_flag=source_image_flag, pic_size=pic_size,
+            )
+            if hit:
+                cache_hits.append(stage)
+        timings[stage] = round(time.perf_counter() - start, 3)
+        return result
+
+    def run(self, job: TalkingHeadJob) -> Dict:
+        """
+        执行一个任务，视频写到 job.output_path
+
+        Returns:
+            dict: {"output_path", "timings": {阶段: 秒}, "cache_hits": [命中缓存的提取阶段], "frames", "seconds"}
+        """
+        models = self.models
+        timings = {}
+        cache_hits = []
+        frames = None
+        start = time.perf_counter()
+        output_path = os.path.abspath(job.output_path)
+        output_dir = os.path.dirname(output_path)
+        os.makedirs(output_dir, exist_ok=True)
+        save_dir = os.path.join(output_dir, f".sadtalker_{os.getpid()}_{self.jobs_done}_{Path(output_path).stem}")
+        os.makedirs(save_dir, exist_ok=True)
+        try:
+            first_frame_dir = os.path.join(save_dir, "first_frame_dir")
+            os.makedirs(first_frame_dir, exist_ok=True)
+            self.log("3DMM Extraction for source image")
+            first_coeff_path, crop_pic_path, crop_info = self._extract(
+                timings, cache_hits, "extract_source", job.image_path, first_frame_dir,
+                source_image_flag=True, pic_size=self.size,
+            )
+            if first_coeff_path is None:
+                raise RuntimeError(f"无法从源图片提取 3DMM 系数: {job.image_path}")
+
+            ref_eyeblink_coeff_path = None
+            if job.ref_eyeblink:
+                self.log("3DMM Extraction for the reference video providing eye blinking")
+                ref_eyeblink_coeff_path = self._extract_reference(
+                    timings, cache_hits, "extract_ref_eyeblink", job.ref_eyeblink, save_dir)
+
+            ref_pose_coeff_path = None
+            if job.ref_pose:
+                if job.ref_pose == job.ref_eyeblink:
+                    ref_pose_coeff_path = ref_eyeblink_coeff_path
+                else:
+                    self.log("3DMM Extraction for the reference video providing pose")
+                    ref_pose_coeff_path = self._extract_reference(
+                        timings, cache_hits, "extract_ref_pose", job.ref_pose, save_dir)
+
+            self.log("audio2exp / audio2pose")
+            batch = models.get_data(first_coeff_path, job.audio_path, models.device, ref_eyeblink_coeff_path, still=job.still)
+            coeff_path = self._stage(
+                timings, "audio_to_coeff", models.audio_to_coeff.generate,
+                batch, save_dir, job.pose_style, ref_pose_coeff_path,
+            )
+
+            self.log("Face Renderer")
+            data = models.get_facerender_data(
+                coeff_path, crop_pic_path, first_coeff_path, job.audio_path, job.batch_size, None, None, None,
+                expression_scale=job.expression_scale, still_mode=job.still, preprocess=self.preprocess, size=self.size,
+            )
+            frames = data.get("frame_num") if isinstance(data, dict) else None
+            video_path = self._stage(
+                timings, "face_render", models.animate.generate,
+                data, save_dir, job.image_path, crop_info, enhancer=job.enhancer,
+                background_enhancer=job.background_enhancer, preprocess=self.preprocess, img_size=self.size,
+            )
+            shutil.move(video_path, output_path)
+            self.log(f"The generated video is named: {output_path}")
+        finally:
+            shutil.rmtree(save_dir, ignore_errors=True)
+        self.jobs_done += 1
+        return {
+            "output_path": output_path, "timings": timings, "cache_hits": cache_hits,
+            "frames": int(frames) if frames is not None else None, "seconds": round(time.perf_counter() - start, 3),
+        }
+
+    def _extract_reference(self, timings, cache_hits, stage, video_path, save_dir):
+        frame_dir = os.path.join(save_dir, Path(video_path).stem)
+        os.makedirs(frame_dir, exist_ok=True)
+        coeff_path, _, _ = self._extract(timings, cache_hits, stage, video_path, frame_dir, source_image_flag=False)
+        return coeff_path
+
+
+def load_models_factory(spec):
+    """"模块:函数" → 函数（默认 load_sadtalker_models，测试可换成桩模型工厂）"""
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _reply(stream, payload):
+    stream.write(PROTOCOL_PREFIX + json.dumps(payload, ensure_ascii=False) + "\n")
+    stream.flush()
+
+
+def serve(pipeline: SadTalkerPipeline, stdin=None, stdout=None):
+    """常驻主循环：每行一个 TalkingHeadJob JSON，空行或 EOF 退出"""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            break
+        try:
+            result = pipeline.run(TalkingHeadJob(**json.loads(line)))
+            _reply(stdout, {"ok": True, **result})
+        except Exception as e:  # 单个任务失败不影响后续任务
+            _reply(stdout, {"ok": False, "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()})
+
+
+class SadTalkerWorker:
+    """
+    常驻推理进程的客户端：启动时加载一次模型，之后逐个提交任务
+
+    Args:
+        size / preprocess: 传给模型加载（整个进程内固定）
+        device: "cuda" / "cpu"，默认自动选择
+        models: 模型工厂 "模块:函数"（测试时换成桩模型）；默认按 backend 选择
+        sadtalker_path: SadTalker 目录（进程的 cwd，并放在 sys.path 首位）
+        coeff_cache_dir: 3DMM 提取缓存目录（默认 .cache/sadtalker_3dmm/）；False 关闭缓存
+        on_log: 进程日志回调（默认原样打印；日志走 stderr，由后台线程逐行转发）
+        backend: "torch"（SadTalker 原生）或 "onnx"（ONNX Runtime，CPU）
+        threads: onnx 后端的 intra-op 线程数（默认 CPU 核数）
+    """
+
+    def __init__(self, size=512, preprocess="full", device=None, models=None,
+                 sadtalker_path=None, python=sys.executable, coeff_cache_dir=None, on_log=None,
+                 backend="torch", threads=None):
+        if backend not in BACKEND_MODELS:
+            raise ValueError(f"未知推理后端: {backend}（可选 {', '.join(BACKEND_MODELS)}）")
+        self.size = size
+        self.preprocess = preprocess
+        self.device = device
+        self.backend = backend
+        self.threads = threads
+        self.models = models or BACKEND_MODELS[backend]
+        self.sadtalker_path = Path(sadtalker_path or SADTALKER_PATH)
+        self.python = python
+        self.coeff_cache_dir = coeff_cache_dir
+        self.on_log = on_log or (lambda line: print(f"  {line}"))
+        self.process = None
+        self.load_seconds = None
+        self.pid = None
+        self._log_target = self.on_log
+        self._log_thread = None
+
+    def command(self):
+        cmd = [
+            self.python, str(Path(__file__).resolve()), "--serve",
+            "--sadtalker-dir", str(self.sadtalker_path),
+            "--size", str(self.size), "--preprocess", self.preprocess, "--models", self.models,
+        ]
+        if self.device:
+            cmd += ["--device", self.device]
+        if self.coeff_cache_dir is False:
+            cmd.append("--no-coeff-cache")
+        elif self.coeff_cache_dir:
+            cmd += ["--coeff-cache-dir", str(self.coeff_cache_dir)]
+        return cmd
+
+    def start(self):
+        if self.process is not None:
+            return self
+        env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+        # 工具目录放进 PYTHONPATH，桩模型工厂等可以按模块名导入
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(Path(__file__).resolve().parent), env.get("PYTHONPATH")]))
+        if self.threads:
+            env[ONNX_THREADS_ENV] = str(self.threads)
+        self.process = subprocess.Popen(
+            self.command(), cwd=str(self.sadtalker_path), env=env,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1,
+        )
+        # stderr 必须持续读走，否则日志塞满管道后进程会卡住；文本模式下 tqdm 的 \r 也按换行切分
+        self._log_thread = threading.Thread(target=self._pump_logs, args=(self.process.stderr,), daemon=True)
+        self._log_thread.start()
+        ready = self._read_reply()
+        if not ready.get("ok"):
+            self.close()
+            raise RuntimeError(f"SadTalker 常驻进程启动失败: {ready.get('error')}")
+        self.load_seconds = ready.get("load_seconds")
+        self.pid = ready.get("pid")
+        print(f"🧠 SadTalker 模型已加载（{self.backend}，{self.load_seconds:.1f}s，pid {self.pid}）")
+        return self
+
+    def _pump_logs(self, stream):
+        for line in stream:
+            if line.strip():
+                self._log_target(line.rstrip("\n"))
+
+    def _read_reply(self, on_log=None):
+        self._log_target = on_log or self.on_log
+        for line in self.process.stdout:
+            if line.startswith(PROTOCOL_PREFIX):
+                return json.loads(line[len(PROTOCOL_PREFIX):])
+            if line.strip():
+                self._log_target(line.rstrip("\n"))
+        code = self.process.wait()
+        self._log_thread.join(timeout=5)
+        return {"ok": False, "error": f"常驻进程已退出（返回码 {code}）"}
+
+    def submit(self, job: TalkingHeadJob, on_log=None) -> Dict:
+        """
+        提交一个任务并等待完成
+
+        Returns:
+            dict: {"ok", "output_path", "timings", "seconds"} 或 {"ok": False, "error", "traceback"}
+        """
+        self.start()
+        if self.process.poll() is not None:
+            return {"ok": False, "error": f"常驻进程已退出（返回码 {self.process.returncode}）"}
+        self.process.stdin.write(json.dumps(asdict(job), ensure_ascii=False) + "\n")
+        self.process.stdin.flush()
+        return self._read_reply(on_log)
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            if self.process.poll() is None:
+                self.process.stdin.write("\n")
+                self.process.stdin.flush()
+                self.process.stdin.close()
+            self.process.wait(timeout=30)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        finally:
+            self.process.stdout.close()
+            self._log_thread.join(timeout=5)
+            self.process.stderr.close()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def format_timings(timings: Dict, cache_hits=()) -> str:
+    """{"extract_source": 3.2, ...} → "3DMM 提取（源图片） 3.2s · ..."，命中缓存的阶段标注（缓存）"""
+    return " · ".join(
+        f"{STAGE_LABELS.get(name, name)}{'（缓存）' if name in cache_hits else ''} {seconds:.1f}s"
+        for name, seconds in timings.items()
+    )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="常驻 SadTalker 推理进程（由 SadTalkerWorker 启动）")
+    parser.add_argument("--serve", action="store_true", help="从 stdin 读取任务")
+    parser.add_argument("--sadtalker-dir", default=str(SADTALKER_PATH))
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--preprocess", default="full")
+    parser.add_argument("--device")
+    parser.add_argument("--models", default=DEFAULT_MODELS, help="模型工厂 模块:函数")
+    parser.add_argument("--coeff-cache-dir", help="3DMM 提取缓存目录（默认 .cache/sadtalker_3dmm/）")
+    parser.add_argument("--no-coeff-cache", action="store_true", help="每次都重新提取 3DMM")
+    args = parser.parse_args()
+
+    # SadTalker 的 `src` 包必须优先于其他同名包
+    sys.path.insert(0, os.path.abspath(args.sadtalker_dir))
+    # 协议行独占原始 stdout：先复制一份留给协议，再把 fd 1 改指 stderr，
+    # 之后 Python 的 print、tqdm 以及 C 扩展直接写 fd 1 的输出都进 stderr
+    sys.stdout.flush()
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    try:
+        factory = load_models_factory(args.models)
+        models = factory(size=args.size, preprocess=args.preprocess, device=args.device,
+                         sadtalker_path=args.sadtalker_dir)
+    except Exception as e:
+        _reply(protocol_out, {"ok": False, "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()})
+        sys.exit(1)
+    _reply(protocol_out, {"ok": True, "ready": True, "load_seconds": round(models.load_seconds, 3), "pid": os.getpid()})
+    coeff_cache = None if args.no_coeff_cache else CoeffCache(args.coeff_cache_dir)
+    pipeline = SadTalkerPipeline(models, size=args.size, preprocess=args.preprocess,
+                                 log=lambda message: print(message, flush=True), coeff_cache=coeff_cache)
+    serve(pipeline, sys.stdin, protocol_out)
+
+
+if __name__ == "__main__":
+    main()
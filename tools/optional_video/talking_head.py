@@ -8,6 +8,10 @@ import subprocess
 from pathlib import Path
 from typing import Optional, Dict, List
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sadtalker_worker import SadTalkerWorker, TalkingHeadJob, format_timings
+from face_enhance import enhance_video
+
 # 尝试导入 SadTalker（如果已安装）
 try:
     import torch
@@ -120,6 +124,10 @@ def generate_talking_head(
     preprocess: str = "full",
     size: int = 512,
     pose_style: int = 0,
+    worker: Optional[SadTalkerWorker] = None,
+    backend: str = "torch",
+    threads: Optional[int] = None,
+    enhance_workers: Optional[int] = None,
 ) -> bool:
     """
     生成说话头像视频
@@ -134,10 +142,23 @@ def generate_talking_head(
         preprocess: 预处理模式 ('full', 'crop', 'extcrop', 'resize', 'full_no_alignment')
         size: 输出视频尺寸
         pose_style: 姿势风格 (0-45)
+        worker: 常驻推理进程（batch_generate_talking_heads 传入）；None 时为本次调用单独启动 inference.py
+        backend: 推理后端 'torch' / 'onnx'（ONNX Runtime，适合无 GPU 的机器；需要常驻进程，
+                 worker 为 None 时临时启动一个）
+        threads: onnx 后端的 intra-op 线程数（默认 CPU 核数）
+        enhance_workers: 面部增强的进程数。face_enhance 时先生成不增强的视频，再解码分块、多进程并行增强
+                         （None 为自动）；0 时改回 SadTalker 内部逐帧增强
     
     Returns:
         bool: 是否成功生成
     """
+    if face_enhance and enhance_workers != 0:
+        # 先生成不增强的视频，再分块并行增强
+        return generate_talking_head(
+            image_path, audio_path, output_path, face_enhance=False, batch_size=batch_size, still=still,
+            preprocess=preprocess, size=size, pose_style=pose_style, worker=worker, backend=backend, threads=threads,
+        ) and enhance_talking_head_video(output_path, workers=enhance_workers)
+    
     checks = check_sadtalker_installation()
     
     if not checks['pytorch_available']:
@@ -174,6 +195,14 @@ def generate_talking_head(
     
     # 输出目录也需要转换为绝对路径
     output_dir = os.path.abspath(output_dir)
+
+    if worker is not None or backend != "torch":
+        job = TalkingHeadJob(
+            image_path=image_path, audio_path=audio_path, output_path=output_path,
+            still=still, pose_style=pose_style, batch_size=batch_size,
+            enhancer="gfpgan" if face_enhance else None,
+        )
+        return run_worker_job(worker, job, size=size, preprocess=preprocess, backend=backend, threads=threads)
     
     # 构建 SadTalker 命令
     sadtalker_path = Path(__file__).parent.parent.parent / "external" / "SadTalker"
@@ -359,6 +388,67 @@ def generate_talking_head(
         return False
 
 
+def run_worker_job(worker: Optional[SadTalkerWorker], job: TalkingHeadJob, size: int, preprocess: str,
+                   backend: str = "torch", threads: Optional[int] = None) -> bool:
+    """把任务交给常驻推理进程，打印各阶段耗时；worker 为 None 时按 backend 临时启动一个"""
+    if worker is None:
+        try:
+            with SadTalkerWorker(size=size, preprocess=preprocess, backend=backend, threads=threads) as one_shot:
+                return run_worker_job(one_shot, job, size, preprocess, backend)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"❌ 错误: {str(e)}")
+            return False
+
+    if (worker.size, worker.preprocess, worker.backend) != (size, preprocess, backend):
+        print(f"❌ 错误: 常驻进程按 size={worker.size}, preprocess={worker.preprocess}, backend={worker.backend} "
+              f"加载模型，与本次参数 size={size}, preprocess={preprocess}, backend={backend} 不一致")
+        return False
+
+    print(f"🎬 开始生成说话头像视频（常驻进程，{worker.backend}）...")
+    print(f"📸 图片: {job.image_path}")
+    print(f"🎵 音频: {job.audio_path}")
+    print(f"📹 输出: {job.output_path}")
+    try:
+        result = worker.submit(job)
+    except (OSError, RuntimeError) as e:
+        print(f"❌ 错误: {str(e)}")
+        return False
+    if not result.get("ok"):
+        print(f"❌ 错误: 生成失败: {result.get('error')}")
+        if result.get("traceback"):
+            print(result["traceback"])
+        return False
+
+    file_size = os.path.getsize(job.output_path) / (1024 * 1024)
+    print(f"✅ 成功生成: {job.output_path}（{file_size:.2f} MB，{result['seconds']:.1f}s）")
+    print(f"⏱️  {format_timings(result['timings'], result.get('cache_hits', ()))}")
+    render_seconds = result["timings"].get("face_render")
+    if result.get("frames") and render_seconds:
+        print(f"🎞️  {result['frames']} 帧，渲染 {result['frames'] / render_seconds:.1f} 帧/秒")
+    return True
+
+
+def enhance_talking_head_video(video_path: str, workers: Optional[int] = None) -> bool:
+    """
+    对已生成的说话头像视频做分块并行面部增强（原地替换）
+
+    增强失败时保留未增强的视频并给出警告，仍视为生成成功。
+    """
+    raw_path = f"{os.path.splitext(video_path)[0]}.raw.mp4"
+    os.replace(video_path, raw_path)
+    print("✨ 面部增强（分块并行）...")
+    try:
+        stats = enhance_video(raw_path, video_path, workers=workers)
+    except Exception as e:
+        os.replace(raw_path, video_path)
+        print(f"⚠️ 面部增强失败，保留未增强的视频: {e}")
+        return True
+    os.remove(raw_path)
+    print(f"✅ 面部增强完成: {stats['frames']} 帧（{stats['skipped']} 帧与上一帧相同，直接复用），"
+          f"{stats['seconds']:.1f}s，{stats['fps']:.1f} 帧/秒")
+    return True
+
+
 def generate_talking_head_from_video(
     video_path: str,
     audio_path: str,
@@ -368,6 +458,10 @@ def generate_talking_head_from_video(
     preprocess: str = "full",
     size: int = 512,
     pose_style: int = 0,
+    worker: Optional[SadTalkerWorker] = None,
+    backend: str = "torch",
+    threads: Optional[int] = None,
+    enhance_workers: Optional[int] = None,
 ) -> bool:
     """
     从视频生成说话头像视频（保持原视频的动画和表情，只改变口型）
@@ -386,12 +480,23 @@ def generate_talking_head_from_video(
         preprocess: 预处理模式 ('full', 'crop', 'extcrop', 'resize', 'full_no_alignment')
         size: 输出视频尺寸
         pose_style: 姿势风格 (0-45)
+        worker: 常驻推理进程；None 时为本次调用单独启动 inference.py
+        backend: 推理后端 'torch' / 'onnx'（同 generate_talking_head）
+        threads: onnx 后端的 intra-op 线程数
+        enhance_workers: 面部增强的进程数（同 generate_talking_head）
     
     Returns:
         bool: 是否成功生成
     """
     import tempfile
     
+    if face_enhance and enhance_workers != 0:
+        # 先生成不增强的视频，再分块并行增强
+        return generate_talking_head_from_video(
+            video_path, audio_path, output_path, face_enhance=False, batch_size=batch_size, preprocess=preprocess,
+            size=size, pose_style=pose_style, worker=worker, backend=backend, threads=threads,
+        ) and enhance_talking_head_video(output_path, workers=enhance_workers)
+    
     checks = check_sadtalker_installation()
     
     if not checks['pytorch_available']:
@@ -447,6 +552,14 @@ def generate_talking_head_from_video(
             return False
         
         print(f"✅ 已提取第一帧: {first_frame_path}")
+
+        if worker is not None or backend != "torch":
+            job = TalkingHeadJob(
+                image_path=first_frame_path, audio_path=audio_path, output_path=output_path,
+                ref_pose=video_path, ref_eyeblink=video_path, pose_style=pose_style, batch_size=batch_size,
+                enhancer="gfpgan" if face_enhance else None,
+            )
+            return run_worker_job(worker, job, size=size, preprocess=preprocess, backend=backend, threads=threads)
         
         # 构建 SadTalker 命令
         sadtalker_path = Path(__file__).parent.parent.parent / "external" / "SadTalker"
@@ -616,6 +729,7 @@ def batch_generate_talking_heads(
     audio_pattern: str = "*.mp3",
     face_enhance: bool = True,
     still: bool = False,
+    persistent: bool = True,
     **kwargs
 ) -> List[str]:
     """
@@ -627,6 +741,7 @@ def batch_generate_talking_heads(
         output_dir: 输出目录
         audio_pattern: 音频文件匹配模式
         face_enhance: 是否启用面部增强
+        persistent: 用一个常驻推理进程处理全部片段（模型只加载一次）；False 时每个片段单独启动 inference.py
         **kwargs: 其他参数传递给 generate_talking_head
     
     Returns:
@@ -652,23 +767,40 @@ def batch_generate_talking_heads(
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
+    # 常驻推理进程：模型只加载一次，全部片段依次提交
+    worker = None
+    checks = check_sadtalker_installation()
+    if persistent and checks['pytorch_available'] and checks['sadtalker_dir_exists']:
+        worker = SadTalkerWorker(size=kwargs.get("size", 512), preprocess=kwargs.get("preprocess", "full"),
+                                 backend=kwargs.get("backend", "torch"), threads=kwargs.get("threads"))
+        try:
+            worker.start()
+        except (OSError, RuntimeError) as e:
+            print(f"⚠️ 常驻进程启动失败，改为逐个启动 inference.py: {e}")
+            worker = None
+    
     successful = []
     
-    for i, audio_file in enumerate(audio_files, 1):
-        audio_basename = os.path.splitext(os.path.basename(audio_file))[0]
-        output_path = os.path.join(output_dir, f"{audio_basename}.mp4")
-        
-        print(f"\n[{i}/{len(audio_files)}] 处理: {os.path.basename(audio_file)}")
-        
-        if generate_talking_head(
-            image_path=image_path,
-            audio_path=audio_file,
-            output_path=output_path,
-            face_enhance=face_enhance,
-            still=still,
-            **kwargs
-        ):
-            successful.append(output_path)
+    try:
+        for i, audio_file in enumerate(audio_files, 1):
+            audio_basename = os.path.splitext(os.path.basename(audio_file))[0]
+            output_path = os.path.join(output_dir, f"{audio_basename}.mp4")
+            
+            print(f"\n[{i}/{len(audio_files)}] 处理: {os.path.basename(audio_file)}")
+            
+            if generate_talking_head(
+                image_path=image_path,
+                audio_path=audio_file,
+                output_path=output_path,
+                face_enhance=face_enhance,
+                still=still,
+                worker=worker,
+                **kwargs
+            ):
+                successful.append(output_path)
+    finally:
+        if worker is not None:
+            worker.close()
     
     print(f"\n🎉 批量处理完成: {len(successful)}/{len(audio_files)} 成功")
     return successful
@@ -750,6 +882,11 @@ if __name__ == "__main__":
     parser.add_argument("--size", type=int, default=512, help="输出视频尺寸（默认: 512）")
     parser.add_argument("--preprocess", type=str, default="full", choices=["crop", "full"], help="预处理模式")
     parser.add_argument("--still", action="store_true", help="保持头部静止（仅唇形动画，仅用于图片模式）")
+    parser.add_argument("--backend", type=str, default="torch", choices=["torch", "onnx"],
+                        help="推理后端：torch（默认）或 onnx（ONNX Runtime，CPU）")
+    parser.add_argument("--threads", type=int, help="onnx 后端的 intra-op 线程数（默认 CPU 核数）")
+    parser.add_argument("--enhance-workers", type=int,
+                        help="面部增强进程数（默认自动；0 表示由 SadTalker 在推理时逐帧增强）")
     parser.add_argument("--check", action="store_true", help="检查安装状态和素材准备情况")
     
     args = parser.parse_args()
@@ -785,30 +922,49 @@ if __name__ == "__main__":
         print("💡 请先安装: git clone https://github.com/OpenTalker/SadTalker.git external/SadTalker")
         sys.exit(1)
     
-    # 执行生成
-    if args.video:
-        # 使用视频模式（保持原视频动画）
-        success = generate_talking_head_from_video(
-            video_path=args.video,
-            audio_path=args.audio,
-            output_path=args.output,
-            face_enhance=args.face_enhance,
-            batch_size=args.batch_size,
-            size=args.size,
-            preprocess=args.preprocess
-        )
-    else:
-        # 使用图片模式
-        success = generate_talking_head(
-            image_path=args.image,
-            audio_path=args.audio,
-            output_path=args.output,
-            face_enhance=args.face_enhance,
-            batch_size=args.batch_size,
-            size=args.size,
-            still=args.still,
-            preprocess=args.preprocess
-        )
+    # 执行生成（常驻进程：3DMM 提取结果走 .cache/sadtalker_3dmm/，下次运行同一照片 / 参考视频直接复用）
+    worker = SadTalkerWorker(size=args.size, preprocess=args.preprocess, backend=args.backend, threads=args.threads)
+    try:
+        worker.start()
+    except (OSError, RuntimeError) as e:
+        print(f"⚠️ 常驻进程启动失败，改为本次调用单独启动推理: {e}")
+        worker = None
+
+    try:
+        if args.video:
+            # 使用视频模式（保持原视频动画）
+            success = generate_talking_head_from_video(
+                video_path=args.video,
+                audio_path=args.audio,
+                output_path=args.output,
+                face_enhance=args.face_enhance,
+                batch_size=args.batch_size,
+                size=args.size,
+                preprocess=args.preprocess,
+                worker=worker,
+                backend=args.backend,
+                threads=args.threads,
+                enhance_workers=args.enhance_workers,
+            )
+        else:
+            # 使用图片模式
+            success = generate_talking_head(
+                image_path=args.image,
+                audio_path=args.audio,
+                output_path=args.output,
+                face_enhance=args.face_enhance,
+                batch_size=args.batch_size,
+                size=args.size,
+                still=args.still,
+                preprocess=args.preprocess,
+                worker=worker,
+                backend=args.backend,
+                threads=args.threads,
+                enhance_workers=args.enhance_workers,
+            )
+    finally:
+        if worker is not None:
+            worker.close()
     
     sys.exit(0 if success else 1)
 
@@ -210,11 +210,431 @@ def normalize_numbers_in_text(text: str) -> str:
     return result
 
 
+# ============================================================================
+# 常驻 CosyVoice 引擎
+# ============================================================================
+
+DEFAULT_MODEL_DIR = "iic/CosyVoice-300M"
+# 单个分句的最大字数：短句合并到这个长度，长句不在句中硬切
+DEFAULT_CHUNK_CHARS = 60
+# 句末标点（后面紧跟的右引号 / 右括号留在本句）或换行处切分
+_SENTENCE_BOUNDARY = r'(?<=[。！？；!?;])(?![”’」』）)])|(?<=[。！？；!?;][”’」』）)])|(?<=\n)'
+
+
+def speaker_cache_dir():
+    """说话人特征缓存目录：与 src/utils/cache_dir.py 相同的 .cache/（YYY_CACHE_DIR 可改）"""
+    root = os.getenv("YYY_CACHE_DIR") or os.path.join(_project_root, ".cache")
+    return os.path.join(os.path.abspath(root), "cosyvoice_speakers")
+
+
+def speaker_id_for(reference_audio_path: str, prompt_text: str, model_dir: str, name: str = None) -> str:
+    """
+    参考录音 + 提示文本 + 模型 → 说话人 ID，如 "frank_enhanced-3f2a9c1d"
+
+    录音内容或提示文本一变，ID 就变，不会误用旧特征。
+    """
+    import hashlib
+
+    h = hashlib.sha256()
+    with open(reference_audio_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    h.update(prompt_text.encode("utf-8"))
+    h.update(model_dir.encode("utf-8"))
+    name = name or os.path.splitext(os.path.basename(reference_audio_path))[0]
+    return f"{name}-{h.hexdigest()[:8]}"
+
+
+def split_sentences(text: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> list:
+    """
+    在句子边界切分口播文本，相邻短句合并到不超过 max_chars 字
+
+    Returns:
+        list: 按原顺序排列的分句，拼起来（去掉首尾空白后）就是原文
+    """
+    import re
+
+    chunks = []
+    for piece in re.split(_SENTENCE_BOUNDARY, text):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if chunks and len(chunks[-1]) + len(piece) <= max_chars:
+            chunks[-1] += piece
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def chunk_seed(text: str, spk_id: str) -> int:
+    """分句的采样种子只由文字和说话人决定，与在哪个进程、第几个合成无关"""
+    import hashlib
+
+    digest = hashlib.sha256(f"{spk_id}\n{text}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "little")
+
+
+def set_random_seed(seed: int):
+    """CosyVoice 的 LLM 采样是随机的，每个分句合成前重置种子，串行和并行结果才一致"""
+    import random
+
+    random.seed(seed)
+    try:
+        import numpy as np
+        np.random.seed(seed)
+    except ImportError:
+        pass
+    try:
+        import torch
+        torch.manual_seed(seed)
+    except ImportError:
+        pass
+
+
+def set_torch_threads(threads: int):
+    """限制 torch 的 intra-op 线程数（未安装 torch 时忽略）"""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def save_speaker_features(path: str, features: dict):
+    """原子写入说话人特征（torch.save）"""
+    import torch
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.save(features, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_speaker_features(path: str) -> dict:
+    import torch
+
+    return torch.load(path, map_location="cpu")
+
+
+def open_wav(path: str, sample_rate: int):
+    """打开单声道 WAV 写入句柄（soundfile.SoundFile）"""
+    import soundfile as sf
+
+    return sf.SoundFile(path, "w", samplerate=sample_rate, channels=1)
+
+
+def write_wav(path: str, chunks, sample_rate: int) -> int:
+    """
+    把音频块按顺序首尾相接写成 WAV（不做交叉淡化）
+
+    chunks 可以是生成器：每块一产出就写进已打开的文件，内存里只有当前这一块。
+    中途出错时删除写了一半的文件。
+
+    Returns:
+        int: 写入的采样点数
+    """
+    frames = 0
+    try:
+        with open_wav(path, sample_rate) as f:
+            for chunk in chunks:
+                f.write(chunk)
+                frames += len(chunk)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return frames
+
+
+def resolve_model_factory(model_factory):
+    """model_factory 可以是可调用对象，也可以是 "模块:函数" 字符串（并行 worker 进程里按名字导入）"""
+    if model_factory is None or callable(model_factory):
+        return model_factory
+    import importlib
+
+    module_name, _, func_name = model_factory.partition(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+class CosyVoiceEngine:
+    """
+    常驻内存的 CosyVoice：模型只加载一次，说话人提示特征提取一次后存盘复用
+
+    inference_zero_shot 传 zero_shot_spk_id='' 时，每个片段都要从参考录音重新提取说话人 embedding、
+    提示音频的 token 和声学特征。这里用 add_zero_shot_spk 提取一次，按说话人 ID 存到
+    .cache/cosyvoice_speakers/{模型}/{说话人ID}.pt，之后的批次和其他 lesson 直接加载，完全跳过特征提取。
+
+    Args:
+        model_dir: 模型目录或 ModelScope ID
+        cache_dir: 说话人特征缓存目录
+        model_factory: model_factory(model_dir) -> CosyVoice 实例，或 "模块:函数" 字符串（测试时可替换）
+        threads: 限制 torch 的 intra-op 线程数（None 为 torch 默认）
+    """
+
+    def __init__(self, model_dir: str = DEFAULT_MODEL_DIR, cache_dir: str = None, model_factory=None,
+                 threads: int = None):
+        self.model_dir = model_dir
+        self.cache_root = cache_dir or speaker_cache_dir()
+        self.cache_dir = os.path.join(self.cache_root, model_dir.replace("/", "_"))
+        self.model_factory = model_factory
+        self.threads = threads
+        self.model = None
+        self.load_seconds = 0.0
+        self.speakers = {}  # 提示录音 (路径, 提示文本) -> 说话人 ID
+        self.clip_stats = []
+
+    def load(self):
+        """首次调用时加载模型"""
+        if self.model is None:
+            import time
+
+            if self.threads:
+                set_torch_threads(self.threads)
+            start = time.perf_counter()
+            factory = resolve_model_factory(self.model_factory)
+            if factory is not None:
+                self.model = factory(self.model_dir)
+            else:
+                from cosyvoice.cli.cosyvoice import CosyVoice
+                self.model = CosyVoice(model_dir=self.model_dir)
+            self.load_seconds = time.perf_counter() - start
+            print(f"🧠 CosyVoice 模型已加载（{self.load_seconds:.1f}s）")
+        return self.model
+
+    @property
+    def sample_rate(self):
+        return self.load().sample_rate
+
+    def register_speaker(self, reference_audio_path: str, prompt_text: str = "", name: str = None) -> str:
+        """
+        确保说话人特征已在模型中：进程内已注册 → 磁盘缓存 → 从录音提取并存盘
+
+        Returns:
+            str: 说话人 ID（传给 inference_zero_shot 的 zero_shot_spk_id）
+        """
+        import time
+
+        memo_key = (os.path.abspath(reference_audio_path), prompt_text)
+        if memo_key in self.speakers:
+            return self.speakers[memo_key]
+
+        model = self.load()
+        spk_id = speaker_id_for(reference_audio_path, prompt_text, self.model_dir, name)
+        path = os.path.join(self.cache_dir, f"{spk_id}.pt")
+        start = time.perf_counter()
+        if os.path.exists(path):
+            model.frontend.spk2info[spk_id] = load_speaker_features(path)
+            print(f"🗣️ 说话人特征已从缓存加载: {spk_id}（{(time.perf_counter() - start) * 1000:.0f} ms）")
+        else:
+            model.add_zero_shot_spk(prompt_text, reference_audio_path, spk_id)
+            save_speaker_features(path, model.frontend.spk2info[spk_id])
+            print(f"🗣️ 已提取说话人特征: {spk_id}（{time.perf_counter() - start:.1f}s）→ {path}")
+        self.speakers[memo_key] = spk_id
+        return spk_id
+
+    def stream_speech(self, text: str, spk_id: str, stream: bool = False):
+        """
+        逐段产出一个分句的一维音频数组（种子由分句文字决定）
+
+        CosyVoice 会把文本再切成若干段，每段 yield 一次；stream=True 时每个流式块 yield 一次。
+        所有段都要依次用上，只取第一段会丢掉后面的内容。
+        """
+        model = self.load()
+        set_random_seed(chunk_seed(text, spk_id))
+        produced = False
+        # 指定 zero_shot_spk_id 时 prompt_text / prompt_wav 不再参与计算
+        for output in model.inference_zero_shot(
+            tts_text=text, prompt_text="", prompt_wav="", zero_shot_spk_id=spk_id, stream=stream,
+        ):
+            produced = True
+            yield output['tts_speech'].squeeze().cpu().numpy()
+        if not produced:
+            raise RuntimeError("CosyVoice 没有返回音频")
+
+    def _record(self, output_path: str, seconds: float, frames: int, chunks: int, sample_rate: int,
+                first_audio: float = None) -> dict:
+        audio_seconds = frames / sample_rate
+        stats = {
+            "path": output_path, "chunks": chunks, "seconds": round(seconds, 3),
+            "audio_seconds": round(audio_seconds, 3),
+            "rtf": round(seconds / audio_seconds, 3) if audio_seconds else None,
+            "first_audio": round(first_audio, 3) if first_audio is not None else None,
+        }
+        self.clip_stats.append(stats)
+        return stats
+
+    def synthesize(self, text: str, spk_id: str, output_path: str, max_chars: int = DEFAULT_CHUNK_CHARS,
+                   stream: bool = False) -> dict:
+        """
+        按句切分后逐句合成，每段音频一产出就写进 WAV 文件
+
+        stream=True 时用 CosyVoice 的流式推理，第一块音频更早落盘（适合边生成边试听），
+        内存里始终只有当前这一块。
+
+        Returns:
+            dict: {"path", "chunks", "seconds", "audio_seconds", "rtf", "first_audio"}
+                  （rtf = 合成耗时 / 音频时长，first_audio = 第一块音频写入前的耗时）
+        """
+        import time
+
+        start = time.perf_counter()
+        sentences = split_sentences(text, max_chars)
+        if not sentences:
+            raise ValueError("口播文本为空")
+        first_audio = []
+
+        def segments():
+            for sentence in sentences:
+                for audio in self.stream_speech(sentence, spk_id, stream):
+                    if not first_audio:
+                        first_audio.append(time.perf_counter() - start)
+                    yield audio
+
+        frames = write_wav(output_path, segments(), self.sample_rate)
+        return self._record(output_path, time.perf_counter() - start, frames, len(sentences), self.sample_rate,
+                            first_audio[0] if first_audio else None)
+
+    def synthesize_many(self, items: list, reference_audio_path: str, prompt_text: str = "",
+                        workers: int = 1, threads: int = None, max_chars: int = DEFAULT_CHUNK_CHARS,
+                        stream: bool = False, window: int = None) -> list:
+        """
+        批量合成 [(文本, 输出路径), ...]
+
+        workers > 1 时，所有片段的分句一起交给 workers 个 worker 进程（spawn，各自持有一份模型，
+        torch 线程数限制为 threads，默认按 CPU 核数均分），父进程按原顺序拼回每个片段的 WAV。
+        串行时 threads 同样生效（默认沿用引擎的 threads）。
+        每个分句的采样种子只由文字决定；线程数不同时 CPU 浮点运算的累加顺序可能不同，
+        所以串行与并行的输出一致以两边传入相同的 threads 为前提。
+        并行时 worker 按分句整段返回，父进程在分句完成后按顺序写入；stream 只在串行时缩短首块延迟。
+        同时在途的分句数不超过 window（默认 workers × 2），长课不会一次把全部分句排进进程池。
+
+        Returns:
+            list: 与 items 一一对应；成功为 synthesize 的统计，失败为 {"path", "error"}
+        """
+        if workers <= 1:
+            if threads:
+                self.threads = threads
+                set_torch_threads(threads)
+            spk_id = self.register_speaker(reference_audio_path, prompt_text)
+            results = []
+            for text, output_path in items:
+                try:
+                    results.append(self.synthesize(text, spk_id, output_path, max_chars, stream))
+                except Exception as e:
+                    results.append({"path": output_path, "error": str(e)})
+            return results
+
+        import multiprocessing
+        import time
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+
+        threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        window = window or workers * 2
+        print(f"🧵 并行合成：{workers} 个 worker 进程，每个 {threads} 线程")
+        factory = self.model_factory
+        if factory is not None and not isinstance(factory, str):
+            factory = f"{factory.__module__}:{factory.__qualname__}"
+        chunks = [(idx, chunk) for idx, (text, _) in enumerate(items) for chunk in split_sentences(text, max_chars)]
+        remaining = [0] * len(items)
+        for idx, _ in chunks:
+            remaining[idx] += 1
+        done = [[] for _ in items]
+        errors = {}
+        results = [
+            None if remaining[idx] else {"path": output_path, "error": "口播文本为空"}
+            for idx, (_, output_path) in enumerate(items)
+        ]
+
+        def collect(idx, future):
+            # 分句按提交顺序收回；某个片段的最后一句到齐就写出它的 WAV
+            try:
+                done[idx].append(future.result())
+            except Exception as e:
+                errors.setdefault(idx, e)
+            remaining[idx] -= 1
+            if remaining[idx]:
+                return
+            output_path = items[idx][1]
+            segments, done[idx] = done[idx], []
+            try:
+                if idx in errors:
+                    raise errors[idx]
+                start = time.perf_counter()
+                frames = write_wav(output_path, (audio for chunk_audio, _ in segments for audio in chunk_audio), sample_rate)
+                seconds = sum(elapsed for _, elapsed in segments) + time.perf_counter() - start
+                results[idx] = self._record(output_path, seconds, frames, len(segments), sample_rate)
+            except Exception as e:
+                results[idx] = {"path": output_path, "error": str(e)}
+
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_synthesis_worker, initargs=(self.model_dir, self.cache_root, factory, threads),
+        ) as pool:
+            # 先让一个 worker 提取并存盘说话人特征，其余 worker 直接读缓存
+            spk_id, sample_rate = pool.submit(_worker_register, reference_audio_path, prompt_text).result()
+            # 同时在途的分句数受 window 限制，不会一次把整课的分句都排进进程池
+            pending = deque()
+            for idx, chunk in chunks:
+                pending.append((idx, pool.submit(_worker_infer, chunk, reference_audio_path, prompt_text)))
+                if len(pending) >= window:
+                    collect(*pending.popleft())
+            while pending:
+                collect(*pending.popleft())
+        return results
+
+    def report(self) -> str:
+        """各片段合成耗时汇总，没有合成过时返回空字符串"""
+        if not self.clip_stats:
+            return ""
+        total = sum(s["seconds"] for s in self.clip_stats)
+        audio = sum(s["audio_seconds"] for s in self.clip_stats)
+        rtf = f"，RTF {total / audio:.2f}" if audio else ""
+        return f"⏱️ CosyVoice：{len(self.clip_stats)} 个片段，合成 {total:.1f}s，音频 {audio:.1f}s{rtf}"
+
+
+# 并行 worker 进程内的引擎（由 _init_synthesis_worker 创建）
+_worker_engine = None
+
+
+def _init_synthesis_worker(model_dir, cache_dir, model_factory, threads):
+    global _worker_engine
+    _worker_engine = CosyVoiceEngine(model_dir, cache_dir=cache_dir, model_factory=model_factory, threads=threads)
+
+
+def _worker_register(reference_audio_path, prompt_text):
+    spk_id = _worker_engine.register_speaker(reference_audio_path, prompt_text)
+    return spk_id, _worker_engine.sample_rate
+
+
+def _worker_infer(text, reference_audio_path, prompt_text):
+    """返回 (分句的各段音频, 合成耗时)；说话人在本进程首次使用时从磁盘缓存加载"""
+    import time
+
+    spk_id = _worker_engine.register_speaker(reference_audio_path, prompt_text)
+    start = time.perf_counter()
+    segments = list(_worker_engine.stream_speech(text, spk_id))
+    return segments, time.perf_counter() - start
+
+
+_engines = {}
+
+
+def get_cosyvoice_engine(model_dir: str = DEFAULT_MODEL_DIR) -> CosyVoiceEngine:
+    """进程内共享的 CosyVoiceEngine（按模型目录区分）"""
+    engine = _engines.get(model_dir)
+    if engine is None:
+        engine = _engines[model_dir] = CosyVoiceEngine(model_dir)
+    return engine
+
+
 def clone_voice_batch(
     texts: dict,
     reference_audio_path: str,
     output_dir: str,
-    prompt_text: str = ""
+    prompt_text: str = "",
+    workers: int = None,
+    stream: bool = False
 ) -> list:
     """
     批量克隆语音
@@ -224,6 +644,8 @@ def clone_voice_batch(
         reference_audio_path: 参考音频文件路径
         output_dir: 输出目录
         prompt_text: 参考音频对应的文字（可选，建议提供以提高质量）
+        workers: 并行合成的 worker 进程数（默认取环境变量 COSYVOICE_WORKERS，未设置为 1，即串行）
+        stream: 串行时使用流式推理，音频边生成边写盘（首块更早可听）
     
     Returns:
         list: 成功生成的文件路径列表
@@ -235,50 +657,42 @@ def clone_voice_batch(
         print("❌ 错误: CosyVoice 未安装")
         return []
     
-    successful = []
+    if workers is None:
+        workers = int(os.getenv("COSYVOICE_WORKERS", "1"))
+    
+    # 预处理文本：将数字转换为中文读法，提高 TTS 质量
+    items = []
+    for key, text in texts.items():
+        filename = key if key.endswith(".wav") else f"{key}.wav"
+        items.append((normalize_numbers_in_text(text), os.path.join(output_dir, filename)))
+    normalized_prompt_text = normalize_numbers_in_text(prompt_text) if prompt_text else ""
     
-    # 初始化 CosyVoice CLI（文件顶部已设置路径和补丁）
+    # 常驻引擎：模型在进程内只加载一次，说话人特征按参考录音缓存到磁盘
+    engine = get_cosyvoice_engine()
     try:
-        from cosyvoice.cli.cosyvoice import CosyVoice
-        model_dir = "iic/CosyVoice-300M"
-        cosyvoice = CosyVoice(model_dir=model_dir)
+        results = engine.synthesize_many(items, reference_audio_path, normalized_prompt_text,
+                                         workers=workers, stream=stream)
     except Exception as e:
         print(f"❌ 错误: 无法初始化 CosyVoice: {e}")
         return []
     
-    for key, text in texts.items():
-        filename = key if key.endswith(".wav") else f"{key}.wav"
-        output_path = os.path.join(output_dir, filename)
-        
-        print(f"\n[{len(successful) + 1}/{len(texts)}] 处理: {filename}")
-        
-        try:
-            import soundfile as sf
-            
-            # 预处理文本：将数字转换为中文读法，提高 TTS 质量
-            normalized_text = normalize_numbers_in_text(text)
-            normalized_prompt_text = normalize_numbers_in_text(prompt_text) if prompt_text else ""
-            
-            # 使用 inference_zero_shot 进行零样本语音克隆
-            # 这是最稳定的方法，需要提供 prompt_text 和 prompt_wav
-            # CosyVoice 会同时使用文本和音频特征进行克隆，质量更稳定
-            for i, output in enumerate(cosyvoice.inference_zero_shot(
-                tts_text=normalized_text,
-                prompt_text=normalized_prompt_text,  # 使用数字转换后的 prompt_text
-                prompt_wav=reference_audio_path,
-                zero_shot_spk_id='',
-                stream=False
-            )):
-                audio_np = output['tts_speech'].squeeze().cpu().numpy()
-                sf.write(output_path, audio_np, cosyvoice.sample_rate)
-                break
-            
-            successful.append(output_path)
-            print(f"✅ 已生成: {filename}")
-        except Exception as e:
-            print(f"❌ 生成失败: {filename} - {str(e)}")
+    successful = []
+    for idx, stats in enumerate(results, 1):
+        filename = os.path.basename(stats["path"])
+        if "error" in stats:
+            print(f"❌ [{idx}/{len(results)}] 生成失败: {filename} - {stats['error']}")
+            continue
+        successful.append(stats["path"])
+        rtf = f"，RTF {stats['rtf']:.2f}" if stats["rtf"] else ""
+        if stats.get("first_audio") is not None:
+            rtf += f"，首块 {stats['first_audio']:.1f}s"
+        print(f"✅ [{idx}/{len(results)}] 已生成: {filename}"
+              f"（{stats['chunks']} 句，{stats['audio_seconds']:.1f}s 音频，用时 {stats['seconds']:.1f}s{rtf}）")
     
     print(f"\n🎉 批量处理完成: {len(successful)}/{len(texts)} 成功")
+    report = engine.report()
+    if report:
+        print(report)
     return successful
 
 